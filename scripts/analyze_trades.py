@@ -1,100 +1,152 @@
 import sys
 import os
+import io
+import json
+import time
+import argparse
 import pandas as pd
 import numpy as np
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 CSV_HEADERS = ["timestamp", "side", "symbol", "price", "size", "order_id", "status"]
-
-def calculate_pnl(df):
+STATE_DIR = os.path.join("data", "cache", "analytics")
+
+class LotQueue:
+    # fifo of open lots kept in two plain lists with a moving head, so popping
+    # the oldest lot is O(1) and the lists are compacted only now and then
+
+    def __init__(self):
+        self.prices = []
+        self.sizes = []
+        self.head = 0
+
+    def __len__(self):
+        return len(self.sizes) - self.head
+
+    def push(self, price, size):
+        self.prices.append(price)
+        self.sizes.append(size)
+
+    def pop(self):
+        self.head += 1
+        if self.head >= 4096 and self.head * 2 >= len(self.sizes):
+            del self.prices[:self.head]
+            del self.sizes[:self.head]
+            self.head = 0
+
+    def open_lots(self):
+        return np.array(self.prices[self.head:], dtype=np.float64), np.array(self.sizes[self.head:], dtype=np.float64)
+
+    def to_state(self):
+        return [self.prices[self.head:], self.sizes[self.head:]]
+
+    @classmethod
+    def from_state(cls, state):
+        lots = cls()
+        lots.prices, lots.sizes = list(state[0]), list(state[1])
+        return lots
+
+
+class FifoBook:
+    # matches orders against the oldest open lots of the opposite side and
+    # collects the closed trades column by column
+
+    def __init__(self):
+        self.longs = LotQueue()
+        self.shorts = LotQueue()
+        self.rows = []
+        self.closed_short = []
+        self.entry_prices = []
+        self.exit_prices = []
+        self.sizes = []
+
+    def add(self, row, is_buy, price, qty):
+        # row is the order's position in the input, used to pick up the
+        # timestamp and symbol of the closing order afterwards
+        lots, opposite = (self.shorts, self.longs) if is_buy else (self.longs, self.shorts)
+
+        lot_prices, lot_sizes = lots.prices, lots.sizes
+        while qty > 0 and lots.head < len(lot_sizes):
+            head = lots.head
+            close_size = min(lot_sizes[head], qty)
+            self.rows.append(row)
+            self.closed_short.append(is_buy)
+            self.entry_prices.append(lot_prices[head])
+            self.exit_prices.append(price)
+            self.sizes.append(close_size)
+
+            lot_sizes[head] -= close_size
+            qty -= close_size
+
+            if lot_sizes[head] <= 0:
+                lots.pop()
+
+        if qty > 0:
+            opposite.push(price, qty)
+
+    def trades(self, timestamps, symbols):
+        if not self.rows:
+            return pd.DataFrame()
+
+        rows = np.array(self.rows, dtype=np.int64)
+        entry = np.array(self.entry_prices, dtype=np.float64)
+        exit_ = np.array(self.exit_prices, dtype=np.float64)
+        size = np.array(self.sizes, dtype=np.float64)
+        short = np.array(self.closed_short, dtype=bool)
+
+        move = np.where(short, entry - exit_, exit_ - entry)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ret = np.where(entry > 0, move / entry, 0.0)
+
+        return pd.DataFrame({
+            "symbol": symbols[rows],
+            "direction": np.where(short, "SHORT", "LONG").astype(object),
+            "entry_price": entry,
+            "exit_price": exit_,
+            "size": size,
+            "pnl": move * size,
+            "return": ret,
+            "timestamp": timestamps[rows],
+        })
+
+    def to_state(self):
+        # only the open lots carry over, closed trades are reported per call
+        return {"longs": self.longs.to_state(), "shorts": self.shorts.to_state()}
+
+    @classmethod
+    def from_state(cls, state):
+        book = cls()
+        book.longs = LotQueue.from_state(state["longs"])
+        book.shorts = LotQueue.from_state(state["shorts"])
+        return book
+
+    def unrealized_pnl(self, last_price):
+        long_prices, long_sizes = self.longs.open_lots()
+        short_prices, short_sizes = self.shorts.open_lots()
+        return ((last_price - long_prices) * long_sizes).sum() + ((short_prices - last_price) * short_sizes).sum()
+
+
+def calculate_pnl(df, book=None):
+    # book carries open lots over from earlier orders (incremental mode)
     if df.empty:
         return pd.DataFrame(), 0.0, 0
 
-    long_df = pd.DataFrame(columns=["entry_price", "size", "symbol"]).astype({
-        "entry_price": "float64",
-        "size": "float64",
-        "symbol": "object"
-    })
-    short_df = pd.DataFrame(columns=["entry_price", "size", "symbol"]).astype({
-        "entry_price": "float64",
-        "size": "float64",
-        "symbol": "object"
-    })
-    trades = []
-
-    last_price = df.iloc[-1]["price"]
-    total_orders = len(df)
-
-    for row in df.itertuples(index=False):
-        side = row.side.upper()
-        qty = row.size
-        price = row.price
-        symbol = row.symbol
-
-        if side == "BUY":
-            while qty > 0 and not short_df.empty:
-                close_size = min(short_df.iloc[0]["size"], qty)
-                entry_price = short_df.iloc[0]["entry_price"]
-                pnl = (entry_price - price) * close_size
-                ret = (entry_price - price) / entry_price if entry_price > 0 else 0.0
-
-                trades.append({
-                    "symbol": symbol,
-                    "direction": "SHORT",
-                    "entry_price": entry_price,
-                    "exit_price": price,
-                    "size": close_size,
-                    "pnl": pnl,
-                    "return": ret,
-                    "timestamp": row.timestamp
-                })
-
-                short_df.at[short_df.index[0], "size"] -= close_size
-                qty -= close_size
-
-                if short_df.iloc[0]["size"] <= 0:
-                    short_df = short_df.iloc[1:].reset_index(drop=True)
-
-            if qty > 0:
-                long_df = pd.concat([
-                    long_df,
-                    pd.DataFrame([{"entry_price": price, "size": qty, "symbol": symbol}])
-                ], ignore_index=True)
-
-        else:
-            while qty > 0 and not long_df.empty:
-                close_size = min(long_df.iloc[0]["size"], qty)
-                entry_price = long_df.iloc[0]["entry_price"]
-                pnl = (price - entry_price) * close_size
-                ret = (price - entry_price) / entry_price if entry_price > 0 else 0.0
-
-                trades.append({
-                    "symbol": symbol,
-                    "direction": "LONG",
-                    "entry_price": entry_price,
-                    "exit_price": price,
-                    "size": close_size,
-                    "pnl": pnl,
-                    "return": ret,
-                    "timestamp": row.timestamp
-                })
-
-                long_df.at[long_df.index[0], "size"] -= close_size
-                qty -= close_size
-
-                if long_df.iloc[0]["size"] <= 0:
-                    long_df = long_df.iloc[1:].reset_index(drop=True)
-
-            if qty > 0:
-                short_df = pd.concat([
-                    short_df,
-                    pd.DataFrame([{"entry_price": price, "size": qty, "symbol": symbol}])
-                ], ignore_index=True)
-
-    unrealized_pnl = ((last_price - long_df["entry_price"]) * long_df["size"]).sum() + ((short_df["entry_price"] - last_price) * short_df["size"]).sum()
-
-    return pd.DataFrame(trades), unrealized_pnl, total_orders
+    if book is None:
+        book = FifoBook()
+    # map each distinct side string once instead of upper-casing every row
+    is_buy = df["side"].map({side: side.upper() == "BUY" for side in df["side"].unique()}).tolist()
+    prices = df["price"].to_numpy(dtype=np.float64).tolist()
+    sizes = df["size"].to_numpy(dtype=np.float64).tolist()
+
+    add = book.add
+    for i in range(len(df)):
+        add(i, is_buy[i], prices[i], sizes[i])
+
+    last_price = prices[-1]
+    trades = book.trades(df["timestamp"].to_numpy(), df["symbol"].to_numpy())
+
+    return trades, book.unrealized_pnl(last_price), len(df)
 
 
 def calculate_metrics(df, label, unrealized_pnl=0.0, total_orders=0):
@@ -159,6 +211,159 @@ def calculate_metrics(df, label, unrealized_pnl=0.0, total_orders=0):
     }
 
 
+class TradeStats:
+    # running accumulators behind calculate_metrics, so metrics of a growing
+    # trade log can be updated with only the newly closed trades. return
+    # variance is merged chunk by chunk (Welford / Chan)
+
+    FIELDS = [
+        "count", "pnl_sum", "wins", "losses", "largest_win", "largest_loss",
+        "largest_win_return", "largest_loss_return", "return_mean", "return_m2",
+        "first_timestamp", "last_timestamp",
+    ]
+
+    def __init__(self, **state):
+        self.count = 0
+        self.pnl_sum = 0.0
+        self.wins = 0
+        self.losses = 0
+        self.largest_win = 0.0
+        self.largest_loss = 0.0
+        self.largest_win_return = 0.0
+        self.largest_loss_return = 0.0
+        self.return_mean = 0.0
+        self.return_m2 = 0.0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def to_state(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def update(self, trades):
+        if trades.empty:
+            return
+
+        pnl = trades["pnl"].to_numpy(dtype=np.float64)
+        ret = trades["return"].to_numpy(dtype=np.float64)
+        wins, losses = pnl > 0, pnl < 0
+
+        self.pnl_sum += float(pnl.sum())
+        self.wins += int(wins.sum())
+        self.losses += int(losses.sum())
+        if wins.any():
+            self.largest_win = max(self.largest_win, float(pnl[wins].max()))
+        if losses.any():
+            self.largest_loss = min(self.largest_loss, float(pnl[losses].min()))
+        if (ret > 0).any():
+            self.largest_win_return = max(self.largest_win_return, float(ret[ret > 0].max()))
+        if (ret < 0).any():
+            self.largest_loss_return = min(self.largest_loss_return, float(ret[ret < 0].min()))
+
+        n, mean = len(ret), float(ret.mean())
+        m2 = float(((ret - mean) ** 2).sum())
+        total = self.count + n
+        delta = mean - self.return_mean
+        self.return_mean += delta * n / total
+        self.return_m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+        timestamps = pd.to_datetime(trades["timestamp"])
+        first, last = timestamps.min().isoformat(), timestamps.max().isoformat()
+        self.first_timestamp = first if self.first_timestamp is None else min(self.first_timestamp, first)
+        self.last_timestamp = last if self.last_timestamp is None else max(self.last_timestamp, last)
+
+    def metrics(self, label, unrealized_pnl=0.0, total_orders=0):
+        if self.count == 0:
+            return calculate_metrics(pd.DataFrame(), label, unrealized_pnl, total_orders)
+
+        sharpe_ratio = 0.0
+        annualized_sharpe = 0.0
+        if self.count > 1:
+            std_ret = np.sqrt(self.return_m2 / (self.count - 1))
+            if std_ret > 0:
+                sharpe_ratio = float(self.return_mean / std_ret)
+                time_span = pd.Timestamp(self.last_timestamp) - pd.Timestamp(self.first_timestamp)
+                duration_days = time_span.total_seconds() / (24.0 * 3600.0)
+                if duration_days > 0:
+                    trades_per_day = self.count / duration_days
+                    annualized_sharpe = float(sharpe_ratio * np.sqrt(trades_per_day * 365))
+                else:
+                    annualized_sharpe = sharpe_ratio
+
+        return {
+            "label": label,
+            "total_orders": total_orders,
+            "realized_pnl": self.pnl_sum,
+            "unrealized_pnl": unrealized_pnl,
+            "total_pnl": self.pnl_sum + unrealized_pnl,
+            "avg_pnl": self.pnl_sum / self.count,
+            "largest_win": self.largest_win,
+            "largest_loss": self.largest_loss,
+            "avg_return": self.return_mean * 100,
+            "largest_win_return": self.largest_win_return * 100 if self.wins else 0.0,
+            "largest_loss_return": self.largest_loss_return * 100 if self.losses else 0.0,
+            "win_rate": self.wins / self.count * 100,
+            "sharpe_ratio": sharpe_ratio,
+            "annualized_sharpe": annualized_sharpe,
+        }
+
+
+def refresh_metrics(path, label, state_dir=STATE_DIR):
+    # metrics of an append-only orders csv, reading only the bytes written
+    # since the previous call. the lot book, accumulators and read offset are
+    # kept in a state file; a shrunk or rewritten file starts over
+    os.makedirs(state_dir, exist_ok=True)
+    state_path = os.path.join(state_dir, os.path.basename(path) + ".json")
+
+    state = None
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+
+    with open(path, "rb") as f:
+        if state is not None:
+            tail = bytes.fromhex(state["tail"])
+            f.seek(max(state["offset"] - len(tail), 0))
+            if f.read(len(tail)) != tail:
+                state = None
+        if state is None:
+            f.seek(0)
+            header = f.readline()
+            state = {"header": header.hex(), "offset": len(header), "tail": header[-64:].hex(),
+                     "total_orders": 0, "last_price": None, "book": FifoBook().to_state(), "stats": {}}
+
+        f.seek(state["offset"])
+        chunk = f.read()
+
+    # a partly written last row is picked up on the next refresh
+    chunk = chunk[:chunk.rfind(b"\n") + 1]
+    book = FifoBook.from_state(state["book"])
+    stats = TradeStats(**state["stats"])
+
+    if chunk:
+        orders = pd.read_csv(io.BytesIO(bytes.fromhex(state["header"]) + chunk), parse_dates=["timestamp"])
+        trades, _, total_orders = calculate_pnl(orders, book)
+        stats.update(trades)
+        if total_orders:
+            state["total_orders"] += total_orders
+            state["last_price"] = float(orders["price"].iloc[-1])
+
+        state["offset"] += len(chunk)
+        state["tail"] = (bytes.fromhex(state["tail"]) + chunk)[-64:].hex()
+        state["book"] = book.to_state()
+        state["stats"] = stats.to_state()
+
+        tmp = f"{state_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, state_path)
+
+    unrealized_pnl = book.unrealized_pnl(state["last_price"]) if state["last_price"] is not None else 0.0
+    return stats.metrics(label, unrealized_pnl, state["total_orders"])
+
+
 def print_metrics(m):
     print(f"\n{m['label']}")
     print("_" * 80)
@@ -181,16 +386,7 @@ def print_metrics(m):
     print()
 
 
-def main():
-    backtest_orders = pd.read_csv("data/backtest_trades.csv", parse_dates=["timestamp"])
-    live_orders = pd.read_csv("data/live_trades.csv", parse_dates=["timestamp"])
-
-    bt_trades, bt_unrealized, bt_total = calculate_pnl(backtest_orders)
-    lv_trades, lv_unrealized, lv_total = calculate_pnl(live_orders)
-
-    bt = calculate_metrics(bt_trades, "BACKTEST", bt_unrealized, bt_total)
-    lv = calculate_metrics(lv_trades, "LIVE", lv_unrealized, lv_total)
-
+def report(bt, lv):
     print_metrics(bt)
     print_metrics(lv)
 
@@ -225,5 +421,36 @@ def main():
     print()
 
 
+def main():
+    parser = argparse.ArgumentParser(description="backtest vs live trade analysis")
+    parser.add_argument("--backtest", type=str, default="data/backtest_trades.csv")
+    parser.add_argument("--live", type=str, default="data/live_trades.csv")
+    parser.add_argument("--incremental", action="store_true", help="Only read orders appended since the last run")
+    parser.add_argument("--follow", type=float, help="Refresh incrementally every N seconds")
+    parser.add_argument("--state-dir", type=str, default=STATE_DIR)
+    args = parser.parse_args()
+
+    if not (args.incremental or args.follow):
+        backtest_orders = pd.read_csv(args.backtest, parse_dates=["timestamp"])
+        live_orders = pd.read_csv(args.live, parse_dates=["timestamp"])
+
+        bt_trades, bt_unrealized, bt_total = calculate_pnl(backtest_orders)
+        lv_trades, lv_unrealized, lv_total = calculate_pnl(live_orders)
+
+        bt = calculate_metrics(bt_trades, "BACKTEST", bt_unrealized, bt_total)
+        lv = calculate_metrics(lv_trades, "LIVE", lv_unrealized, lv_total)
+        report(bt, lv)
+        return
+
+    while True:
+        report(
+            refresh_metrics(args.backtest, "BACKTEST", args.state_dir),
+            refresh_metrics(args.live, "LIVE", args.state_dir),
+        )
+        if not args.follow:
+            break
+        time.sleep(args.follow)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,102 @@
+# precomputes the feature store columns (src/backtesting/feature_store.py)
+# of strategies over a whole 1m csv, so backtests run with --feature-store
+# only look them up. with --check, sampled candles are recomputed from the
+# 1m bars up to the candle's opening bar alone and must equal the stored row,
+# i.e. no stored value depends on a later bar. with --bench every strategy
+# is replayed event-skipped with and without its columns, and the orders
+# and run times compared
+#
+# python scripts/build_features.py --data-1m data/eth_1m.csv --strategy regime_aware mean_reversion --check 50
+# python scripts/build_features.py --data-1m data/eth_1m.csv --strategy regime_aware mean_reversion --bench
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.backtesting.backtest import Replay, StrategyRun
+from src.backtesting.feature_store import INDICATORS, FeatureStore, source_key
+from src.strategy.registry import available, create_strategy
+from src.utils.candles import candle_arrays
+from src.utils.data import load_ohlcv_batch
+
+
+def check_point_in_time(bars, view, specs, timeframe, samples, rng):
+    # rows of view that differ from the same indicator over the bars known
+    # when their candle opened
+    first_ts = np.asarray(view.index["first_ts"])
+    differ = []
+    for k in sorted(rng.choice(len(first_ts), size=min(samples, len(first_ts)), replace=False).tolist()):
+        seen = int(np.searchsorted(bars.ts, first_ts[k], side="right"))
+        candles = candle_arrays(bars[:seen], timeframe)
+        for name, (indicator, params) in specs.items():
+            value = INDICATORS[indicator](candles, *params)[-1]
+            stored = view.columns[name][k]
+            if not (value == stored or (np.isnan(value) and np.isnan(stored))):
+                differ.append((k, name, float(stored), float(value)))
+    return differ
+
+
+def replay_seconds(name, strategy, bars, event_skip=True):
+    # (orders, seconds) of a replay of strategy over bars
+    run = StrategyRun(name, strategy)
+    started = time.perf_counter()
+    Replay([run], bars, event_skip=event_skip).run_until(len(bars))
+    return run.trade_tracker.get_all_orders(), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="precompute strategy indicator columns over a 1m csv")
+    parser.add_argument("--data-1m", type=str, default="data/eth_1m.csv")
+    parser.add_argument("--strategy", choices=available(), nargs="+", default=["regime_aware", "mean_reversion"])
+    parser.add_argument("--config", type=str, default="{}", help="Strategy config as JSON, applied to every --strategy")
+    parser.add_argument("--store-dir", type=str, default="data/cache/features")
+    parser.add_argument("--check", type=int, default=0, metavar="N", help="Recompute N sampled candles from the bars up to their open and compare")
+    parser.add_argument("--bench", action="store_true", help="Time an event-skipping replay of each strategy with and without its columns")
+    args = parser.parse_args()
+
+    bars = load_ohlcv_batch(args.data_1m).sorted()
+    store = FeatureStore(args.store_dir)
+    key = source_key(bars)
+    rng = np.random.default_rng(0)
+    print(f"{len(bars)} 1m bars of {bars.symbol}, source {key[:12]}")
+
+    failed = False
+    for name in args.strategy:
+        specs = create_strategy(name, json.loads(args.config)).feature_specs()
+        if not specs:
+            print(f"  {name:<16} reads no features")
+            continue
+        timeframe, columns = specs
+        built = store.built
+        started = time.perf_counter()
+        view = store.view(bars, timeframe, columns, key=key)
+        seconds = time.perf_counter() - started
+        print(f"  {name:<16} {timeframe:<4} {len(view):>8} candles  {store.built - built} of {len(columns)} columns built  {seconds:.3f}s")
+
+        if args.check:
+            differ = check_point_in_time(bars, view, columns, timeframe, args.check, rng)
+            for k, column, stored, value in differ[:10]:
+                print(f"    candle {k} {column}: stored {stored!r}, from bars up to its open {value!r}")
+            print(f"    point-in-time check: {args.check} candles, {len(differ)} values differ")
+            failed |= bool(differ)
+
+        if args.bench:
+            config = json.loads(args.config)
+            plain, plain_seconds = replay_seconds(name, create_strategy(name, dict(config)), bars)
+            strategy = create_strategy(name, dict(config))
+            strategy.features = view
+            stored, stored_seconds = replay_seconds(name, strategy, bars)
+            print(f"    event-skipping replay: {plain_seconds:.3f}s computing, {stored_seconds:.3f}s with the store, orders {'equal' if stored == plain else 'DIFFER'}")
+            failed |= stored != plain
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
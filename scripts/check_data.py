@@ -0,0 +1,64 @@
+# validates a 1m ohlcv csv (gaps, duplicates, ordering, zero volume, bad
+# candles) and optionally writes a repaired copy
+#
+# python scripts/check_data.py --data-1m data/eth_1m.csv
+# python scripts/check_data.py --data-1m data/eth_1m.csv --repair ffill --output data/eth_1m_clean.csv
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import argparse
+import time
+
+from config.config import load_config
+from src.trading.exchange import BinanceClient
+from src.utils.candle_cache import TIMEFRAME_MS, CandleCache
+from src.utils.data import load_ohlcv_records, write_ohlcv_records
+from src.utils.data_quality import check_bars, repair_bars
+
+
+def main():
+    parser = argparse.ArgumentParser(description="check and repair 1m bar files")
+    parser.add_argument("--data-1m", type=str, default="data/eth_1m.csv")
+    parser.add_argument("--timeframe", choices=sorted(TIMEFRAME_MS), default="1m")
+    parser.add_argument("--min-zero-run", type=int, default=5, help="Report zero volume runs at least this long")
+    parser.add_argument("--repair", choices=["ffill", "none"], help="Dedup/sort and fill holes with flat bars (ffill) or leave them (none)")
+    parser.add_argument("--refetch", action="store_true", help="Try the candle cache / mainnet for holes before filling")
+    parser.add_argument("--output", type=str, help="Where the repaired csv goes (default: overwrite --data-1m)")
+    args = parser.parse_args()
+
+    step = TIMEFRAME_MS[args.timeframe]
+    records, symbol, timeframe = load_ohlcv_records(args.data_1m)
+
+    started = time.perf_counter()
+    report = check_bars(records, step, min_zero_run=args.min_zero_run)
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.data_1m}: {'OK' if report.ok else 'ISSUES FOUND'} ({elapsed * 1000:.1f} ms)")
+    for item in report.summary(max_items=20).split(" | "):
+        print(f"  {item}")
+
+    if args.repair is None:
+        return
+
+    fetch = None
+    if args.refetch:
+        config = load_config()
+        client = BinanceClient(config.BINANCE_API_KEY, config.BINANCE_API_SECRET, base_url="https://api.binance.com")
+        cache = CandleCache(os.path.join("data", "cache", "api.binance.com"), client=client)
+
+        def fetch(start_ms, end_ms):
+            return cache.get(symbol, args.timeframe, start_ms, end_ms)
+
+    repaired = repair_bars(records, step, fill=args.repair, fetch=fetch)
+    output = args.output or args.data_1m
+    write_ohlcv_records(output, repaired, symbol, timeframe)
+
+    after = check_bars(repaired, step, min_zero_run=args.min_zero_run)
+    print(f"Wrote {len(repaired)} bars to {output}")
+    print(f"  {after.summary(max_items=0)}")
+
+
+if __name__ == "__main__":
+    main()
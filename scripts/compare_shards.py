@@ -0,0 +1,78 @@
+# checks a time-sharded backtest (src/backtesting/shards.py) against the
+# serial one: both run over the same 1m bars, the order lists must match and
+# the two run times are compared
+#
+# python scripts/compare_shards.py --strategy multi_tf --config '{"max_position_value": 1e9, "max_position_size": 1e9}' --shards 3 --warmup-hours 6 --overlap-hours 6 --start 2025-12-19T00:00:00 --end 2025-12-21T23:59:00
+# python scripts/compare_shards.py --strategy regime_aware --shards 4 --start 2025-12-19T00:00:00 --end 2025-12-29T23:59:00
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import argparse
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+
+from compare_signals import compare_orders
+
+from src.backtesting.backtest import BacktestEngine, Replay, StrategyRun
+from src.backtesting.shards import run_sharded
+from src.strategy.registry import available, create_strategy
+from src.utils.logger import setup_logger
+
+
+def main():
+    parser = argparse.ArgumentParser(description="compare time-sharded and serial backtests")
+    parser.add_argument("--strategy", choices=available(), default="regime_aware")
+    parser.add_argument("--config", type=str, default="{}", help="Strategy config as JSON")
+    parser.add_argument("--data-1m", type=str, default="data/eth_1m.csv")
+    parser.add_argument("--start", type=str, required=True)
+    parser.add_argument("--end", type=str, required=True)
+    parser.add_argument("--cash", type=float, default=100000)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--warmup-hours", type=float, default=21 * 24)
+    parser.add_argument("--overlap-hours", type=float, default=7 * 24)
+    parser.add_argument("--workers", type=int, default=None, help="Shard processes (default: one per CPU)")
+    parser.add_argument("--event-skip", action="store_true")
+    parser.add_argument("--show", type=int, default=10, help="Mismatches printed")
+    parser.add_argument("--logfile", type=str, default="logs/compare_shards.log")
+    args = parser.parse_args()
+
+    logger = setup_logger(name="compare_shards", level=logging.INFO, logfile=args.logfile)
+    config = json.loads(args.config)
+
+    engine = BacktestEngine([], data_source_1m=args.data_1m, logger=logger)
+    bars = engine.load_bars(datetime.fromisoformat(args.start), datetime.fromisoformat(args.end))
+
+    started = time.perf_counter()
+    run = StrategyRun(args.strategy, create_strategy(args.strategy, dict(config)))
+    Replay([run], bars, cash=args.cash, event_skip=args.event_skip).run_until(len(bars))
+    serial_orders = run.trade_tracker.get_all_orders()
+    serial_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    sharded_orders, _ = run_sharded(
+        args.strategy, create_strategy(args.strategy, dict(config)), bars, args.shards,
+        warmup=timedelta(hours=args.warmup_hours), overlap=timedelta(hours=args.overlap_hours),
+        cash=args.cash, event_skip=args.event_skip, workers=args.workers, logger=logger,
+    )
+    sharded_seconds = time.perf_counter() - started
+
+    mismatches = compare_orders(serial_orders, sharded_orders, names=("serial", "sharded"))
+
+    print(f"\n{args.strategy} over {len(bars)} 1m bars, {args.shards} shards on {os.cpu_count()} CPUs")
+    print("_" * 80)
+    print(f"  {'Serial':<16} {len(serial_orders):>6} orders {serial_seconds:>10.3f}s")
+    print(f"  {'Sharded':<16} {len(sharded_orders):>6} orders {sharded_seconds:>10.3f}s")
+    print(f"  {'Speedup':<16} {serial_seconds / sharded_seconds:>24.2f}x")
+    print(f"  {'Mismatches':<16} {len(mismatches):>6}")
+    for i, what in mismatches[:args.show]:
+        print(f"    order {i + 1}: {what}")
+    print()
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
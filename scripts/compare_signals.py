@@ -0,0 +1,88 @@
+# checks a strategy's vectorized compute_signals against the event-driven
+# backtest: both run over the same 1m bars, the order lists must match and
+# the two run times are compared
+#
+# python scripts/compare_signals.py --strategy regime_aware --start 2025-12-19T00:00:00 --end 2025-12-29T23:59:00
+# python scripts/compare_signals.py --strategy mean_reversion --config '{"bb_period": 30}' --start ... --end ...
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import argparse
+import json
+import logging
+import math
+import time
+from datetime import datetime
+
+from src.backtesting.backtest import BacktestEngine, Replay, StrategyRun
+from src.strategy.registry import available, create_strategy
+from src.utils.logger import setup_logger
+
+
+def compare_orders(event_orders, vector_orders, rel_tol=1e-9, names=("event-driven", "vectorized")):
+    # index and description of every mismatch, prices and sizes within rel_tol
+    mismatches = []
+    for i in range(max(len(event_orders), len(vector_orders))):
+        a = event_orders[i] if i < len(event_orders) else None
+        b = vector_orders[i] if i < len(vector_orders) else None
+        if a is None or b is None:
+            mismatches.append((i, f"only in {names[0] if b is None else names[1]}: {a or b}"))
+            continue
+        for field in ("timestamp", "side", "symbol", "order_id"):
+            if a[field] != b[field]:
+                mismatches.append((i, f"{field} {a[field]} != {b[field]}"))
+        for field in ("price", "size"):
+            if not math.isclose(a[field], b[field], rel_tol=rel_tol):
+                mismatches.append((i, f"{field} {a[field]} != {b[field]}"))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="compare vectorized and event-driven strategy signals")
+    parser.add_argument("--strategy", choices=available(), default="regime_aware")
+    parser.add_argument("--config", type=str, default="{}", help="Strategy config as JSON")
+    parser.add_argument("--data-1m", type=str, default="data/eth_1m.csv")
+    parser.add_argument("--start", type=str, required=True)
+    parser.add_argument("--end", type=str, required=True)
+    parser.add_argument("--cash", type=float, default=100000)
+    parser.add_argument("--show", type=int, default=10, help="Mismatches printed")
+    parser.add_argument("--logfile", type=str, default="logs/compare_signals.log")
+    args = parser.parse_args()
+
+    logger = setup_logger(name="compare_signals", level=logging.INFO, logfile=args.logfile)
+    config = json.loads(args.config)
+
+    engine = BacktestEngine([], data_source_1m=args.data_1m, logger=logger)
+    bars = engine.load_bars(datetime.fromisoformat(args.start), datetime.fromisoformat(args.end))
+
+    started = time.perf_counter()
+    try:
+        _, vector_orders = create_strategy(args.strategy, dict(config)).compute_signals(bars, cash=args.cash)
+    except NotImplementedError as e:
+        parser.error(str(e))
+    vector_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    run = StrategyRun(args.strategy, create_strategy(args.strategy, dict(config)))
+    Replay([run], bars, cash=args.cash).run_until(len(bars))
+    event_orders = run.trade_tracker.get_all_orders()
+    event_seconds = time.perf_counter() - started
+
+    mismatches = compare_orders(event_orders, vector_orders)
+
+    print(f"\n{args.strategy} over {len(bars)} 1m bars")
+    print("_" * 80)
+    print(f"  {'Event-driven':<16} {len(event_orders):>6} orders {event_seconds:>10.3f}s")
+    print(f"  {'Vectorized':<16} {len(vector_orders):>6} orders {vector_seconds:>10.3f}s")
+    print(f"  {'Speedup':<16} {event_seconds / vector_seconds:>24.0f}x")
+    print(f"  {'Mismatches':<16} {len(mismatches):>6}")
+    for i, what in mismatches[:args.show]:
+        print(f"    order {i + 1}: {what}")
+    print()
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
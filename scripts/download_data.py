@@ -1,89 +1,222 @@
-import sys
-import os
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-from datetime import datetime, timedelta
-from config.config import load_config
-from src.trading.exchange import BinanceClient
-import csv
-
-def fetch_and_save(symbol, timeframe, start_date, end_date, output_file):
-    config = load_config()
-    client = BinanceClient(config.BINANCE_API_KEY, config.BINANCE_API_SECRET, base_url="https://api.binance.com")
-    
-    print(f"Getting {timeframe} data for {symbol} from {start_date} to {end_date}...")
-
-    all_bars = []
-    current_start = start_date
-    limit = 1000
-    
-    while current_start < end_date:
-        start_ms = int(current_start.timestamp() * 1000)
-        end_ms = int(end_date.timestamp() * 1000)
-        
-        bars = client.get_historical_klines(symbol, timeframe, start=start_ms, end=end_ms, limit=limit)
-        if not bars:
-            break
-            
-        all_bars.extend(bars)
-        
-        last_ts = bars[-1].timestamp
-        if timeframe == "1m":
-            next_start = last_ts + timedelta(minutes=1)
-        elif timeframe == "15m":
-            next_start = last_ts + timedelta(minutes=15)
-        elif timeframe == "1h":
-            next_start = last_ts + timedelta(hours=1)
-        else:
-            next_start = last_ts + timedelta(minutes=1)
-            
-        if next_start <= current_start:
-            next_start = current_start + timedelta(minutes=1)
-        current_start = next_start
-        
-        print(f"Fetched {len(bars)} bars, progress to: {last_ts}")
-        
-    filtered_bars = [b for b in all_bars if start_date <= b.timestamp <= end_date]
-    
-    seen = set()
-    deduped_bars = []
-    for b in filtered_bars:
-        if b.timestamp not in seen:
-            seen.add(b.timestamp)
-            deduped_bars.append(b)
-            
-    deduped_bars.sort(key=lambda x: x.timestamp)
-    
-    with open(output_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['timestamp', 'open', 'high', 'low', 'close', 'volume', 'symbol', 'timeframe'])
-        
-        for bar in deduped_bars:
-            writer.writerow([
-                bar.timestamp.isoformat(),
-                bar.open,
-                bar.high,
-                bar.low,
-                bar.close,
-                bar.volume,
-                bar.symbol,
-                bar.timeframe
-            ])
-    
-    print(f"Saved {len(deduped_bars)} unique bars to {output_file}")
-    return len(deduped_bars)
-
-if __name__ == "__main__":
-    start_date = datetime.strptime('2025-12-19 00:00:00', '%Y-%m-%d %H:%M:%S')
-    end_date = datetime.strptime('2025-12-29 23:59:00', '%Y-%m-%d %H:%M:%S')
-    
-    symbol = "ETHUSDT"
-    
-    count_1m = fetch_and_save(
-        symbol=symbol,
-        timeframe="1m",
-        start_date=start_date,
-        end_date=end_date,
-        output_file="data/eth_1m.csv"
-    )
-    
-    print(f"Data fetched: {count_1m} 1-minute bars")
\ No newline at end of file
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from datetime import datetime
+from config.config import load_config
+from src.trading.exchange import BinanceClient, klines_weight
+from src.utils.candle_cache import BAR_DTYPE, TIMEFRAME_MS, CandleCache, from_ms, to_ms
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import argparse
+import csv
+import threading
+import time
+import numpy as np
+import requests
+
+CACHE_DIR = os.path.join("data", "cache", "api.binance.com")
+
+# candles per klines request; the 1m weight budget on spot is 6000
+WINDOW_BARS = 1000
+KLINES_WEIGHT = klines_weight(WINDOW_BARS)
+
+
+class WeightLimiter:
+    # rolling one minute request-weight budget shared by the download workers.
+    # the exchange also reports the weight the whole IP used in the last
+    # minute (X-MBX-USED-WEIGHT-1M), other processes included; for a minute
+    # after the request it answered, that weight plus what the workers sent
+    # since is held against the budget too
+
+    def __init__(self, weight_per_minute):
+        self.weight_per_minute = weight_per_minute
+        self.lock = threading.Lock()
+        self.spent = deque()
+        self.blocked_until = 0.0
+        # (acquire time of the request, weight it reported)
+        self.reported = (0.0, 0)
+
+    def acquire(self, weight):
+        # blocks until weight fits the budget; returns the time it was taken
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.spent and now - self.spent[0][0] >= 60.0:
+                    self.spent.popleft()
+                used = sum(w for _, w in self.spent)
+                since = self.reported[0]
+                reported = self._reported_by(now, *self.reported)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif not since and self.spent:
+                    # the first request finds out what the IP already used
+                    wait = 0.05
+                elif reported + weight > self.weight_per_minute:
+                    wait = 60.0 - (now - since)
+                elif used + weight <= self.weight_per_minute or not self.spent:
+                    self.spent.append((now, weight))
+                    return now
+                else:
+                    # until the oldest request leaves the window
+                    wait = 60.0 - (now - self.spent[0][0])
+            time.sleep(min(max(wait, 0.05), 5.0))
+
+    def _reported_by(self, now, since, reported):
+        # weight the exchange saw by now from a report on the request taken
+        # at since: what it reported plus what the workers sent after it
+        if not since or now - since >= 60.0:
+            return 0
+        return reported + sum(w for t, w in self.spent if t > since)
+
+    def observe(self, used_weight, acquired):
+        # the X-MBX-USED-WEIGHT-1M of the response to a request taken at
+        # acquired. responses can arrive out of order, so the report that
+        # puts the weight used by now highest is kept
+        with self.lock:
+            now = time.monotonic()
+            if self._reported_by(now, acquired, used_weight) >= self._reported_by(now, *self.reported):
+                self.reported = (acquired, used_weight)
+
+    def back_off(self, seconds):
+        # the exchange answered 429/418, stop every worker for a while
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def fetch_window(clients, limiter, symbol, timeframe, start_ms, end_ms, retries=5):
+    # one klines page as BAR_DTYPE records, retried on rate limits and
+    # transient errors
+    client = clients()
+    for attempt in range(retries):
+        acquired = limiter.acquire(KLINES_WEIGHT)
+        try:
+            rows = client.get_klines_array(symbol, timeframe, start=start_ms, end=end_ms, limit=WINDOW_BARS)
+            limiter.observe(client.used_weight, acquired)
+            break
+        except requests.HTTPError as e:
+            limiter.observe(client.used_weight, acquired)
+            status = e.response.status_code if e.response is not None else None
+            if status in (418, 429):
+                limiter.back_off(float(e.response.headers.get("Retry-After", 60)))
+            elif status is not None and status < 500:
+                raise
+            time.sleep(2 ** attempt)
+        except requests.RequestException:
+            time.sleep(2 ** attempt)
+    else:
+        raise RuntimeError(f"giving up on {symbol} {timeframe} window starting {from_ms(start_ms)}")
+
+    records = np.empty(len(rows), dtype=BAR_DTYPE)
+    records["ts"] = rows[:, 0].astype(np.int64)
+    for i, name in enumerate(["open", "high", "low", "close", "volume"], start=1):
+        records[name] = rows[:, i]
+    return records
+
+
+def download(cache, clients, symbol, timeframe, start_ms, end_ms, workers=8, weight_limit=6000, flush_bars=50_000):
+    # fetch every range of [start_ms, end_ms] missing from the cache. windows
+    # of 1000 candles are requested concurrently but stored in order, in
+    # chunks of flush_bars, and the cache coverage is the resume point
+    step = TIMEFRAME_MS[timeframe]
+    limiter = WeightLimiter(weight_limit)
+    fetched = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for gap_start, gap_end in cache.missing(symbol, timeframe, start_ms, end_ms):
+            windows = deque(
+                (lo, min(lo + step * WINDOW_BARS - 1, gap_end))
+                for lo in range(gap_start, gap_end + 1, step * WINDOW_BARS)
+            )
+            in_flight = deque()
+            buffered = []
+            buffered_from = gap_start
+            buffered_bars = 0
+
+            while windows or in_flight:
+                while windows and len(in_flight) < workers * 2:
+                    lo, hi = windows.popleft()
+                    in_flight.append((lo, hi, pool.submit(fetch_window, clients, limiter, symbol, timeframe, lo, hi)))
+
+                lo, hi, future = in_flight.popleft()
+                records = future.result()
+                buffered.append(records)
+                buffered_bars += len(records)
+                fetched += len(records)
+
+                if buffered_bars >= flush_bars or not (windows or in_flight):
+                    cache.store(symbol, timeframe, np.concatenate(buffered), buffered_from, hi)
+                    print(f"Stored {buffered_bars} bars, progress to: {from_ms(hi)}")
+                    buffered, buffered_from, buffered_bars = [], hi + 1, 0
+
+    return fetched
+
+
+def export_csv(cache, symbol, timeframe, start_ms, end_ms, output_file, chunk=100_000):
+    # stream cached candles to csv without loading the whole range as Bars
+    records = cache.view(symbol, timeframe)
+    ts = records["ts"]
+    lo = int(np.searchsorted(ts, start_ms, side="left"))
+    hi = int(np.searchsorted(ts, end_ms, side="right"))
+
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'open', 'high', 'low', 'close', 'volume', 'symbol', 'timeframe'])
+
+        for i in range(lo, hi, chunk):
+            for t, o, h, l, c, v in records[i:min(i + chunk, hi)].tolist():
+                writer.writerow([from_ms(t).isoformat(), o, h, l, c, v, symbol, timeframe])
+
+    return hi - lo
+
+
+def fetch_and_save(symbol, timeframe, start_date, end_date, output_file, cache_dir=CACHE_DIR, workers=8, weight_limit=6000, base_url="https://api.binance.com"):
+    config = load_config()
+    local = threading.local()
+
+    def clients():
+        # requests sessions are not shared between worker threads
+        if not hasattr(local, "client"):
+            local.client = BinanceClient(config.BINANCE_API_KEY, config.BINANCE_API_SECRET, base_url=base_url)
+        return local.client
+
+    cache = CandleCache(cache_dir)
+
+    print(f"Getting {timeframe} data for {symbol} from {start_date} to {end_date}...")
+
+    # only ranges missing from the local cache go over the network
+    start_ms, end_ms = to_ms(start_date), to_ms(end_date)
+    now = int(time.time() * 1000)
+    step = TIMEFRAME_MS[timeframe]
+    fetched = download(cache, clients, symbol, timeframe, start_ms, min(end_ms, now - now % step - step), workers=workers, weight_limit=weight_limit)
+
+    count = export_csv(cache, symbol, timeframe, start_ms, end_ms, output_file)
+    print(f"Fetched {fetched} new bars, {count - fetched} served from {cache_dir}")
+    print(f"Saved {count} unique bars to {output_file}")
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="download historical klines into the candle cache and a csv")
+    parser.add_argument("--symbol", type=str, default="ETHUSDT")
+    parser.add_argument("--timeframe", choices=sorted(TIMEFRAME_MS), default="1m")
+    parser.add_argument("--start", type=str, default="2025-12-19T00:00:00")
+    parser.add_argument("--end", type=str, default="2025-12-29T23:59:00")
+    parser.add_argument("--output", type=str, default="data/eth_1m.csv")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent klines requests")
+    parser.add_argument("--weight-limit", type=int, default=6000, help="Request weight allowed per minute")
+    parser.add_argument("--cache-dir", type=str, default=CACHE_DIR)
+    parser.add_argument("--base-url", type=str, default="https://api.binance.com")
+    args = parser.parse_args()
+
+    count_1m = fetch_and_save(
+        symbol=args.symbol,
+        timeframe=args.timeframe,
+        start_date=datetime.fromisoformat(args.start),
+        end_date=datetime.fromisoformat(args.end),
+        output_file=args.output,
+        cache_dir=args.cache_dir,
+        workers=args.workers,
+        weight_limit=args.weight_limit,
+        base_url=args.base_url,
+    )
+
+    print(f"Data fetched: {count_1m} {args.timeframe} bars")
@@ -0,0 +1,97 @@
+# cold start import report: runs each startup path in a fresh interpreter
+# with -X importtime and prints its wall time, module count, the slowest
+# imports and whether the backtesting stack got loaded
+#
+# python scripts/import_report.py
+# python scripts/import_report.py --strategy regime_aware --top 15
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import argparse
+import json
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+HEAVY = ["backtesting", "src.backtesting.backtest", "pandas", "bokeh"]
+
+SCENARIOS = {
+    "executor import": "import src.trading.executor",
+    "live startup": (
+        "import src.trading.executor\n"
+        "from src.strategy.registry import create_strategy\n"
+        "create_strategy({strategy!r})"
+    ),
+    "backtest startup": (
+        "import src.trading.executor\n"
+        "from src.strategy.registry import create_strategy\n"
+        "create_strategy({strategy!r})\n"
+        "from src.backtesting.backtest import BacktestEngine"
+    ),
+}
+
+PROBE = """
+import sys, time, json
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def parse_importtime(stderr):
+    # (self us, cumulative us, module) for every import line
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # nested imports are indented two spaces per level
+        rows.append((int(self_us), int(cumulative_us), name[1:].rstrip()))
+    return rows
+
+
+def run_scenario(code, repeat=3):
+    # best of repeat fresh interpreters, import times from the fastest one
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE.format(root=ROOT, code=code)],
+            capture_output=True, text=True, cwd=ROOT, check=True,
+        )
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best[0]["seconds"]:
+            best = (result, parse_importtime(proc.stderr))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="import time report of the executor startup paths")
+    parser.add_argument("--strategy", type=str, default="multi_tf")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports listed per path")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per path, the fastest is reported")
+    args = parser.parse_args()
+
+    for label, template in SCENARIOS.items():
+        result, rows = run_scenario(template.format(strategy=args.strategy), args.repeat)
+        loaded = set(result["modules"])
+
+        print(f"\n{label} ({args.strategy})")
+        print("_" * 80)
+        print(f"  {'Wall time':<26} {result['seconds'] * 1000:.1f} ms")
+        print(f"  {'Modules loaded':<26} {len(loaded)}")
+        for name in HEAVY:
+            print(f"  {name:<26} {'loaded' if name in loaded else '-'}")
+
+        print(f"\n  {'Top-level import':<44} {'cumulative ms':>14}")
+        top_level = [r for r in rows if not r[2].startswith(" ")]
+        for self_us, cumulative_us, name in sorted(top_level, key=lambda r: r[1], reverse=True)[:args.top]:
+            print(f"  {name.strip():<44} {cumulative_us / 1000:>14.1f}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# runs the live executor against the local mock exchange for many symbols at
+# once, to soak/load test the live path without network access
+#
+# python scripts/load_test.py --symbols 20 --iterations 30 --poll-interval 0.5 --speed 600 --latency-ms 20 --error-rate 0.01
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import argparse
+import logging
+import tempfile
+import threading
+import time
+
+from src.trading.exchange import BinanceClient
+from src.trading.executor import Executor
+from src.trading.mock_exchange import MockExchange
+from src.strategy.registry import available, create_strategy
+from src.utils.logger import setup_logger
+
+
+def run_symbol(exchange, symbol, args, out_dir, results):
+    logger = setup_logger(name=f"loadtest.{symbol}", level=logging.WARNING, logfile=os.path.join(out_dir, f"{symbol}.log"))
+    broker = BinanceClient(exchange.api_key, exchange.api_secret, base_url=exchange.base_url)
+    execr = Executor(create_strategy(args.strategy), broker=broker, logger=logger)
+
+    started = time.monotonic()
+    execr.run_live(
+        symbol=symbol,
+        poll_interval=args.poll_interval,
+        order_workers=args.order_workers,
+        trades_path=os.path.join(out_dir, f"{symbol}_trades.csv"),
+        max_iterations=args.iterations,
+    )
+    results[symbol] = {
+        "seconds": time.monotonic() - started,
+        "orders": len(execr.trade_tracker.get_all_orders()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="load test the live executor against a local mock exchange")
+    parser.add_argument("--data-1m", type=str, default="data/eth_1m.csv")
+    parser.add_argument("--symbols", type=int, default=10, help="Number of symbols traded concurrently")
+    parser.add_argument("--strategy", choices=available(), default="regime_aware")
+    parser.add_argument("--iterations", type=int, default=20, help="Live loop iterations per symbol")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--order-workers", type=int, default=4)
+    parser.add_argument("--speed", type=float, default=60.0, help="Simulated seconds per wall second")
+    parser.add_argument("--start", type=str, help="Replay start time, default is the first bar + 10 days of warmup")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--weight-limit", type=int, default=1200)
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--out-dir", type=str, help="Where per-symbol logs and trade files go")
+    args = parser.parse_args()
+
+    out_dir = args.out_dir or tempfile.mkdtemp(prefix="stratix-load-")
+    os.makedirs(out_dir, exist_ok=True)
+
+    symbols = ["ETHUSDT"] + [f"SYM{i}USDT" for i in range(1, args.symbols)]
+    exchange = MockExchange(
+        data_path=args.data_1m, symbols=symbols, port=args.port, speed=args.speed, start=args.start,
+        latency_ms=args.latency_ms, latency_jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, weight_limit=args.weight_limit,
+    )
+    if args.start is None:
+        # leave enough replayed history for the strategies to prefill
+        exchange.clock.set(min(int(exchange.ts[0]) + 10 * 86_400_000, int(exchange.ts[-1])))
+    exchange.start()
+    print(f"Mock exchange on {exchange.base_url}, writing to {out_dir}")
+
+    results = {}
+    threads = [
+        threading.Thread(target=run_symbol, args=(exchange, s, args, out_dir, results), name=s)
+        for s in symbols
+    ]
+
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.monotonic() - started
+    exchange.stop()
+
+    total_requests = sum(exchange.stats["requests"].values())
+    print(f"\n{len(symbols)} symbols x {args.iterations} iterations in {wall:.2f}s")
+    print(f"  {'Requests':<22} {total_requests} ({total_requests / wall:.1f}/s)")
+    for path, count in sorted(exchange.stats["requests"].items()):
+        print(f"  {path:<22} {count}")
+    for k in ["orders", "fills", "errors_injected", "rate_limited", "auth_failures"]:
+        print(f"  {k:<22} {exchange.stats[k]}")
+    print(f"  {'Orders logged':<22} {sum(r['orders'] for r in results.values())}")
+    if len(results) < len(symbols):
+        print(f"  {'Executors failed':<22} {len(symbols) - len(results)}")
+
+
+if __name__ == "__main__":
+    main()
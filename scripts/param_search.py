@@ -0,0 +1,135 @@
+# successive halving parameter search over a strategy config grid
+#
+# python scripts/param_search.py --strategy multi_tf --grid '{"ema_fast_period": [10, 15, 20], "atr_multiplier": [1.5, 2.0, 3.0]}' --start 2025-12-19T00:00:00 --end 2025-12-29T23:59:00
+# python scripts/param_search.py ... --full-grid   # also run the exhaustive grid and compare
+# python scripts/param_search.py --strategy multi_tf --vectorized ...   # rank the whole grid in one numpy pass
+# python scripts/param_search.py --strategy regime_aware --vectorized --grid '{"stop_atr_mult": [1.5, 2.5], "target_vol": [0.3, 0.4]}' ...
+# python scripts/param_search.py --strategy regime_aware --fork-workers 4 ...   # replay the grid from one shared warmup
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import argparse
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+
+from src.backtesting.backtest import BacktestEngine
+from src.backtesting.search import METRICS, SuccessiveHalving, fork_grid, full_grid, grid, rank_macd_grid, stream_grid
+from src.backtesting.signal_cache import SignalCache
+from src.strategy.registry import available
+from src.utils.logger import setup_logger
+
+
+def print_ranking(title, ranked, metric, limit):
+    print(f"\n{title}")
+    print("_" * 80)
+    for config, score in ranked[:limit]:
+        print(f"  {metric}={score:<14.4f} {json.dumps(config, sort_keys=True)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="successive halving search over strategy configs")
+    parser.add_argument("--strategy", choices=available(), default="multi_tf")
+    parser.add_argument("--grid", type=str, required=True, help='JSON {"param": [values, ...]}, or @file.json')
+    parser.add_argument("--data-1m", type=str, default="data/eth_1m.csv")
+    parser.add_argument("--start", type=str, required=True)
+    parser.add_argument("--end", type=str, required=True)
+    parser.add_argument("--metric", choices=METRICS, default="pnl")
+    parser.add_argument("--eta", type=int, default=2, help="Keep 1/eta of the candidates per rung, windows grow eta times")
+    parser.add_argument("--first-days", type=float, default=2.0, help="Length of the first rung's window")
+    parser.add_argument("--keep", type=int, default=3, help="Never keep fewer candidates than this")
+    parser.add_argument("--checkpoint", type=str, help="Pickle of the search state, resumed if it matches")
+    parser.add_argument("--full-grid", action="store_true", help="Also run every candidate over the whole range and compare")
+    parser.add_argument("--vectorized", action="store_true", help="Rank every config from vectorized signal streams instead of the search")
+    parser.add_argument("--signal-cache", type=str, help="Directory to keep signal streams in across runs (--vectorized)")
+    parser.add_argument("--fork-workers", type=int, help="Replay every config in this many forked processes, sharing one warmup per group of configs with the same WARMUP_PARAMS")
+    parser.add_argument("--logfile", type=str, default="logs/param_search.log")
+    args = parser.parse_args()
+
+    logger = setup_logger(name="param_search", level=logging.INFO, logfile=args.logfile)
+
+    space = args.grid
+    if space.startswith("@"):
+        with open(space[1:]) as f:
+            space = f.read()
+    configs = grid(json.loads(space))
+
+    engine = BacktestEngine([], data_source_1m=args.data_1m, logger=logger)
+    bars = engine.load_bars(datetime.fromisoformat(args.start), datetime.fromisoformat(args.end))
+    print(f"{len(configs)} candidates, {len(bars)} 1m bars")
+
+    if args.vectorized:
+        # multi_tf sizes the whole grid in bulk, other strategies replay each
+        # config on a signal stream shared by configs with the same signal params
+        cache = SignalCache(args.signal_cache)
+        started = time.process_time()
+        try:
+            if args.strategy == "multi_tf":
+                ranked = rank_macd_grid(configs, bars, metric=args.metric)
+            else:
+                ranked = stream_grid(args.strategy, configs, bars, metric=args.metric, cache=cache)
+        except NotImplementedError as e:
+            parser.error(f"--vectorized: {e}")
+        vector_cpu = time.process_time() - started
+        print_ranking("VECTORIZED GRID", ranked, args.metric, args.keep)
+        print(f"\n  CPU {vector_cpu:.2f}s, {cache.misses} signal streams computed, {cache.hits} reused")
+
+        if args.full_grid:
+            started = time.process_time()
+            replayed = full_grid(args.strategy, configs, bars, metric=args.metric)
+            grid_cpu = time.process_time() - started
+            print_ranking("FULL GRID", replayed, args.metric, args.keep)
+            same = [c for c, _ in ranked] == [c for c, _ in replayed]
+            print(f"\n  CPU {grid_cpu:.1f}s, ranking {'identical' if same else 'DIFFERS'}, {grid_cpu / vector_cpu:.0f}x the vectorized CPU")
+        return
+
+    if args.fork_workers:
+        started = time.perf_counter()
+        ranked = fork_grid(args.strategy, configs, bars, metric=args.metric, workers=args.fork_workers, logger=logger)
+        fork_seconds = time.perf_counter() - started
+        print_ranking("FORKED GRID", ranked, args.metric, args.keep)
+        print(f"\n  {fork_seconds:.1f}s with {args.fork_workers} workers")
+
+        if args.full_grid:
+            started = time.perf_counter()
+            replayed = full_grid(args.strategy, configs, bars, metric=args.metric)
+            grid_seconds = time.perf_counter() - started
+            print_ranking("FULL GRID", replayed, args.metric, args.keep)
+            same = ranked == replayed
+            print(f"\n  {grid_seconds:.1f}s, scores {'identical' if same else 'DIFFER'}")
+        return
+
+    search = SuccessiveHalving(
+        args.strategy, configs, bars,
+        first_window=timedelta(days=args.first_days),
+        eta=args.eta,
+        keep=args.keep,
+        metric=args.metric,
+        checkpoint=args.checkpoint,
+        logger=logger,
+    )
+    started = time.process_time()
+    survivors = search.run()
+    search_cpu = time.process_time() - started
+
+    for rung, stop, scores in search.history:
+        print(f"  rung {rung + 1}: {len(scores)} candidates over {stop} bars")
+    print_ranking("SUCCESSIVE HALVING", survivors, args.metric, args.keep)
+    print(f"\n  CPU {search_cpu:.1f}s, {search.work / (len(configs) * len(bars)):.0%} of the full grid's candidate-bars")
+
+    if args.full_grid:
+        started = time.process_time()
+        ranked = full_grid(args.strategy, configs, bars, metric=args.metric)
+        grid_cpu = time.process_time() - started
+
+        print_ranking("FULL GRID", ranked, args.metric, args.keep)
+        top = {json.dumps(c, sort_keys=True) for c, _ in ranked[:args.keep]}
+        found = sum(json.dumps(c, sort_keys=True) in top for c, _ in survivors[:args.keep])
+        print(f"\n  CPU {grid_cpu:.1f}s, search found {found}/{len(top)} of the grid's top {args.keep} at {search_cpu / grid_cpu:.0%} of its CPU")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# materializes the closed higher timeframe candles of a 1m csv next to it
+# (<csv dir>/resampled/), or of cached 1m candles with --cache-dir. reruns
+# only aggregate the rows appended since the last run
+#
+# python scripts/resample_bars.py --data-1m data/eth_1m.csv
+# python scripts/resample_bars.py --cache-dir data/cache/api.binance.com --symbol ETHUSDT
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import argparse
+import time
+
+import numpy as np
+
+from src.utils.candle_cache import CandleCache
+from src.utils.data import load_ohlcv_batch
+from src.utils.resampled import ResampledBars, csv_source
+from src.utils.types import BarBatch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="materialize closed 15m/1h candles of 1m data")
+    parser.add_argument("--data-1m", type=str, default="data/eth_1m.csv")
+    parser.add_argument("--cache-dir", type=str, help="Candle cache root to read the 1m candles of --symbol from instead")
+    parser.add_argument("--symbol", type=str, default="ETHUSDT")
+    parser.add_argument("--timeframes", nargs="+", choices=["15m", "1h"], default=["15m", "1h"])
+    args = parser.parse_args()
+
+    if args.cache_dir:
+        cache = CandleCache(args.cache_dir)
+        base = BarBatch.from_records(np.array(cache.view(args.symbol, "1m")), args.symbol, "1m")
+        root, source = os.path.join(args.cache_dir, "resampled"), f"{args.symbol}_1m"
+    else:
+        base = load_ohlcv_batch(args.data_1m).sorted()
+        root, source = csv_source(args.data_1m)
+
+    resampled = ResampledBars(root)
+    print(f"{len(base)} 1m bars of {base.symbol}")
+    for timeframe in args.timeframes:
+        started = time.perf_counter()
+        status = resampled.update(source, base, timeframe)
+        seconds = time.perf_counter() - started
+        print(f"  {timeframe:<4} {status:<9} {len(resampled.view(source, timeframe)):>8} closed candles  {seconds:.3f}s  {resampled.path(source, timeframe)}")
+
+
+if __name__ == "__main__":
+    main()
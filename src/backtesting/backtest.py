@@ -1,3 +1,4 @@
+import pickle
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
@@ -5,116 +6,268 @@ from backtesting import Backtest, Strategy as BacktestStrategy
 
 from src.utils.types import *
 from src.utils.logger import *
-from src.utils.data import load_ohlcv_csv, write_trades
+from src.utils.data import load_ohlcv_batch, write_trades
+from src.utils.candles import CandleIndex, CandleStore, interval_start
+from src.utils.data_quality import check_bars
+from src.backtesting.order_book import RESTING_TYPES, OrderBook
+from src.backtesting.result_cache import result_key
 from src.utils.types import AccountInfo
 from src.utils.trade_tracker import TradeTracker
 from src.trading.exchange import BinanceClient
 from config.config import load_config
 
+# bump whenever a change to the engine can change the orders it produces, so
+# results stored by an older engine are not reused
+ENGINE_VERSION = 2
 
-class StrategyAdapter(BacktestStrategy):
+
+class StrategyRun:
+    # one strategy inside a backtest pass, with its own account, order
+    # tracker and order ids, so strategies sharing a pass never interact
     
-    def init(self):
-        self.custom_strategy = self.custom_strategy_instance
-        self.trade_tracker = self.trade_tracker_instance
-        self.logger_instance = self.logger_instance_ref
+    def __init__(self, name, strategy):
+        self.name = name
+        self.strategy = strategy
+        self.trade_tracker = TradeTracker()
+        self.account_balance = 0.0
         self.order_counter = 0
+        self.result_key = None
+        self.metrics = None
+        # event-skipping replays: next row the strategy is due and the last
+        # row it was stepped on
+        self.wake_row = 0
+        self.last_row = None
+        # resting LIMIT/STOP orders, matched against every 1m bar
+        self.book = OrderBook()
+
+
+def first_cross(values, start, end, level, above):
+    # first row in [start, end) whose value reaches level (>= when above,
+    # <= otherwise), end if none does; scanned in growing chunks so a level
+    # that is reached soon does not cost a pass over the rest of the data
+    chunk = 256
+    while start < end:
+        stop = min(end, start + chunk)
+        window = values[start:stop]
+        hits = np.flatnonzero(window >= level if above else window <= level)
+        if len(hits):
+            return start + int(hits[0])
+        start = stop
+        chunk *= 4
+    return end
+
+
+class Replay:
+    # the per-minute backtest loop: feeds the rows of a 1m BarBatch through
+    # one CandleStore and steps every StrategyRun on the resulting 15m/1h
+    # candles. it can be stopped after any row and continued later, which is
+    # what the parameter search uses to extend surviving candidates
+    #
+    # with event_skip a strategy is only stepped on the rows its next_wakeup
+    # asks for, found with searches over the 1m timestamps and high/low
+    # arrays; candles of those rows come from a CandleIndex instead of
+    # feeding every skipped bar through the candle store
+    #
+    # start_row starts the replay part way into the bars, as if they began
+    # there; time shards use it to warm up before their cut
+    
+    def __init__(self, runs, bars_1m, logger=None, cash=100000, event_skip=False, start_row=0):
+        self.runs = runs
+        self.logger_instance = logger
         
-        self.account_balance = self._broker._cash
+        for run in self.runs:
+            run.account_balance = cash
         
         self.last_1h_bar = None
         self.last_15m_bar = None
-        self.all_bars_1m = self.all_bars_1m_data
+        self.all_bars_1m = bars_1m
+        self.candles = CandleStore(timeframes=("1h", "15m"))
+        self.next_1m_index = start_row
+        # like the backtesting library, the first row is not stepped on its own
+        self.next_row = start_row + 1
+        self.event_skip = event_skip
+        self.candle_index = CandleIndex(bars_1m) if event_skip else None
+        # a list makes every position_size call append (row, pickled
+        # (strategy, signal), balance, size), for time shards to re-check
+        # sizes against the stitched account balance
+        self.sizing_log = None
     
-    def next(self):
-        current_time = self.data.index[-1]
-
-        bar_1h = self._aggregate_bars(current_time, "1h")
-        bar_15m = self._aggregate_bars(current_time, "15m")
-        if bar_1h:
-            if self.logger_instance:
-                log_market_data(self.logger_instance, bar_1h)
-            self.custom_strategy.on_bar(bar_1h)
-            self.last_1h_bar = bar_1h
+    def run_until(self, stop):
+        # step rows up to (not including) stop
+        stop = min(stop, len(self.all_bars_1m))
+        if not self.event_skip:
+            for row in range(self.next_row, stop):
+                self.step(row)
+            return
+        
+        row = self.next_row
+        while row < stop:
+            self._skip_step(row)
+            row = min([run.wake_row for run in self.runs] + [stop])
+        self.next_row = max(self.next_row, stop)
+    
+    def step(self, row):
+        # candles are built once per step and shared by every strategy
+        self._advance_candles(row)
+        self.next_row = row + 1
+        bar_1h = self.candles.current("1h")
+        bar_15m = self.candles.current("15m")
+        if bar_1h and self.logger_instance:
+            log_market_data(self.logger_instance, bar_1h)
+        if bar_15m and self.logger_instance:
+            log_market_data(self.logger_instance, bar_15m)
+        self.last_1h_bar = bar_1h or self.last_1h_bar
+        self.last_15m_bar = bar_15m or self.last_15m_bar
+        
+        for run in self.runs:
+            self._step(run, bar_1h, bar_15m, row)
+    
+    def _skip_step(self, row):
+        # step the runs due at row
+        self.next_row = row + 1
+        due = [run for run in self.runs if run.wake_row <= row]
+        if not due:
+            return
+        
+        bar_1h = self.candle_index.current(row, "1h")
+        bar_15m = self.candle_index.current(row, "15m")
+        if self.logger_instance:
+            log_market_data(self.logger_instance, bar_1h)
+            log_market_data(self.logger_instance, bar_15m)
+        self.last_1h_bar = bar_1h
+        self.last_15m_bar = bar_15m
+        
+        previous = None
+        for run in due:
+            if run.last_row is not None and run.last_row < row - 1:
+                # skipped rows: the strategy gets the candles as of the row
+                # before this one, as a per-row replay would have given it
+                # (completing candles it saw partially), without signals
+                if previous is None:
+                    previous = (self.candle_index.current(row - 1, "1h"), self.candle_index.current(row - 1, "15m"))
+                run.strategy.on_bar(previous[0])
+                run.strategy.on_bar(previous[1])
+            self._step(run, bar_1h, bar_15m, row)
+            run.last_row = row
+            run.wake_row = self._wake_row(run.strategy.next_wakeup(), row + 1)
+            if len(run.book):
+                # resting orders wake the run on the first bar that crosses them
+                above, below = run.book.levels()
+                run.wake_row = min(run.wake_row, self._wake_row(WakeUp(above=above, below=below), row + 1))
+    
+    def _wake_row(self, wake, start):
+        # first row from start that satisfies the WakeUp
+        bars = self.all_bars_1m
+        if wake is None or start >= len(bars):
+            return start
+        end = len(bars)
+        if wake.timestamp is not None:
+            end = max(start, int(np.searchsorted(bars.ts, to_ms(wake.timestamp), side="left")))
+        if wake.above is not None:
+            end = first_cross(bars.high, start, end, wake.above, above=True)
+        if wake.below is not None:
+            end = first_cross(bars.low, start, end, wake.below, above=False)
+        return end
+    
+    def _step(self, run, bar_1h, bar_15m, row):
+        strategy = run.strategy
+        if len(run.book):
+            self._match_book(run, row)
         
+        if bar_1h:
+            strategy.on_bar(bar_1h)
         if bar_15m:
-            if self.logger_instance:
-                log_market_data(self.logger_instance, bar_15m)
-            self.custom_strategy.on_bar(bar_15m)
-            self.last_15m_bar = bar_15m
+            strategy.on_bar(bar_15m)
         
-        signals = self.custom_strategy.generate_signals()
+        signals = strategy.generate_signals()
         
         if signals and self.logger_instance:
             log_signal_generation(self.logger_instance, signals, bar_15m if bar_15m else bar_1h)
         
         for sig in signals:
+            if sig.order_type == "CANCEL":
+                for order in run.book.cancel_all(sig.symbol):
+                    strategy.on_order_update(order)
+                continue
+            
             if sig.side == 0:
                 continue
             
-            account = AccountInfo(balance=self.account_balance, positions={})
-            size = self.custom_strategy.position_size(sig, account)
+            account = AccountInfo(balance=run.account_balance, positions={})
+            state = pickle.dumps((strategy, sig)) if self.sizing_log is not None else None
+            size = strategy.position_size(sig, account)
+            if state is not None:
+                self.sizing_log.append((row, state, account.balance, size))
             
             if size <= 0:
                 continue
             
             sig.size = size
             
-            order = self._submit_order_like_live(sig, bar_15m if bar_15m else bar_1h)
-            
-            order_record = self.trade_tracker.add_order(order)
+            order = self._submit_order_like_live(run, sig, bar_15m if bar_15m else bar_1h)
+            if order.status == "FILLED":
+                self._record_fill(run, order)
+    
+    def _match_book(self, run, row):
+        # resting orders crossed by this row's 1m bar fill before the
+        # strategy sees the bar's candles. like market fills, they are
+        # stamped with the open of the 15m candle, so the order log keeps
+        # one clock
+        bar = self.all_bars_1m[row]
+        for order in run.book.match(bar, timestamp=interval_start(bar.timestamp, "15m")):
             if self.logger_instance:
-                log_trade(self.logger_instance, order_record)
-            
-            if order.side == "BUY":
-                self.account_balance -= order.filled_size * order.price
-            elif order.side == "SELL":
-                self.account_balance += order.filled_size * order.price
-    
-    def _aggregate_bars(self, current_time, timeframe):
-        if timeframe == "15m":
-            interval_minutes = 15
-        elif timeframe == "1h":
-            interval_minutes = 60
-        else:
-            return None
-        
-        minutes_since_midnight = current_time.hour * 60 + current_time.minute
-        interval_start_minutes = (minutes_since_midnight // interval_minutes) * interval_minutes
-        interval_start = current_time.replace(
-            hour=interval_start_minutes // 60,
-            minute=interval_start_minutes % 60,
-            second=0,
-            microsecond=0
-        )
-        
-        relevant_bars = [
-            b for b in self.all_bars_1m 
-            if interval_start <= b.timestamp <= current_time
-        ]
-        
-        if not relevant_bars:
-            return None
-        aggregated_bar = Bar(
-            symbol=relevant_bars[0].symbol,
-            timeframe=timeframe,
-            timestamp=interval_start,
-            open=relevant_bars[0].open,
-            high=max(b.high for b in relevant_bars),
-            low=min(b.low for b in relevant_bars),
-            close=relevant_bars[-1].close,
-            volume=sum(b.volume for b in relevant_bars)
-        )
+                log_order_fill(self.logger_instance, order)
+            run.strategy.on_order_filled(order)
+            self._record_fill(run, order)
+    
+    def _record_fill(self, run, order):
+        order_record = run.trade_tracker.add_order(order)
+        if self.logger_instance:
+            log_trade(self.logger_instance, order_record)
         
-        return aggregated_bar
+        if order.side == "BUY":
+            run.account_balance -= order.filled_size * order.price
+        elif order.side == "SELL":
+            run.account_balance += order.filled_size * order.price
     
-    def _submit_order_like_live(self, signal, bar):
+    def _advance_candles(self, row):
+        # feed the candle store every 1m bar up to the current one, the store
+        # keeps the running 15m/1h candles so each step is O(1). the 1m bars
+        # are a BarBatch, Bar objects are only built here as each row is fed
+        ts = self.all_bars_1m.ts
+        current_ms = ts[row]
+        while self.next_1m_index < len(ts) and ts[self.next_1m_index] <= current_ms:
+            self.candles.add(self.all_bars_1m[self.next_1m_index])
+            self.next_1m_index += 1
+    
+    def _submit_order_like_live(self, run, signal, bar):
         order_side = "BUY" if signal.side == 1 else "SELL" if signal.side == -1 else "HOLD"
-        fill_price = bar.close
         
-        self.order_counter += 1
+        run.order_counter += 1
+        if signal.order_type in RESTING_TYPES:
+            # rests in the run's book until a later 1m bar crosses its price
+            if signal.price is None:
+                raise ValueError(f"{signal.order_type} signal needs a price")
+            order = Order(
+                id=f"bt-{run.order_counter}",
+                symbol=signal.symbol,
+                side=order_side,
+                size=signal.size,
+                price=signal.price,
+                status="NEW",
+                filled_size=0.0,
+                timestamp=bar.timestamp,
+                order_type=signal.order_type,
+            )
+            run.book.add(order)
+            if self.logger_instance:
+                log_order_placement(self.logger_instance, order)
+            run.strategy.on_order_update(order)
+            return order
+        
+        fill_price = bar.close
         order = Order(
-            id=f"bt-{self.order_counter}",
+            id=f"bt-{run.order_counter}",
             symbol=signal.symbol,
             side=order_side,
             size=signal.size,
@@ -127,17 +280,64 @@ class StrategyAdapter(BacktestStrategy):
         if self.logger_instance:
             log_order_placement(self.logger_instance, order)
             log_order_fill(self.logger_instance, order)
-        self.custom_strategy.on_order_filled(order)
+        run.strategy.on_order_filled(order)
         return order
 
 
+class StrategyAdapter(BacktestStrategy):
+    
+    def init(self):
+        self.replay = Replay(self.strategy_runs, self.all_bars_1m_data, self.logger_instance_ref, self._broker._cash)
+    
+    def next(self):
+        # data rows line up with the 1m batch rows
+        self.replay.run_until(len(self.data))
+
+
 class BacktestEngine:
-    def __init__(self, strategy, data_source_1m=None, logger=None):
-        self.strategy = strategy
+    def __init__(self, strategy, data_source_1m=None, logger=None, cache=None, symbol=None, result_cache=None, event_skip=False, shards=1, shard_warmup=timedelta(days=21), shard_overlap=timedelta(days=7), feature_store=None):
+        # strategy is one strategy, a list of them or a {name: strategy} dict;
+        # several strategies share one data load and candle pass, each with
+        # its own StrategyRun (account, tracker, orders)
+        if isinstance(strategy, dict):
+            named = list(strategy.items())
+        elif isinstance(strategy, (list, tuple)):
+            names = [type(st).__name__ for st in strategy]
+            named = [
+                (name if names.count(name) == 1 else f"{name}_{i}", st)
+                for i, (name, st) in enumerate(zip(names, strategy))
+            ]
+        else:
+            named = [(type(strategy).__name__, strategy)]
+        self.runs = [StrategyRun(name, st) for name, st in named]
+        
+        self.strategy = self.runs[0].strategy if self.runs else None
         self.data_source_1m = data_source_1m
         self.logger = logger
-        self.trade_tracker = TradeTracker()
+        # with a CandleCache, 1m bars of symbol are read from it instead of the csv
+        self.cache = cache
+        self.symbol = symbol
+        self.trade_tracker = self.runs[0].trade_tracker if self.runs else TradeTracker()
         self.bt = None
+        # with a ResultCache, an identical earlier run is read back instead
+        self.result_cache = result_cache
+        self.result_key = None
+        self.metrics = None
+        self.data_report = None
+        # step strategies only on the rows their next_wakeup asks for, with a
+        # Replay of its own instead of the backtesting library's bar loop
+        self.event_skip = event_skip
+        # with shards > 1 each strategy's range is cut into that many time
+        # shards replayed in parallel processes (src/backtesting/shards.py);
+        # a shard warms up over shard_warmup before its cut and is stitched
+        # to the one before it within shard_overlap after it
+        self.shards = shards
+        self.shard_warmup = shard_warmup
+        self.shard_overlap = shard_overlap
+        # with a FeatureStore, strategies with feature_specs read their
+        # indicators from columns precomputed over the whole loaded history
+        self.feature_store = feature_store
+        self.source_bars = None
     
     def aggregate_to_timeframe(self, df_1m, timeframe):
         if timeframe == "1m":
@@ -155,30 +355,104 @@ class BacktestEngine:
         
         return df_agg
     
-    def run(self, start, end, cash=100000, commission=0.0):
-        bars_1m = load_ohlcv_csv(self.data_source_1m)
+    def load_bars(self, start, end):
+        # time-sorted 1m BarBatch of [start, end], data checked and logged
+        if self.cache is not None:
+            bars_1m = self.cache.get_batch(self.symbol, "1m", start, end)
+            source = self.cache.root
+        else:
+            bars_1m = load_ohlcv_batch(self.data_source_1m)
+            source = "CSV"
         
         if self.logger:
-            self.logger.info(f"Loaded {len(bars_1m)} 1-minute bars from CSV")
+            self.logger.info(f"Loaded {len(bars_1m)} 1-minute bars from {source}")
         
-        relevant_bars = [b for b in bars_1m if start <= b.timestamp <= end]
-        relevant_bars.sort(key=lambda b: b.timestamp)
+        self.source_bars = bars_1m
+        in_range = (bars_1m.ts >= to_ms(start)) & (bars_1m.ts <= to_ms(end))
+        relevant_bars = bars_1m[in_range]
+        
+        # duplicates, holes and bad candles silently distort the 15m/1h
+        # candles, so report them before running
+        report = check_bars(relevant_bars.to_records())
+        if self.logger:
+            if report.ok:
+                self.logger.info(f"Data check passed | {report.summary()}")
+            else:
+                self.logger.warning(f"Data check found issues | {report.summary()}")
+        self.data_report = report
+        
+        return relevant_bars.sorted()
+    
+    def run(self, start, end, cash=100000, commission=0.0):
+        relevant_bars = self.load_bars(start, end)
         
-        if not relevant_bars:
+        if not len(relevant_bars):
             if self.logger:
                 self.logger.info("No bars found in the specified range")
             return []
-        df = pd.DataFrame([
-            {
-                'Open': bar.open,
-                'High': bar.high,
-                'Low': bar.low,
-                'Close': bar.close,
-                'Volume': bar.volume,
-            }
-            for bar in relevant_bars
-        ])
-        df.index = pd.DatetimeIndex([bar.timestamp for bar in relevant_bars])
+        
+        feature_key = self._attach_features() if self.feature_store is not None else None
+        
+        pending = self.runs
+        if self.result_cache is not None:
+            params = {"start": start, "end": end, "cash": cash, "commission": commission}
+            if feature_key:
+                # indicators then also depend on the history before start
+                params["features"] = feature_key
+            if self.event_skip:
+                params["event_skip"] = True
+            if self.shards > 1:
+                params["shards"] = [self.shards, self.shard_warmup, self.shard_overlap]
+            records = relevant_bars.to_records()
+            pending = []
+            for run in self.runs:
+                run.result_key = result_key(records, run.strategy, params, ENGINE_VERSION)
+                cached = self.result_cache.get(run.result_key)
+                if cached is None:
+                    pending.append(run)
+                    continue
+                run.trade_tracker.all_orders = cached["orders"]
+                run.metrics = cached["metrics"]
+                if self.logger:
+                    self.logger.info(f"Backtest result cache hit {run.result_key[:12]} | {run.name} | {len(cached['orders'])} orders")
+        
+        if not pending:
+            return self._finish()
+        
+        if self.shards > 1:
+            from src.backtesting.shards import run_sharded
+            
+            for run in pending:
+                if self.logger:
+                    self.logger.info(f"Running {run.name} in {self.shards} time shards over {len(relevant_bars)} 1-minute bars")
+                orders, replay = run_sharded(
+                    run.name, run.strategy, relevant_bars, self.shards,
+                    warmup=self.shard_warmup, overlap=self.shard_overlap,
+                    cash=cash, event_skip=self.event_skip, logger=self.logger,
+                )
+                final = replay.runs[0]
+                run.strategy = final.strategy
+                run.account_balance = final.account_balance
+                run.order_counter = final.order_counter
+                run.book = final.book
+                run.trade_tracker.all_orders = orders
+            self.strategy = self.runs[0].strategy
+            return self._finish_runs(pending, cash)
+        
+        if self.event_skip:
+            if self.logger:
+                self.logger.info(f"Running event-skipping backtest over {len(relevant_bars)} 1-minute bars")
+            Replay(pending, relevant_bars, self.logger, cash, event_skip=True).run_until(len(relevant_bars))
+            return self._finish_runs(pending, cash)
+        
+        df = pd.DataFrame({
+            'Open': relevant_bars.open,
+            'High': relevant_bars.high,
+            'Low': relevant_bars.low,
+            'Close': relevant_bars.close,
+            'Volume': relevant_bars.volume,
+        })
+        df.index = pd.DatetimeIndex(relevant_bars.timestamps())
         df.index.name = 'Date'
         
         if self.logger:
@@ -187,8 +461,7 @@ class BacktestEngine:
             self.logger.info("Note: Backtest uses 1m bar data; timing and prices may differ from live trading")
         
         class CustomStrategy(StrategyAdapter):
-            custom_strategy_instance = self.strategy
-            trade_tracker_instance = self.trade_tracker
+            strategy_runs = pending
             logger_instance_ref = self.logger
             all_bars_1m_data = relevant_bars  # Pass all 1m bars for aggregation
         
@@ -201,10 +474,55 @@ class BacktestEngine:
         )
         self.bt.run()
         
+        return self._finish_runs(pending, cash)
+    
+    def _attach_features(self):
+        # point every strategy with feature_specs at its store columns, built
+        # over all loaded 1m bars; the source key of those bars, or None
+        from src.backtesting.feature_store import source_key
+        
+        wanted = [(run, run.strategy.feature_specs()) for run in self.runs]
+        wanted = [(run, specs) for run, specs in wanted if specs]
+        if not wanted:
+            return None
+        
+        source = self.source_bars.sorted()
+        key = source_key(source)
+        for run, (timeframe, specs) in wanted:
+            run.strategy.features = self.feature_store.view(source, timeframe, specs, key=key)
+            if self.logger:
+                self.logger.info(f"Feature store columns for {run.name}: {len(specs)} {timeframe} indicators over {len(run.strategy.features)} candles")
+        return key
+    
+    def _finish_runs(self, pending, cash):
+        for run in pending:
+            run.metrics = self.summarize(run.trade_tracker.get_all_orders(), cash)
+            if self.result_cache is not None:
+                self.result_cache.put(run.result_key, run.trade_tracker.get_all_orders(), run.metrics)
+        
+        return self._finish()
+    
+    def _finish(self):
+        # single strategy results stay on the engine as before
+        self.result_key = self.runs[0].result_key
+        self.metrics = self.runs[0].metrics
         return self.trade_tracker.get_all_orders()
     
-    def save_trades_csv(self, path):
-        all_orders = self.trade_tracker.get_all_orders()
+    def summarize(self, orders, cash):
+        buys = [o for o in orders if o["side"] == "BUY"]
+        sells = [o for o in orders if o["side"] == "SELL"]
+        cash_flow = sum(o["price"] * o["size"] for o in sells) - sum(o["price"] * o["size"] for o in buys)
+        return {
+            "orders": len(orders),
+            "buy_orders": len(buys),
+            "sell_orders": len(sells),
+            "traded_notional": sum(o["price"] * o["size"] for o in orders),
+            "net_position": sum(o["size"] for o in buys) - sum(o["size"] for o in sells),
+            "final_cash": cash + cash_flow,
+        }
+    
+    def save_trades_csv(self, path, run=None):
+        all_orders = (run or self.runs[0]).trade_tracker.get_all_orders()
         
         rows = []
         for order in all_orders:
@@ -224,5 +542,7 @@ class BacktestEngine:
             self.logger.debug(f"Saved {len(rows)} orders to {path}")
         
         return path
-
-
+    
+    def save_all_trades_csv(self, path_template="data/backtest_trades_{name}.csv"):
+        # one orders file per strategy of the pass
+        return [self.save_trades_csv(path_template.format(name=run.name), run) for run in self.runs]
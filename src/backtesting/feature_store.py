@@ -0,0 +1,225 @@
+# offline indicator columns for backtests. the indicators strategies compute
+# in generate_signals (rsi, atr, log-return volatility, bollinger bands) are
+# computed once per (symbol, timeframe, indicator, params) over the whole 1m
+# history of a source and stored as one .npy column each, next to the index
+# columns of the candles they belong to:
+#
+#   <root>/<symbol>_<timeframe>_<source>/meta.json     what the columns were built from
+#   <root>/<symbol>_<timeframe>_<source>/ts.npy        candle open times
+#   <root>/<symbol>_<timeframe>_<source>/first_*.npy   the candle as it opens (candle_arrays)
+#   <root>/<symbol>_<timeframe>_<source>/rsi_14.npy    one column per indicator and params
+#
+# row k holds the indicator as a strategy sees it when candle k opens, over
+# the complete earlier candles and the opening view of candle k only (the
+# *_last helpers of src/strategy/vectorized.py); first_ts[k] is the 1m bar it
+# becomes known at. FeatureView.asof hands a strategy row k only when the
+# candle it is evaluating is exactly that opening view, anything else (a
+# candle later in its life, a history that starts elsewhere) gets None and
+# the strategy computes the indicator itself, so a lookup can never see
+# data the strategy has not been fed yet.
+#
+# <source> is a hash of the 1m bars, VERSION and the source of the modules
+# computing the columns, so other ranges, csvs or code get a directory of
+# their own and a column once written never changes. columns are added and
+# memory mapped under the directory's lock; directories not used for the
+# longest are removed once the store grows past max_bytes
+
+import fcntl
+import glob
+import hashlib
+import inspect
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+import numpy as np
+
+from src.strategy import vectorized
+from src.strategy.vectorized import atr_last, log_return_std_last, momentum_last, rolling_mean_last, rolling_std_last, rsi_last
+from src.utils.candles import candle_arrays
+from src.utils.types import *
+
+# bump when the columns could differ for the same bars and code
+VERSION = 1
+
+INDEX_COLUMNS = ("ts", "first_ts", "first_close", "first_high", "first_low")
+
+
+def _rsi(candles, period):
+    return rsi_last(candles["close"], candles["first_close"], period)
+
+
+def _sma(candles, period):
+    return rolling_mean_last(candles["close"], candles["first_close"], period)
+
+
+def _stddev(candles, period):
+    return rolling_std_last(candles["close"], candles["first_close"], period)
+
+
+# indicator name -> function of candle_arrays columns and the params
+INDICATORS = {
+    "momentum": momentum_last,
+    "log_return_std": log_return_std_last,
+    "rsi": _rsi,
+    "atr": atr_last,
+    "sma": _sma,
+    "stddev": _stddev,
+}
+
+
+def column_name(indicator, params):
+    return "_".join([indicator] + [str(p) for p in params])
+
+
+def source_key(bars):
+    # hash of a time-sorted 1m BarBatch and of the code the columns come from
+    h = hashlib.sha256()
+    h.update(f"version={VERSION}\n{bars.symbol}\n".encode())
+    for module in (vectorized, sys.modules[__name__]):
+        h.update(inspect.getsource(module).encode())
+    h.update(bars.to_records().tobytes())
+    return h.hexdigest()
+
+
+class FeatureView:
+    # the columns of one strategy over one (symbol, timeframe) directory,
+    # memory mapped; pickles as its paths so shards and forked workers
+    # reopen the files instead of copying them
+
+    def __init__(self, directory, columns):
+        # columns: {name the strategy reads: column file name}
+        self.directory = directory
+        self.names = dict(columns)
+        self._open()
+
+    def _open(self):
+        self.index = {name: self._load(name) for name in INDEX_COLUMNS}
+        self.columns = {name: self._load(column) for name, column in self.names.items()}
+
+    def _load(self, name):
+        return np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+
+    def __getstate__(self):
+        return {"directory": self.directory, "names": self.names}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    def __len__(self):
+        return len(self.index["ts"])
+
+    def asof(self, bar):
+        # {name: value} as of bar, the candle of the view's timeframe a
+        # strategy is evaluating; None unless bar is the candle's opening
+        # view the row was computed on
+        ts = self.index["ts"]
+        ms = to_ms(bar.timestamp)
+        k = int(np.searchsorted(ts, ms, side="left"))
+        if k == len(ts) or ts[k] != ms:
+            return None
+        if (bar.close, bar.high, bar.low) != (self.index["first_close"][k], self.index["first_high"][k], self.index["first_low"][k]):
+            return None
+        return {name: float(column[k]) for name, column in self.columns.items()}
+
+
+class FeatureStore:
+    def __init__(self, root="data/cache/features", max_bytes=1024 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self.built = 0
+
+    def directory(self, symbol, timeframe, key):
+        return os.path.join(self.root, f"{symbol}_{timeframe}_{key}")
+
+    @contextmanager
+    def _write_lock(self, directory):
+        with open(os.path.join(directory, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def meta(self, directory):
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def view(self, bars, timeframe, specs, key=None):
+        # FeatureView of specs ({name: (indicator, params)}) over the
+        # timeframe candles of bars, a time-sorted 1m BarBatch holding the
+        # full history; columns missing from the store are computed and
+        # written first. key is source_key(bars) when already known
+        key = key or source_key(bars)
+        directory = self.directory(bars.symbol, timeframe, key)
+        os.makedirs(directory, exist_ok=True)
+        columns = {name: column_name(indicator, params) for name, (indicator, params) in specs.items()}
+
+        with self._write_lock(directory):
+            candles = None
+            if self.meta(directory) is None:
+                candles = candle_arrays(bars, timeframe)
+                for name in INDEX_COLUMNS:
+                    self._save(directory, name, candles[name])
+                meta = {"version": VERSION, "symbol": bars.symbol, "timeframe": timeframe, "rows": len(candles["ts"]), "source": key}
+                tmp = os.path.join(directory, "meta.json.tmp")
+                with open(tmp, "w") as f:
+                    json.dump(meta, f)
+                os.replace(tmp, os.path.join(directory, "meta.json"))
+
+            for name, (indicator, params) in specs.items():
+                if os.path.exists(os.path.join(directory, f"{columns[name]}.npy")):
+                    continue
+                if candles is None:
+                    candles = candle_arrays(bars, timeframe)
+                self._save(directory, columns[name], INDICATORS[indicator](candles, *params))
+                self.built += 1
+
+            view = FeatureView(directory, columns)
+            os.utime(os.path.join(directory, "meta.json"))
+
+        self.evict(keep=directory)
+        return view
+
+    def _save(self, directory, name, values):
+        tmp = os.path.join(directory, f"{name}.tmp.npy")
+        np.save(tmp, np.ascontiguousarray(values))
+        os.replace(tmp, os.path.join(directory, f"{name}.npy"))
+
+    def evict(self, keep=None):
+        # drop the columns of the least recently viewed directories until
+        # the rest fit in max_bytes, each under its lock; views already open
+        # keep their mapped files
+        entries = []
+        for name in os.listdir(self.root):
+            directory = os.path.join(self.root, name)
+            if directory == keep or not os.path.isdir(directory):
+                continue
+            try:
+                used = os.stat(os.path.join(directory, "meta.json")).st_mtime
+                size = sum(os.path.getsize(path) for path in glob.glob(os.path.join(directory, "*.npy")))
+            except OSError:
+                continue
+            entries.append((used, size, directory))
+
+        total = sum(size for _, size, _ in entries)
+        if keep is not None:
+            total += sum(os.path.getsize(path) for path in glob.glob(os.path.join(keep, "*.npy")))
+        for _, size, directory in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # the directory and its lock stay, a view waiting on the lock
+            # finds no meta.json and builds the columns again
+            with self._write_lock(directory):
+                for path in glob.glob(os.path.join(directory, "*.npy")) + [os.path.join(directory, "meta.json")]:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            total -= size
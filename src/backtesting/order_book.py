@@ -0,0 +1,101 @@
+# simulated matching of resting LIMIT and STOP orders in backtests. orders
+# wait in four price-ordered heaps, so a 1m bar only looks at the top of each
+# heap and each order it triggers costs O(log n), however many orders rest:
+#
+#   BUY LIMIT   fills when low <= price    highest price on top
+#   SELL LIMIT  fills when high >= price   lowest price on top
+#   BUY STOP    fills when high >= price   lowest price on top
+#   SELL STOP   fills when low <= price    highest price on top
+#
+# a limit fills at its price, or at the open if the bar opened through it; a
+# stop fills at its trigger price, or at the open if the bar gapped through it.
+# cancelled orders are dropped from the index and skipped when they surface
+
+import heapq
+
+RESTING_TYPES = ("LIMIT", "STOP")
+
+# (side, type) -> True when the order triggers on the bar's low
+_ON_LOW = {
+    ("BUY", "LIMIT"): True,
+    ("SELL", "LIMIT"): False,
+    ("BUY", "STOP"): False,
+    ("SELL", "STOP"): True,
+}
+
+
+class OrderBook:
+    def __init__(self):
+        self._heaps = {kind: [] for kind in _ON_LOW}
+        self._orders = {}
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._orders)
+
+    def orders(self):
+        return list(self._orders.values())
+
+    def add(self, order):
+        kind = (order.side, order.order_type)
+        if kind not in _ON_LOW:
+            raise ValueError(f"cannot rest a {order.side} {order.order_type} order")
+        # heapq is a min-heap, orders triggered on the low want the highest price on top
+        key = -order.price if _ON_LOW[kind] else order.price
+        self._seq += 1
+        heapq.heappush(self._heaps[kind], (key, self._seq, order.id))
+        self._orders[order.id] = order
+
+    def cancel(self, order_id):
+        order = self._orders.pop(order_id, None)
+        if order is not None:
+            order.status = "CANCELED"
+        return order
+
+    def cancel_all(self, symbol=None):
+        ids = [oid for oid, o in self._orders.items() if symbol is None or o.symbol == symbol]
+        return [self.cancel(oid) for oid in ids]
+
+    def _top(self, kind):
+        # price of the best live order of a heap, dropping cancelled ones
+        heap = self._heaps[kind]
+        while heap and heap[0][2] not in self._orders:
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        return -heap[0][0] if _ON_LOW[kind] else heap[0][0]
+
+    def levels(self):
+        # (above, below): the lowest price a bar's high must reach and the
+        # highest price its low must reach to trigger anything, None if no
+        # order rests on that side
+        highs = [p for p in (self._top(k) for k, on_low in _ON_LOW.items() if not on_low) if p is not None]
+        lows = [p for p in (self._top(k) for k, on_low in _ON_LOW.items() if on_low) if p is not None]
+        return (min(highs) if highs else None), (max(lows) if lows else None)
+
+    def match(self, bar, timestamp=None):
+        # orders triggered by bar, filled and removed from the book, in
+        # trigger order per heap; fills are stamped with timestamp, by
+        # default the bar's
+        fills = []
+        for kind, on_low in _ON_LOW.items():
+            heap = self._heaps[kind]
+            while True:
+                price = self._top(kind)
+                if price is None or (bar.low > price if on_low else bar.high < price):
+                    break
+                _, _, order_id = heapq.heappop(heap)
+                order = self._orders.pop(order_id)
+
+                side, order_type = kind
+                if order_type == "LIMIT":
+                    fill_price = min(price, bar.open) if side == "BUY" else max(price, bar.open)
+                else:
+                    fill_price = max(price, bar.open) if side == "BUY" else min(price, bar.open)
+
+                order.price = fill_price
+                order.filled_size = order.size
+                order.status = "FILLED"
+                order.timestamp = timestamp or bar.timestamp
+                fills.append(order)
+        return fills
@@ -0,0 +1,154 @@
+# content-addressed store of finished backtests. a run is keyed by a hash of
+# everything that decides its result: the 1m bars it replays, the strategy
+# class and the source of its modules and of every src module they or the
+# engine import, the strategy config, the run
+# parameters and the engine version. an identical re-run reads the stored
+# trade log instead of replaying the bars.
+#
+# one json file per key; reading a result touches its mtime and the least
+# recently used files are removed once the directory grows past max_bytes
+
+import ast
+import functools
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import sys
+
+
+# modules that run every strategy; their src imports are hashed with them
+ENGINE_MODULES = ("src.backtesting.backtest",)
+
+
+def _module_source(name):
+    # source of a module by dotted name, None if it is not a python module
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, AttributeError, ValueError):
+        return None
+    if spec is None or not spec.origin or not spec.origin.endswith(".py"):
+        return None
+    with open(spec.origin) as f:
+        return f.read()
+
+
+def _src_imports(source):
+    # dotted names a module imports from src, at the top or inside
+    # functions; for "from src.x import y" both src.x and src.x.y, which is
+    # only kept if it turns out to be a module
+    names = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names if alias.name.startswith("src."))
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module and node.module.startswith("src."):
+            names.add(node.module)
+            names.update(f"{node.module}.{alias.name}" for alias in node.names if alias.name != "*")
+    return names
+
+
+@functools.lru_cache(maxsize=None)
+def dependency_sources(roots):
+    # (name, source) of the src modules imported by the modules named in
+    # roots, directly or through each other, sorted by name
+    sources = {}
+    pending = list(roots)
+    while pending:
+        name = pending.pop()
+        if name in sources:
+            continue
+        source = _module_source(name)
+        if source is None:
+            continue
+        sources[name] = source
+        pending.extend(_src_imports(source) - sources.keys())
+    return tuple(sorted(sources.items()))
+
+
+def strategy_fingerprint(strategy):
+    # class name plus the source of every module in its class hierarchy and
+    # of every src module those and the engine import, so editing the
+    # strategy, its base class or a helper it or the engine uses (indicators,
+    # candles, types) invalidates old results
+    cls = type(strategy)
+    parts = [f"{cls.__module__}.{cls.__qualname__}"]
+    roots = list(ENGINE_MODULES)
+    for klass in cls.__mro__:
+        module = sys.modules.get(klass.__module__)
+        if module is None or klass.__module__ == "builtins" or klass.__module__ == "abc":
+            continue
+        roots.append(klass.__module__)
+        try:
+            parts.append(inspect.getsource(module))
+        except (OSError, TypeError):
+            parts.append(klass.__module__)
+    for name, source in dependency_sources(tuple(sorted(set(roots)))):
+        parts.append(f"{name}\n{source}")
+    return "\n".join(parts)
+
+
+def result_key(records, strategy, params, engine_version):
+    h = hashlib.sha256()
+    h.update(f"engine={engine_version}\n".encode())
+    h.update(strategy_fingerprint(strategy).encode())
+    h.update(json.dumps(strategy.config, sort_keys=True, default=str).encode())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    h.update(records.tobytes())
+    return h.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, root="data/cache/backtests", max_bytes=256 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # mark as recently used
+        os.utime(path)
+        return result
+
+    def put(self, key, orders, metrics):
+        path = self.path(key)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"orders": orders, "metrics": metrics}, f)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        evict_lru(self.root, ".json", self.max_bytes)
+
+
+def evict_lru(root, suffix, max_bytes):
+    # remove the least recently used (oldest mtime) files of root ending in
+    # suffix until the rest fit in max_bytes
+    entries = []
+    for name in os.listdir(root):
+        if not name.endswith(suffix):
+            continue
+        try:
+            st = os.stat(os.path.join(root, name))
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(root, name))
+        except OSError:
+            pass
+        total -= size
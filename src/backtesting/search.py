@@ -0,0 +1,360 @@
+# successive halving search over strategy configs. every candidate runs on
+# a short prefix of the range, the best 1/eta by the chosen metric survive
+# and are extended to a window eta times longer, until the survivors reach
+# the end of the range. the first window starts once every candidate is
+# warmed_up, so no rung is scored before a strategy could trade, and
+# candidates tied with the last survivor's score survive too. all candidates of a rung share one Replay (one candle
+# pass), and survivors continue from where they stopped instead of replaying
+# from the start. the replay state is pickled after each rung so an
+# interrupted search resumes at the last finished rung
+
+import copy
+import itertools
+import json
+import math
+import os
+import pickle
+from datetime import datetime
+
+import numpy as np
+
+from src.backtesting.backtest import Replay, StrategyRun
+from src.backtesting.shards import same_state
+from src.backtesting.signal_cache import SignalCache
+from src.strategy.multi_tf import macd_grid
+from src.strategy.registry import create_strategy
+from src.utils.candles import candle_starts
+from src.utils.types import to_ms
+
+METRICS = ("pnl", "sharpe")
+
+
+def grid(space):
+    # {param: [values]} -> list of config dicts, one per combination
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def score_orders(orders, bars, stop, cash=100000, metric="pnl"):
+    # mark to market equity of a run's orders on the hourly closes of
+    # bars[:stop]; pnl is the final equity change, sharpe the annualized
+    # sharpe of the hourly equity changes
+    order_ts = np.array([to_ms(datetime.fromisoformat(o["timestamp"])) for o in orders], dtype=np.int64)
+    signed = np.array([o["size"] if o["side"] == "BUY" else -o["size"] for o in orders], dtype=np.float64)
+    prices = np.array([o["price"] for o in orders], dtype=np.float64)
+    return score_fills(order_ts, signed, prices, bars, stop, cash, metric)
+
+
+def score_fills(order_ts, signed, prices, bars, stop, cash=100000, metric="pnl"):
+    # score_orders on arrays: fill epoch ms, signed sizes (buys positive) and
+    # fill prices, in time order
+    sample_rows = np.arange(59, stop, 60)
+    if len(sample_rows) == 0 or sample_rows[-1] != stop - 1:
+        sample_rows = np.append(sample_rows, stop - 1)
+    sample_ts = bars.ts[sample_rows]
+    closes = bars.close[sample_rows]
+
+    equity = np.full(len(sample_rows), float(cash))
+    if len(order_ts):
+        filled = np.searchsorted(order_ts, sample_ts, side="right")
+        position = np.r_[0.0, np.cumsum(signed)][filled]
+        cash_flow = np.r_[0.0, np.cumsum(-signed * prices)][filled]
+        equity = cash + cash_flow + position * closes
+
+    if metric == "pnl":
+        return float(equity[-1] - cash)
+
+    changes = np.diff(equity)
+    if len(changes) < 2 or changes.std(ddof=1) == 0:
+        return 0.0
+    return float(changes.mean() / changes.std(ddof=1) * np.sqrt(24 * 365))
+
+
+def rung_stops(bars, first_window, eta, start_row=0):
+    # row after the end of each rung's window: first_window from start_row,
+    # then eta times longer each rung, the last one at the end of the data
+    if start_row >= len(bars):
+        return [len(bars)]
+    start_ms = int(bars.ts[start_row])
+    window_ms = int(first_window.total_seconds() * 1000)
+    stops = []
+    while True:
+        stop = int(np.searchsorted(bars.ts, start_ms + window_ms, side="left"))
+        if stop >= len(bars):
+            stops.append(len(bars))
+            return stops
+        stops.append(stop)
+        window_ms *= eta
+
+
+class SuccessiveHalving:
+    def __init__(self, strategy_name, configs, bars, first_window, eta=2, keep=1, metric="pnl", cash=100000, checkpoint=None, logger=None):
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {METRICS}")
+        self.strategy_name = strategy_name
+        self.configs = configs
+        self.bars = bars
+        self.eta = eta
+        self.keep = keep
+        self.metric = metric
+        self.cash = cash
+        self.checkpoint = checkpoint
+        self.logger = logger
+        self.first_window = first_window
+        # set once the candidates are warmed up (_warm_up)
+        self.stops = None
+        # (rung, rows replayed, {candidate: score}) per finished rung
+        self.history = []
+        self.rung = 0
+        self.replay = None
+        # candidate rows stepped, summed over rungs; a full grid costs
+        # len(configs) * len(bars)
+        self.work = 0
+
+    def _signature(self):
+        return {
+            "strategy": self.strategy_name,
+            "configs": self.configs,
+            "first_window": self.first_window.total_seconds(),
+            "first_ts": int(self.bars.ts[0]),
+            "eta": self.eta,
+            "keep": self.keep,
+            "metric": self.metric,
+            "cash": self.cash,
+        }
+
+    def _new_replay(self):
+        runs = [StrategyRun(str(i), create_strategy(self.strategy_name, dict(config))) for i, config in enumerate(self.configs)]
+        return Replay(runs, self.bars, cash=self.cash)
+
+    def _load_checkpoint(self):
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return False
+        with open(self.checkpoint, "rb") as f:
+            state = pickle.load(f)
+        if state["signature"] != self._signature():
+            return False
+        self.replay = state["replay"]
+        self.replay.all_bars_1m = self.bars
+        self.history, self.rung, self.work = state["history"], state["rung"], state["work"]
+        self.stops = state["stops"]
+        return True
+
+    def _save_checkpoint(self):
+        if not self.checkpoint:
+            return
+        # the bars are reloaded on resume rather than pickled with the state
+        self.replay.all_bars_1m = None
+        try:
+            tmp = f"{self.checkpoint}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump({
+                    "signature": self._signature(),
+                    "replay": self.replay,
+                    "history": self.history,
+                    "rung": self.rung,
+                    "work": self.work,
+                    "stops": self.stops,
+                }, f)
+            os.replace(tmp, self.checkpoint)
+        finally:
+            self.replay.all_bars_1m = self.bars
+
+    def _warm_up(self):
+        # step every candidate until all are warmed_up; the first rung's
+        # window starts there
+        runs = self.replay.runs
+        while self.replay.next_row < len(self.bars) and not all(run.strategy.warmed_up() for run in runs):
+            self.replay.step(self.replay.next_row)
+        self.work += len(runs) * self.replay.next_row
+        self.stops = rung_stops(self.bars, self.first_window, self.eta, self.replay.next_row)
+        if self.logger:
+            self.logger.info(f"Warmed up {len(runs)} candidates over {self.replay.next_row} bars")
+
+    def scores(self, stop):
+        return {
+            run.name: score_orders(run.trade_tracker.get_all_orders(), self.bars, stop, self.cash, self.metric)
+            for run in self.replay.runs
+        }
+
+    def run(self):
+        # returns [(config, score)] of the final survivors, best first
+        if self._load_checkpoint():
+            if self.logger:
+                self.logger.info(f"Resuming search at rung {self.rung + 1}/{len(self.stops)} from {self.checkpoint}")
+        else:
+            self.replay = self._new_replay()
+            self._warm_up()
+
+        while self.rung < len(self.stops):
+            stop = self.stops[self.rung]
+            self.work += len(self.replay.runs) * (stop - self.replay.next_row)
+            self.replay.run_until(stop)
+
+            scores = self.scores(stop)
+            ranked = sorted(self.replay.runs, key=lambda run: scores[run.name], reverse=True)
+            self.history.append((self.rung, stop, scores))
+
+            last = self.rung == len(self.stops) - 1
+            if not last:
+                survivors = min(len(ranked), max(self.keep, math.ceil(len(ranked) / self.eta)))
+                cutoff = scores[ranked[survivors - 1].name]
+                self.replay.runs = [run for run in ranked if scores[run.name] >= cutoff]
+            else:
+                self.replay.runs = ranked
+
+            if self.logger:
+                best = ranked[0]
+                self.logger.info(
+                    f"Rung {self.rung + 1}/{len(self.stops)} | Bars={stop} | Candidates={len(ranked)} "
+                    f"| Kept={len(self.replay.runs)} | Best={self.configs[int(best.name)]} {self.metric}={scores[best.name]:.4f}"
+                )
+
+            self.rung += 1
+            if not last:
+                self._save_checkpoint()
+
+        final = self.history[-1][2]
+        return [(self.configs[int(run.name)], final[run.name]) for run in self.replay.runs]
+
+
+def full_grid(strategy_name, configs, bars, metric="pnl", cash=100000):
+    # every candidate over the whole range on one shared pass, best first
+    runs = [StrategyRun(str(i), create_strategy(strategy_name, dict(config))) for i, config in enumerate(configs)]
+    replay = Replay(runs, bars, cash=cash)
+    replay.run_until(len(bars))
+    ranked = [
+        (configs[int(run.name)], score_orders(run.trade_tracker.get_all_orders(), bars, len(bars), cash, metric))
+        for run in runs
+    ]
+    return sorted(ranked, key=lambda item: item[1], reverse=True)
+
+
+def rank_macd_grid(configs, bars, metric="pnl", cash=100000):
+    # full_grid of multi_tf configs from one vectorized pass (macd_grid)
+    # instead of one replay per config, best first
+    fill_ms = candle_starts(bars.ts, "15m")
+    ranked = [
+        (config, score_fills(fill_ms[fills["minute"]], fills["side"] * fills["size"], fills["price"], bars, len(bars), cash, metric))
+        for config, fills in zip(configs, macd_grid(bars, configs, cash))
+    ]
+    return sorted(ranked, key=lambda item: item[1], reverse=True)
+
+
+def stream_grid(strategy_name, configs, bars, metric="pnl", cash=100000, cache=None):
+    # full_grid from vectorized signal streams: configs with the same
+    # SIGNAL_PARAMS share one stream from the cache and only replay their
+    # entry/exit, stop and sizing rules on it. best first
+    cache = cache if cache is not None else SignalCache()
+    ranked = []
+    for config in configs:
+        strategy = create_strategy(strategy_name, dict(config))
+        orders = strategy.replay_stream(cache.get(strategy, bars), cash)
+        ranked.append((config, score_orders(orders, bars, len(bars), cash, metric)))
+    return sorted(ranked, key=lambda item: item[1], reverse=True)
+
+
+def warmup_groups(strategy_name, configs):
+    # config indices grouped by their WARMUP_PARAMS values; each group can
+    # share one warmup. strategies without WARMUP_PARAMS share nothing
+    groups = {}
+    for i, config in enumerate(configs):
+        strategy = create_strategy(strategy_name, dict(config))
+        if strategy.WARMUP_PARAMS is None:
+            key = i
+        else:
+            key = json.dumps({name: getattr(strategy, name) for name in strategy.WARMUP_PARAMS}, sort_keys=True, default=str)
+        groups.setdefault(key, []).append(i)
+    return list(groups.values())
+
+
+def warm_replay(strategy_name, config, bars, cash=100000):
+    # a Replay of config stepped until its strategy is warmed_up, so no
+    # signal has been acted on yet
+    run = StrategyRun("warmup", create_strategy(strategy_name, dict(config)))
+    replay = Replay([run], bars, cash=cash)
+    while replay.next_row < len(bars) and not run.strategy.warmed_up():
+        replay.step(replay.next_row)
+    return replay
+
+
+def apply_overrides(strategy, strategy_name, base_config, config):
+    # strategy with the params of config instead of base_config: the
+    # attributes a fresh strategy of config sets differently from a fresh one
+    # of base_config are copied over, its warmed-up state is kept
+    base = create_strategy(strategy_name, dict(base_config))
+    variant = create_strategy(strategy_name, dict(config))
+    for name, value in vars(variant).items():
+        if not same_state(getattr(base, name, None), value):
+            setattr(strategy, name, value)
+    return strategy
+
+
+def _variant_score(replay, strategy_name, base_config, config, bars, metric, cash):
+    run = replay.runs[0]
+    apply_overrides(run.strategy, strategy_name, base_config, config)
+    replay.run_until(len(bars))
+    return score_orders(run.trade_tracker.get_all_orders(), bars, len(bars), cash, metric)
+
+
+def _fork_variant(*args):
+    # score one variant in a forked child: it starts from the parent's
+    # warmed-up replay copy-on-write and sends its score back through a pipe
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            result = _variant_score(*args)
+        except BaseException as e:
+            result = e
+        with os.fdopen(write_fd, "wb") as f:
+            pickle.dump(result, f)
+        os._exit(0)
+    os.close(write_fd)
+    return pid, read_fd
+
+
+def _collect(running, scores):
+    # wait for one child and record its score
+    pid, _ = os.wait()
+    while pid not in running:
+        pid, _ = os.wait()
+    i, read_fd = running.pop(pid)
+    with os.fdopen(read_fd, "rb") as f:
+        result = pickle.load(f)
+    if isinstance(result, BaseException):
+        raise result
+    scores[i] = result
+
+
+def fork_grid(strategy_name, configs, bars, metric="pnl", cash=100000, workers=None, logger=None):
+    # full_grid with one warmup per warmup group: the group's first config
+    # replays until warmed_up, then every config of the group is forked from
+    # that state with its own params and replayed to the end. without
+    # os.fork the variants start from copies of the warmed-up replay
+    workers = workers or os.cpu_count() or 1
+    scores = {}
+    for group in warmup_groups(strategy_name, configs):
+        base_config = configs[group[0]]
+        replay = warm_replay(strategy_name, base_config, bars, cash)
+        if logger:
+            logger.info(f"Warmed up {len(group)} configs over {replay.next_row} bars")
+
+        if not hasattr(os, "fork"):
+            for i in group:
+                variant = copy.deepcopy(replay, {id(bars): bars})
+                scores[i] = _variant_score(variant, strategy_name, base_config, configs[i], bars, metric, cash)
+            continue
+
+        running = {}
+        for i in group:
+            if len(running) >= workers:
+                _collect(running, scores)
+            pid, read_fd = _fork_variant(replay, strategy_name, base_config, configs[i], bars, metric, cash)
+            running[pid] = (i, read_fd)
+        while running:
+            _collect(running, scores)
+
+    ranked = [(config, scores[i]) for i, config in enumerate(configs)]
+    return sorted(ranked, key=lambda item: item[1], reverse=True)
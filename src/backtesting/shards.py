@@ -0,0 +1,214 @@
+# time-sharded backtests: one long replay cut into shards of rows that run in
+# parallel processes. a shard starts warmup before its cut, replaying those
+# rows only to rebuild the strategy's history, and pickles snapshots of the
+# strategy every sync_every rows of its first overlap after the cut.
+#
+# shards are stitched in order. the exact state at a cut is the stitched
+# replay of the shard before it; that replay is continued serially over the
+# overlap until its strategy equals one of the shard's snapshots, after which
+# the two runs are the same and the shard's own orders are taken as they are.
+# if no snapshot matches (the warmup was shorter than the strategy's history,
+# or a position opened before the cut is still open at the end of the
+# overlap) the whole shard is replayed serially.
+#
+# shard accounts start at cash, not at the stitched balance, which is only
+# known once the shards before have been stitched; after a match the two
+# differ by a constant. every position_size call of a shard is logged with
+# a pickle of the strategy and signal, and after a match each call from the
+# snapshot on is repeated with the stitched balance: if any size differs
+# (the strategy sized on its balance) the shard is replayed serially. the
+# merged orders are therefore a serial run's
+
+import multiprocessing
+import os
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.backtesting.backtest import Replay, StrategyRun
+from src.backtesting.order_book import OrderBook
+from src.utils.candles import CandleIndex
+from src.utils.types import AccountInfo
+
+# 1m bars of the backtest, set in each worker process
+_bars = None
+
+
+def _init_worker(bars):
+    global _bars
+    _bars = bars
+
+
+def shard_cuts(n, shards):
+    # first row of each shard and n, shards of equal row counts
+    shards = max(1, min(shards, n))
+    return [n * i // shards for i in range(shards)] + [n]
+
+
+def same_state(a, b):
+    # structural equality of two strategy states: DataFrames, arrays and
+    # NaNs compare by value, objects by their attributes
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, pd.DataFrame):
+        return a.shape == b.shape and a.equals(b)
+    if isinstance(a, np.ndarray):
+        return a.shape == b.shape and np.array_equal(a, b, equal_nan=a.dtype.kind == "f")
+    if isinstance(a, float):
+        return a == b or (a != a and b != b)
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same_state(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple, deque)):
+        return len(a) == len(b) and all(same_state(x, y) for x, y in zip(a, b))
+    if hasattr(a, "__dict__") and not hasattr(a, "__dataclass_fields__"):
+        return same_state(vars(a), vars(b))
+    return a == b
+
+
+def _order_number(order_id):
+    return int(order_id.rsplit("-", 1)[1])
+
+
+def _snapshot(run):
+    # what a shard's run is compared on: the strategy, its resting orders and
+    # the rows it is due (event-skipping replays), plus what the stitch needs
+    # to carry the account and order ids over
+    return {
+        "state": pickle.dumps((run.strategy, run.wake_row, run.last_row)),
+        "book": [(_order_number(o.id), o.side, o.order_type, o.price, o.size) for o in run.book.orders()],
+        "orders": len(run.trade_tracker.all_orders),
+        "balance": run.account_balance,
+        "counter": run.order_counter,
+    }
+
+
+def _matches(run, snapshot):
+    # the run equals the shard at the snapshot, resting order ids shifted by
+    # the difference of the two order counters
+    strategy, wake_row, last_row = pickle.loads(snapshot["state"])
+    shift = run.order_counter - snapshot["counter"]
+    book = [(number + shift, side, order_type, price, size) for number, side, order_type, price, size in snapshot["book"]]
+    own = [(_order_number(o.id), o.side, o.order_type, o.price, o.size) for o in run.book.orders()]
+    return (wake_row, last_row) == (run.wake_row, run.last_row) and same_state(own, book) and same_state(run.strategy, strategy)
+
+
+def _run_shard(job):
+    # replay [start, stop) of the worker's bars, snapshots at sync_rows
+    name, strategy, start, stop, sync_rows, cash, event_skip = job
+    run = StrategyRun(name, strategy)
+    replay = Replay([run], _bars, cash=cash, event_skip=event_skip, start_row=start)
+    if sync_rows:
+        replay.sizing_log = []
+    snapshots = []
+    for row in sync_rows:
+        replay.run_until(row)
+        snapshots.append((row, _snapshot(run)))
+    replay.run_until(stop)
+
+    # the bars are not sent back with the replay
+    sizing_log, replay.sizing_log = replay.sizing_log or [], None
+    replay.all_bars_1m = None
+    replay.candle_index = None
+    return snapshots, sizing_log, pickle.dumps(replay)
+
+
+def _sizes_hold(sizing_log, row, balance_shift):
+    # the shard's position_size calls from row on return the same sizes
+    # with the stitched account balance
+    if balance_shift == 0:
+        return True
+    for call_row, state, balance, size in sizing_log:
+        if call_row < row:
+            continue
+        strategy, signal = pickle.loads(state)
+        if strategy.position_size(signal, AccountInfo(balance=balance + balance_shift, positions={})) != size:
+            return False
+    return True
+
+
+def _restore(blob, bars, candle_index):
+    replay = pickle.loads(blob)
+    replay.all_bars_1m = bars
+    replay.candle_index = candle_index
+    return replay
+
+
+def _renumber(order, shift):
+    return dict(order, order_id=f"bt-{_order_number(order['order_id']) + shift}")
+
+
+def run_sharded(name, strategy, bars, shards, warmup=timedelta(days=21), overlap=timedelta(days=7), sync_every=60, cash=100000, event_skip=False, workers=None, logger=None):
+    # (orders, replay) of a serial Replay([StrategyRun(name, strategy)], bars)
+    # run to the end, computed in parallel shards; replay holds the final state
+    cuts = shard_cuts(len(bars), shards)
+    warmup_ms = int(warmup.total_seconds() * 1000)
+    overlap_ms = int(overlap.total_seconds() * 1000)
+
+    jobs = []
+    for i, (cut, stop) in enumerate(zip(cuts, cuts[1:])):
+        if i == 0:
+            jobs.append((name, strategy, 0, stop, [], cash, event_skip))
+            continue
+        start = int(np.searchsorted(bars.ts, bars.ts[cut] - warmup_ms, side="left"))
+        overlap_end = int(np.searchsorted(bars.ts, bars.ts[cut] + overlap_ms, side="left"))
+        sync_rows = list(range(cut, min(stop, max(overlap_end, cut + 1)), sync_every))
+        jobs.append((name, strategy, start, stop, sync_rows, cash, event_skip))
+
+    # fork shares the bars with the workers instead of pickling them
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(bars,)) as pool:
+        results = list(pool.map(_run_shard, jobs))
+
+    candle_index = CandleIndex(bars) if event_skip else None
+    replay = _restore(results[0][2], bars, candle_index)
+    run = replay.runs[0]
+    orders = list(run.trade_tracker.all_orders)
+    serial_rows = 0
+
+    for i in range(1, len(jobs)):
+        cut, stop = cuts[i], cuts[i + 1]
+        snapshots, sizing_log, blob = results[i]
+        known = len(run.trade_tracker.all_orders)
+
+        # replay the overlap serially until the stitched run meets the shard
+        matched, reason = None, "did not converge"
+        for row, snapshot in snapshots:
+            replay.run_until(row)
+            if _matches(run, snapshot):
+                matched = snapshot
+                break
+        if matched is not None and not _sizes_hold(sizing_log, row, run.account_balance - matched["balance"]):
+            matched, reason = None, "sized on its account balance"
+        if matched is None:
+            replay.run_until(stop)
+        serial_rows += replay.next_row - cut
+        orders.extend(run.trade_tracker.all_orders[known:])
+
+        if matched is None:
+            if logger:
+                logger.info(f"Shard {i + 1}/{len(jobs)} {reason}, replayed serially")
+            continue
+
+        shard = _restore(blob, bars, candle_index)
+        shard_run = shard.runs[0]
+        shift = run.order_counter - matched["counter"]
+        orders.extend(_renumber(order, shift) for order in shard_run.trade_tracker.all_orders[matched["orders"]:])
+        shard_run.account_balance += run.account_balance - matched["balance"]
+        shard_run.order_counter += shift
+        if len(shard_run.book):
+            resting, shard_run.book = shard_run.book.orders(), OrderBook()
+            for order in resting:
+                order.id = f"bt-{_order_number(order.id) + shift}"
+                shard_run.book.add(order)
+        replay, run = shard, shard_run
+
+    if logger:
+        logger.info(f"Stitched {len(jobs)} shards, {serial_rows} of {len(bars)} rows replayed serially")
+    run.trade_tracker.all_orders = orders
+    return orders, replay
@@ -0,0 +1,92 @@
+# stored signal streams (Strategy.signal_stream): the per-candle indicator
+# columns a strategy's entries and exits are decided on. a stream is keyed by
+# the strategy class and the source of its modules, the values of its
+# SIGNAL_PARAMS and the 1m bars, so configs that only change sizing, risk,
+# stop or threshold params share one stream and skip the indicator work; their
+# orders still come from replay_stream, which re-runs the position state
+# (stops from fill prices, holding time, balance) on the stream.
+#
+# streams are kept in memory; with a root directory they are also written
+# as .npz files, one per key, evicted least recently used past max_bytes.
+# the cache serves the vectorized paths (stream_grid, param_search
+# --vectorized); BacktestEngine replays strategies bar by bar and never
+# reads streams
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from src.backtesting.result_cache import evict_lru, strategy_fingerprint
+
+
+def signal_params(strategy):
+    return {name: getattr(strategy, name) for name in strategy.SIGNAL_PARAMS}
+
+
+def stream_key(strategy, bars):
+    h = hashlib.sha256()
+    h.update(strategy_fingerprint(strategy).encode())
+    h.update(json.dumps(signal_params(strategy), sort_keys=True, default=str).encode())
+    h.update(f"{bars.symbol}\n".encode())
+    for column in (bars.ts, bars.open, bars.high, bars.low, bars.close, bars.volume):
+        h.update(column.tobytes())
+    return h.hexdigest()
+
+
+class SignalCache:
+    def __init__(self, root=None, max_entries=32, max_bytes=256 * 1024 * 1024):
+        self.root = root
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, f"{key}.npz")
+
+    def get(self, strategy, bars):
+        # the strategy's signal stream over bars, computed on the first request
+        key = stream_key(strategy, bars)
+        columns = self._memory.get(key)
+        if columns is None and self.root:
+            columns = self._load(key)
+        if columns is None:
+            self.misses += 1
+            columns = strategy.signal_stream(bars)
+            if self.root:
+                self._save(key, columns)
+        else:
+            self.hits += 1
+
+        self._memory[key] = columns
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+        return columns
+
+    def _load(self, key):
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                columns = {name: (data[name].item() if data[name].ndim == 0 else data[name]) for name in data.files}
+        except (OSError, ValueError):
+            return None
+        # mark as recently used
+        os.utime(path)
+        return columns
+
+    def _save(self, key, columns):
+        path = self.path(key)
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, **{name: np.asarray(value) for name, value in columns.items()})
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        evict_lru(self.root, ".npz", self.max_bytes)
@@ -24,3 +24,71 @@ class Strategy(ABC):
     def on_order_filled(self, order):
         # function to handle order filled events, can be overridden by subclasses
         pass
+
+    def on_order_update(self, order):
+        # function to handle acknowledgements and partial fills of orders that
+        # are still working, on_order_filled is called once they complete
+        pass
+
+    def next_wakeup(self):
+        # a WakeUp after which the strategy can act again, for event-skipping
+        # backtests; None steps it on every bar. rows before the wake-up are
+        # skipped, and before waking the strategy gets the candles as of the
+        # previous row through on_bar, so it must not skip a row it acts on
+        return None
+
+    # config attributes that shape the state a strategy builds before it has
+    # the history to trade (buffer sizes, timeframes, lookbacks). variants
+    # that differ only in other params reach the same state at the same bar
+    # and can share one warmup; None shares nothing
+    WARMUP_PARAMS = None
+
+    def warmed_up(self):
+        # True once the next bar can make generate_signals act; until then
+        # the state depends on the bars and WARMUP_PARAMS only
+        return True
+
+    # FeatureView of precomputed indicator columns, attached by a backtest
+    # with a feature store (src/backtesting/feature_store.py)
+    features = None
+
+    def feature_specs(self):
+        # (timeframe, {name: (indicator, params)}) of the store columns
+        # generate_signals reads through features.asof instead of computing
+        # them, or None to use no store
+        return None
+
+    # config attributes that change signal_stream; configs that differ only
+    # in other (sizing, risk, threshold) params can share one stream
+    SIGNAL_PARAMS = ()
+
+    def signal_stream(self, bars):
+        # optional vectorized research path: the per-candle indicator columns
+        # generate_signals would see over a 1m BarBatch, computed over whole
+        # arrays at once instead of bar by bar. depends on SIGNAL_PARAMS only
+        raise NotImplementedError(f"{type(self).__name__} has no vectorized signals")
+
+    def replay_stream(self, columns, cash=100000):
+        # the orders (TradeTracker records) of a backtest, from signal_stream
+        # columns: entry/exit rules, stops and sizing, bar by bar
+        raise NotImplementedError(f"{type(self).__name__} has no vectorized signals")
+
+    def compute_signals(self, bars, cash=100000):
+        columns = self.signal_stream(bars)
+        return columns, self.replay_stream(columns, cash)
+
+    def panel_stream(self, batches):
+        # optional cross-sectional path: signal_stream for the 1m BarBatches
+        # of many symbols at once, as (symbols, candles) matrices on one
+        # candle grid (candle_panel)
+        raise NotImplementedError(f"{type(self).__name__} has no cross-sectional signals")
+
+    def replay_panel(self, columns, cash=100000):
+        # replay_stream of every symbol of panel_stream columns, stepped
+        # together one candle at a time; {symbol: orders}, each symbol with
+        # its own account of cash
+        raise NotImplementedError(f"{type(self).__name__} has no cross-sectional signals")
+
+    def compute_panel(self, batches, cash=100000):
+        columns = self.panel_stream(batches)
+        return columns, self.replay_panel(columns, cash)
@@ -1,10 +1,15 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 from src.strategy.base import Strategy
+from src.strategy.vectorized import atr_last, order_record, rolling_mean_last, rolling_std_last, rsi_last
+from src.utils.candles import TIMEFRAME_MINUTES, candle_arrays
 from src.utils.types import *
 
 class MeanReversionStrategy(Strategy):
+    SIGNAL_PARAMS = ("timeframe", "bb_period", "rsi_period", "atr_period")
+    WARMUP_PARAMS = ("timeframe", "bb_period", "rsi_period", "atr_period")
+
     def __init__(self, config):
         super().__init__(config)
         
@@ -94,40 +99,50 @@ class MeanReversionStrategy(Strategy):
             
         symbol = self.last_bar.symbol
         close = self.df_prices['close']
-        
-        # Bollinger Bands calculations
-        middle_band = close.rolling(window=self.bb_period).mean()
-        rolling_std = close.rolling(window=self.bb_period).std()
-        upper_band = middle_band + self.bb_std * rolling_std
-        lower_band = middle_band - self.bb_std * rolling_std
-        
-        # RSI calculations
-        delta = close.diff()
-        gain = delta.clip(lower=0)
-        loss = -delta.clip(upper=0)
-        avg_gain = gain.ewm(alpha=1/self.rsi_period, adjust=False).mean()
-        avg_loss = loss.ewm(alpha=1/self.rsi_period, adjust=False).mean()
-        rs = avg_gain / (avg_loss + 1e-10)
-        rsi = 100 - (100 / (1 + rs))
-        
-        # ATR calculations
-        high = self.df_prices['high']
-        low = self.df_prices['low']
-        prev_close = close.shift(1)
-        tr = pd.concat([
-            (high - low),
-            (high - prev_close).abs(),
-            (low - prev_close).abs()
-        ], axis=1).max(axis=1)
-        atr = tr.rolling(window=self.atr_period).mean()
-        
-        # Extract latest values
         current_close = float(close.iloc[-1])
-        current_middle = float(middle_band.iloc[-1])
-        current_upper = float(upper_band.iloc[-1])
-        current_lower = float(lower_band.iloc[-1])
-        current_rsi = float(rsi.iloc[-1])
-        self.latest_atr = float(atr.iloc[-1])
+        
+        # Precomputed indicators of this candle from a feature store, if the
+        # backtest has one and holds the candle as this history opened it
+        features = self.features.asof(self.last_bar) if self.features is not None else None
+        if features is not None:
+            current_middle = features["middle_band"]
+            current_upper = current_middle + self.bb_std * features["rolling_std"]
+            current_lower = current_middle - self.bb_std * features["rolling_std"]
+            current_rsi = features["rsi"]
+            self.latest_atr = features["atr"]
+        else:
+            # Bollinger Bands calculations
+            middle_band = close.rolling(window=self.bb_period).mean()
+            rolling_std = close.rolling(window=self.bb_period).std()
+            upper_band = middle_band + self.bb_std * rolling_std
+            lower_band = middle_band - self.bb_std * rolling_std
+        
+            # RSI calculations
+            delta = close.diff()
+            gain = delta.clip(lower=0)
+            loss = -delta.clip(upper=0)
+            avg_gain = gain.ewm(alpha=1/self.rsi_period, adjust=False).mean()
+            avg_loss = loss.ewm(alpha=1/self.rsi_period, adjust=False).mean()
+            rs = avg_gain / (avg_loss + 1e-10)
+            rsi = 100 - (100 / (1 + rs))
+        
+            # ATR calculations
+            high = self.df_prices['high']
+            low = self.df_prices['low']
+            prev_close = close.shift(1)
+            tr = pd.concat([
+                (high - low),
+                (high - prev_close).abs(),
+                (low - prev_close).abs()
+            ], axis=1).max(axis=1)
+            atr = tr.rolling(window=self.atr_period).mean()
+        
+            # Extract latest values
+            current_middle = float(middle_band.iloc[-1])
+            current_upper = float(upper_band.iloc[-1])
+            current_lower = float(lower_band.iloc[-1])
+            current_rsi = float(rsi.iloc[-1])
+            self.latest_atr = float(atr.iloc[-1])
         
         # Initialize position structure if new symbol
         if symbol not in self.positions:
@@ -247,7 +262,83 @@ class MeanReversionStrategy(Strategy):
                 pos["stop_price"] = 0.0
                 pos["atr_at_entry"] = 0.0
 
+    def next_wakeup(self):
+        # signals, stop and middle band checks included, only run when a new
+        # candle of self.timeframe opens
+        if self.last_bar is None:
+            return None
+        return WakeUp(timestamp=self.last_bar.timestamp + timedelta(minutes=TIMEFRAME_MINUTES[self.timeframe]))
+
+    def warmed_up(self):
+        # the next new candle brings the history to the indicators' length
+        return len(self.df_prices) >= max(self.bb_period, self.rsi_period, self.atr_period)
+
+    def feature_specs(self):
+        return self.timeframe, {
+            "middle_band": ("sma", (self.bb_period,)),
+            "rolling_std": ("stddev", (self.bb_period,)),
+            "rsi": ("rsi", (self.rsi_period,)),
+            "atr": ("atr", (self.atr_period,)),
+        }
+
     def initialize_with_history(self, bars_1h, bars_15m):
         bars = bars_1h if self.timeframe == "1h" else bars_15m
         for bar in bars:
             self.on_bar(bar)
+
+    def signal_stream(self, bars):
+        # Bollinger/RSI/ATR columns of generate_signals for every candle at once
+        candles = candle_arrays(bars, self.timeframe)
+        close, first_close = candles["close"], candles["first_close"]
+        return {
+            "symbol": candles["symbol"],
+            "ts": candles["ts"],
+            "first_ts": candles["first_ts"],
+            "price": first_close,
+            "middle_band": rolling_mean_last(close, first_close, self.bb_period),
+            "rolling_std": rolling_std_last(close, first_close, self.bb_period),
+            "rsi": rsi_last(close, first_close, self.rsi_period),
+            "atr": atr_last(candles, self.atr_period),
+        }
+
+    def replay_stream(self, columns, cash=100000):
+        # one walk over the candles for the position state
+        symbol = columns["symbol"]
+        orders = []
+        side, size, stop = 0, 0.0, 0.0
+        balance = cash
+        middle_band = columns["middle_band"]
+        prices, middles = columns["price"].tolist(), middle_band.tolist()
+        uppers = (middle_band + self.bb_std * columns["rolling_std"]).tolist()
+        lowers = (middle_band - self.bb_std * columns["rolling_std"]).tolist()
+        rsis, atrs, first_ts = columns["rsi"].tolist(), columns["atr"].tolist(), columns["first_ts"].tolist()
+
+        for k in range(max(self.bb_period, self.rsi_period, self.atr_period), len(prices)):
+            price = prices[k]
+            if side != 0:
+                # Stop loss or mean reversion target (Middle Band)
+                if not ((side == 1 and (price <= stop or price >= middles[k]))
+                        or (side == -1 and (price >= stop or price <= middles[k]))):
+                    continue
+                order_side, qty = -side, size
+                side, size, stop = 0, 0.0, 0.0
+            else:
+                if price < lowers[k] and rsis[k] < self.rsi_oversold:
+                    order_side = 1
+                elif price > uppers[k] and rsis[k] > self.rsi_overbought:
+                    order_side = -1
+                else:
+                    continue
+
+                position_value = min(self.base_notional, balance * self.max_leverage)
+                position_value = np.clip(position_value, self.min_position_value, self.max_position_value)
+                qty = float(np.clip(position_value / price, self.min_position_size, self.max_position_size))
+                if qty <= 0:
+                    continue
+                side, size = order_side, qty
+                stop = price - self.stop_atr_mult * atrs[k] if order_side == 1 else price + self.stop_atr_mult * atrs[k]
+
+            balance -= order_side * qty * price
+            orders.append(order_record(len(orders) + 1, first_ts[k], order_side, symbol, price, qty))
+
+        return orders
@@ -4,10 +4,15 @@ from datetime import datetime
 import pandas as pd
 import numpy as np
 from src.strategy.base import Strategy
+from src.strategy.vectorized import order_record, true_range
+from src.utils.candles import candle_starts
 from src.utils.types import *
 
 
 class MultiTFStrategy(Strategy):
+    SIGNAL_PARAMS = ("ema_fast_period", "ema_slow_period", "signal_period", "atr_period")
+    WARMUP_PARAMS = ("ema_slow_period",)
+
     def __init__(self, config):
         super().__init__(config)
         
@@ -167,7 +172,36 @@ class MultiTFStrategy(Strategy):
         
         return position
 
-    
+    def signal_stream(self, bars):
+        # macd/signal line, crossovers and atr per df_prices row, two rows per
+        # replay step (the running 1h candle, then the running 15m one)
+        rows = price_rows(bars)
+        macd, signal_line = macd_lines(rows["close"], self.ema_fast_period, self.ema_slow_period, self.signal_period)
+        return {
+            "symbol": bars.symbol,
+            "minute_ts": bars.ts,
+            "close": rows["close"],
+            "macd": macd,
+            "signal_line": signal_line,
+            "cross": macd_crosses(macd, signal_line),
+            "atr": pd.Series(rows["tr"]).rolling(window=self.atr_period).mean().to_numpy(),
+        }
+
+    def replay_stream(self, columns, cash=100000):
+        event_rows = np.flatnonzero(columns["cross"])
+        fills = size_fills([self], [(event_rows, columns["cross"][event_rows], columns["atr"][event_rows], columns["close"][event_rows])], cash)[0]
+        minute_ts = columns["minute_ts"]
+        return [
+            order_record(i + 1, minute_ts[minute], side, columns["symbol"], price, size)
+            for i, (minute, side, price, size) in enumerate(zip(
+                fills["minute"].tolist(), fills["side"].tolist(), fills["price"].tolist(), fills["size"].tolist()))
+        ]
+
+    def warmed_up(self):
+        # indicators start once df_prices holds ema_slow_period rows, and a
+        # backtest bar adds two (1h and 15m)
+        return len(self.df_prices) >= self.ema_slow_period - 2
+
     def initialize_with_history(self, bars_1h, bars_15m):
         # pre load bars into memoory, otherwise strategy has to wait till it gets
         # enough data to start producing signals
@@ -176,4 +210,157 @@ class MultiTFStrategy(Strategy):
             self.on_bar(bar)
         
         for bar in bars_15m:
-            self.on_bar(bar)
\ No newline at end of file
+            self.on_bar(bar)
+
+
+# grid mode: one pass over the data for a whole grid of configs. in the
+# backtest every 1m step appends two rows to df_prices, so the strategy's
+# series is known up front and the per-row ewm of the last max_rows rows has a
+# closed form in terms of the ewm over all rows; macd lines for every
+# (fast, slow, signal) combination are computed as arrays, crossovers are sign
+# changes between the two rows of a step, and position_size runs on all
+# configs together, one order index at a time (each order's balance depends on
+# the fills before it)
+
+def price_rows(bars):
+    # the df_prices rows of a backtest over a 1m BarBatch: steps 1..n-1 each
+    # append the running 1h candle and then the running 15m candle, both
+    # closing at the step's 1m close. the first step sees rows 0 and 1
+    n = len(bars)
+    close = np.repeat(bars.close[1:], 2)
+    high = np.empty(2 * (n - 1))
+    low = np.empty(2 * (n - 1))
+    for offset, tf in enumerate(("1h", "15m")):
+        groups = candle_starts(bars.ts, tf)
+        high[offset::2] = pd.Series(bars.high).groupby(groups).cummax().to_numpy()[1:]
+        low[offset::2] = pd.Series(bars.low).groupby(groups).cummin().to_numpy()[1:]
+    return {
+        "close": close,
+        "high": high,
+        "low": low,
+        "tr": true_range(high, low, np.r_[np.nan, close[:-1]]),
+    }
+
+
+def _ewm_of_powers(decay, alpha, length):
+    # ewm(alpha, adjust=False) of decay ** j, j = 0..length-1
+    out = np.empty(length)
+    out[0] = 1.0
+    for j in range(1, length):
+        out[j] = (1 - alpha) * out[j - 1] + alpha * decay ** j
+    return out
+
+
+def macd_lines(close, fast, slow, signal_span, ema=None):
+    # macd and signal line of every row as on_bar computes them: from the
+    # last max(slow * 3, 200) rows only. an ewm restarted at row s differs
+    # from the ewm over all rows by decay ** (t - s) * (x[s] - ewm[s]), and
+    # the signal line, being an ewm of that, is corrected the same way
+    if ema is None:
+        ema = {}
+    for span in (fast, slow):
+        if span not in ema:
+            ema[span] = pd.Series(close).ewm(span=span, adjust=False).mean().to_numpy()
+    window = max(slow * 3, 200)
+    rows = np.arange(len(close))
+    start = np.maximum(rows - window + 1, 0)
+    steps = rows - start
+
+    decay_fast, decay_slow = 1 - 2 / (fast + 1), 1 - 2 / (slow + 1)
+    alpha_signal = 2 / (signal_span + 1)
+    gap_fast = close[start] - ema[fast][start]
+    gap_slow = close[start] - ema[slow][start]
+    macd = (ema[fast] + decay_fast ** steps * gap_fast) - (ema[slow] + decay_slow ** steps * gap_slow)
+
+    full_macd = ema[fast] - ema[slow]
+    full_signal = pd.Series(full_macd).ewm(span=signal_span, adjust=False).mean().to_numpy()
+    signal_line = (
+        full_signal + (1 - alpha_signal) ** steps * (full_macd[start] - full_signal[start])
+        + gap_fast * _ewm_of_powers(decay_fast, alpha_signal, window)[steps]
+        - gap_slow * _ewm_of_powers(decay_slow, alpha_signal, window)[steps]
+    )
+    macd[:slow - 1] = np.nan
+    signal_line[:slow - 1] = np.nan
+    return macd, signal_line
+
+
+def macd_crosses(macd, signal_line):
+    # +1/-1 on the 15m row of every step whose macd crossed the signal line
+    # since the step's 1h row, 0 elsewhere
+    cross = np.zeros(len(macd), dtype=np.int8)
+    prev_macd, prev_signal = macd[0::2], signal_line[0::2]
+    cur_macd, cur_signal = macd[1::2], signal_line[1::2]
+    up = (prev_macd <= prev_signal) & (cur_macd > cur_signal)
+    down = ~up & (prev_macd >= prev_signal) & (cur_macd < cur_signal)
+    cross[1::2] = np.where(up, 1, np.where(down, -1, 0))
+    return cross
+
+
+def macd_grid(bars, configs, cash=100000):
+    # fills of a backtest of every config over a 1m BarBatch, as one
+    # {"minute", "side", "size", "price"} dict of arrays per config; "minute"
+    # is the 1m row of the step that placed the order
+    strategies = [MultiTFStrategy(dict(config)) for config in configs]
+    rows = price_rows(bars)
+    close = rows["close"]
+
+    ema = {}
+    crosses = {}
+    atrs = {}
+    events = []
+    for st in strategies:
+        key = (st.ema_fast_period, st.ema_slow_period, st.signal_period)
+        if key not in crosses:
+            crosses[key] = macd_crosses(*macd_lines(close, *key, ema=ema))
+        if st.atr_period not in atrs:
+            atrs[st.atr_period] = pd.Series(rows["tr"]).rolling(window=st.atr_period).mean().to_numpy()
+        event_rows = np.flatnonzero(crosses[key])
+        events.append((event_rows, crosses[key][event_rows], atrs[st.atr_period][event_rows], close[event_rows]))
+    return size_fills(strategies, events, cash)
+
+
+def size_fills(strategies, events, cash=100000):
+    # position_size for the candidate orders of every strategy at once, one
+    # order index at a time; events are (df_prices rows, sides, atr, prices)
+    # per strategy. orders sized 0 are dropped like the backtest drops them
+    width = max((len(e[0]) for e in events), default=0)
+    shape = (len(strategies), width)
+    event_rows = np.zeros(shape, dtype=np.int64)
+    sides, atr, prices = np.zeros(shape), np.full(shape, np.nan), np.ones(shape)
+    for i, (rows, side, event_atr, price) in enumerate(events):
+        event_rows[i, :len(rows)] = rows
+        sides[i, :len(rows)] = side
+        atr[i, :len(rows)] = event_atr
+        prices[i, :len(rows)] = price
+
+    def param(name):
+        return np.array([getattr(st, name) for st in strategies], dtype=np.float64)
+
+    atr_multiplier, risk_per_trade, max_leverage = param("atr_multiplier"), param("risk_per_trade"), param("max_leverage")
+    min_size, max_size = param("min_position_size"), param("max_position_size")
+    min_value, max_value = param("min_position_value"), param("max_position_value")
+
+    balance = np.full(len(strategies), float(cash))
+    sizes = np.zeros(shape)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for j in range(width):
+            price = prices[:, j]
+            qty = risk_per_trade * balance / (atr_multiplier * atr[:, j])
+            position = np.clip(np.minimum(qty, balance * max_leverage / price), min_size, max_size)
+            value = position * price
+            position = np.where(value < min_value, min_value / price, np.where(value > max_value, max_value / price, position))
+            position = np.clip(position, min_size, max_size)
+            # padding has nan atr and gets no order, like atr <= 0
+            sizes[:, j] = np.where(atr[:, j] > 0, position, 0.0)
+            balance -= sides[:, j] * sizes[:, j] * price
+
+    fills = []
+    for i in range(len(strategies)):
+        placed = sizes[i] > 0
+        fills.append({
+            "minute": event_rows[i][placed] // 2 + 1,
+            "side": sides[i][placed].astype(np.int8),
+            "size": sizes[i][placed],
+            "price": prices[i][placed],
+        })
+    return fills
@@ -1,10 +1,15 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 from src.strategy.base import Strategy
+from src.strategy.vectorized import atr_last, log_return_std_last, momentum_last, order_record, rsi_last
+from src.utils.candles import candle_arrays, candle_panel, pack_panel, unpack_panel
 from src.utils.types import *
 
 class RegimeAwareMomentumStrategy(Strategy):
+    SIGNAL_PARAMS = ("momentum_lookback", "vol_window", "rsi_period", "atr_period")
+    WARMUP_PARAMS = ("vol_window",)
+
     def __init__(self, config):
         super().__init__(config)
         
@@ -86,30 +91,39 @@ class RegimeAwareMomentumStrategy(Strategy):
         symbol = self.last_bar.symbol
         close = self.df_prices['close']
         
-        momentum = np.log(close.iloc[-1] / close.iloc[-(self.momentum_lookback + 1)])
-        
-        log_returns = np.log(close / close.shift(1))
-        recent_log_returns = log_returns.iloc[-self.vol_window:]
-        self.latest_vol = float(recent_log_returns.std(ddof=1) * np.sqrt(8760))
-        
-        delta = close.diff()
-        gain = delta.clip(lower=0)
-        loss = -delta.clip(upper=0)
-        avg_gain = gain.ewm(alpha=1/self.rsi_period, adjust=False).mean()
-        avg_loss = loss.ewm(alpha=1/self.rsi_period, adjust=False).mean()
-        rs = avg_gain / (avg_loss + 1e-10)
-        rsi = 100 - (100 / (1 + rs))
-        current_rsi = float(rsi.iloc[-1])
-        
-        high = self.df_prices['high']
-        low = self.df_prices['low']
-        prev_close = close.shift(1)
-        tr = pd.concat([
-            (high - low),
-            (high - prev_close).abs(),
-            (low - prev_close).abs()
-        ], axis=1).max(axis=1)
-        self.latest_atr = float(tr.rolling(window=self.atr_period).mean().iloc[-1])
+        # precomputed indicators of this candle from a feature store, if the
+        # backtest has one and holds the candle as this history opened it
+        features = self.features.asof(self.last_bar) if self.features is not None else None
+        if features is not None:
+            momentum = features["momentum"]
+            self.latest_vol = features["vol"] * np.sqrt(8760)
+            current_rsi = features["rsi"]
+            self.latest_atr = features["atr"]
+        else:
+            momentum = np.log(close.iloc[-1] / close.iloc[-(self.momentum_lookback + 1)])
+            
+            log_returns = np.log(close / close.shift(1))
+            recent_log_returns = log_returns.iloc[-self.vol_window:]
+            self.latest_vol = float(recent_log_returns.std(ddof=1) * np.sqrt(8760))
+            
+            delta = close.diff()
+            gain = delta.clip(lower=0)
+            loss = -delta.clip(upper=0)
+            avg_gain = gain.ewm(alpha=1/self.rsi_period, adjust=False).mean()
+            avg_loss = loss.ewm(alpha=1/self.rsi_period, adjust=False).mean()
+            rs = avg_gain / (avg_loss + 1e-10)
+            rsi = 100 - (100 / (1 + rs))
+            current_rsi = float(rsi.iloc[-1])
+            
+            high = self.df_prices['high']
+            low = self.df_prices['low']
+            prev_close = close.shift(1)
+            tr = pd.concat([
+                (high - low),
+                (high - prev_close).abs(),
+                (low - prev_close).abs()
+            ], axis=1).max(axis=1)
+            self.latest_atr = float(tr.rolling(window=self.atr_period).mean().iloc[-1])
         
         if symbol not in self.positions:
             self.positions[symbol] = {
@@ -234,6 +248,152 @@ class RegimeAwareMomentumStrategy(Strategy):
                 pos["stop_price"] = 0.0
                 pos["atr_at_entry"] = 0.0
 
+    def next_wakeup(self):
+        # signals, stop and holding checks included, only run when a new 1h
+        # candle opens
+        if self.last_bar is None:
+            return None
+        return WakeUp(timestamp=self.last_bar.timestamp + timedelta(hours=1))
+
+    def warmed_up(self):
+        # the next new 1h candle brings the history to vol_window + 1 rows
+        return len(self.df_prices) >= self.vol_window
+
+    def feature_specs(self):
+        return "1h", {
+            "momentum": ("momentum", (self.momentum_lookback,)),
+            "vol": ("log_return_std", (self.vol_window,)),
+            "rsi": ("rsi", (self.rsi_period,)),
+            "atr": ("atr", (self.atr_period,)),
+        }
+
     def initialize_with_history(self, bars_1h, bars_15m):
         for bar in bars_1h:
             self.on_bar(bar)
+
+    def signal_stream(self, bars):
+        # the indicators of generate_signals for every 1h candle at once.
+        # df_prices keeps at most max(vol_window * 2, 500) rows, which only
+        # moves the rsi ewm by float noise once the history is longer
+        return self._signal_columns(candle_arrays(bars, "1h"))
+
+    def panel_stream(self, batches):
+        # signal_stream of every symbol, each indicator one pass over the
+        # (symbols, candles) matrices. the indicators run on the packed rows,
+        # so lags and windows count a symbol's own candles across the grid's
+        # gaps, and go back on the grid with the symbol's candle numbers
+        panel = candle_panel(batches, "1h")
+        packed = self._signal_columns(pack_panel(panel))
+        columns = {"symbols": panel["symbols"], "ts": panel["ts"], "index": panel["index"]}
+        for key in ("first_ts", "price", "momentum", "vol", "rsi", "atr"):
+            columns[key] = unpack_panel(packed[key], panel["index"])
+        return columns
+
+    def _signal_columns(self, candles):
+        first_close = candles["first_close"]
+        columns = {key: candles[key] for key in ("symbol", "symbols") if key in candles}
+        columns.update({
+            "ts": candles["ts"],
+            "first_ts": candles["first_ts"],
+            "price": first_close,
+            "momentum": momentum_last(candles, self.momentum_lookback),
+            "vol": log_return_std_last(candles, self.vol_window) * np.sqrt(8760),
+            "rsi": rsi_last(candles["close"], first_close, self.rsi_period),
+            "atr": atr_last(candles, self.atr_period),
+        })
+        return columns
+
+    def replay_stream(self, columns, cash=100000):
+        # one walk over the candles for the position state: stops, holding
+        # time and sizing depend on the fills before them
+        symbol = columns["symbol"]
+        orders = []
+        side, size, stop, entry_k = 0, 0.0, 0.0, 0
+        balance = cash
+        prices, moms, vols = columns["price"].tolist(), columns["momentum"].tolist(), columns["vol"].tolist()
+        rsis, atrs, first_ts = columns["rsi"].tolist(), columns["atr"].tolist(), columns["first_ts"].tolist()
+
+        for k in range(self.vol_window, len(prices)):
+            price, mom, k_vol = prices[k], moms[k], vols[k]
+            if side != 0:
+                if not ((side == 1 and price <= stop) or (side == -1 and price >= stop)
+                        or k - entry_k >= self.max_holding_bars
+                        or (side == 1 and mom < 0) or (side == -1 and mom > 0)):
+                    continue
+                order_side, qty = -side, size
+                side, size, stop = 0, 0.0, 0.0
+            else:
+                if mom > 0 and rsis[k] > self.rsi_threshold and k_vol > 0:
+                    order_side = 1
+                elif mom < 0 and rsis[k] < self.rsi_threshold and k_vol > 0:
+                    order_side = -1
+                else:
+                    continue
+
+                position_value = self.base_notional * min(self.target_vol / k_vol, self.max_scale)
+                position_value = min(position_value, balance * self.max_leverage)
+                position_value = np.clip(position_value, self.min_position_value, self.max_position_value)
+                qty = float(np.clip(position_value / price, self.min_position_size, self.max_position_size))
+                if qty <= 0:
+                    continue
+                side, size, entry_k = order_side, qty, k
+                stop = price - self.stop_atr_mult * atrs[k] if order_side == 1 else price + self.stop_atr_mult * atrs[k]
+
+            balance -= order_side * qty * price
+            orders.append(order_record(len(orders) + 1, first_ts[k], order_side, symbol, price, qty))
+
+        return orders
+
+    def replay_panel(self, columns, cash=100000):
+        # replay_stream for all symbols together: the position state is one
+        # array per field and each candle is a few numpy operations over the
+        # symbols, whatever their number. a symbol without a candle at a
+        # grid time does nothing there, its exits wait for its next candle,
+        # and holding time counts its own candles (index)
+        symbols = columns["symbols"]
+        prices, moms, vols = columns["price"], columns["momentum"], columns["vol"]
+        rsis, atrs, first_ts, index = columns["rsi"], columns["atr"], columns["first_ts"], columns["index"]
+        count, n = prices.shape
+
+        side = np.zeros(count, dtype=np.int64)
+        size = np.zeros(count)
+        stop = np.zeros(count)
+        entry_k = np.zeros(count, dtype=np.int64)
+        balance = np.full(count, float(cash))
+        orders = {symbol: [] for symbol in symbols}
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for k in range(n):
+                price, mom, k_vol, rsi, own_k = prices[:, k], moms[:, k], vols[:, k], rsis[:, k], index[:, k]
+                active = (own_k >= self.vol_window) & ~np.isnan(price)
+                if not active.any():
+                    continue
+                long, short = active & (side == 1), active & (side == -1)
+
+                exits = (long & (price <= stop)) | (short & (price >= stop)) | ((long | short) & (own_k - entry_k >= self.max_holding_bars))
+                exits |= (long & (mom < 0)) | (short & (mom > 0))
+                buys = active & (side == 0) & (mom > 0) & (rsi > self.rsi_threshold) & (k_vol > 0)
+                sells = active & (side == 0) & (mom < 0) & (rsi < self.rsi_threshold) & (k_vol > 0)
+                entries = buys | sells
+                if not (exits.any() or entries.any()):
+                    continue
+
+                order_side = np.where(exits, -side, np.where(buys, 1, -1))
+                position_value = self.base_notional * np.minimum(self.target_vol / k_vol, self.max_scale)
+                position_value = np.minimum(position_value, balance * self.max_leverage)
+                position_value = np.clip(position_value, self.min_position_value, self.max_position_value)
+                qty = np.where(exits, size, np.clip(position_value / price, self.min_position_size, self.max_position_size))
+                entries &= qty > 0
+                filled = exits | entries
+
+                side = np.where(exits, 0, np.where(entries, order_side, side))
+                size = np.where(exits, 0.0, np.where(entries, qty, size))
+                stop = np.where(exits, 0.0, np.where(entries, price - order_side * self.stop_atr_mult * atrs[:, k], stop))
+                entry_k = np.where(entries, own_k, entry_k)
+                balance = np.where(filled, balance - order_side * qty * price, balance)
+
+                for i in np.flatnonzero(filled).tolist():
+                    symbol_orders = orders[symbols[i]]
+                    symbol_orders.append(order_record(len(symbol_orders) + 1, first_ts[i, k], int(order_side[i]), symbols[i], float(price[i]), float(qty[i])))
+
+        return orders
@@ -0,0 +1,56 @@
+# strategies by name, imported only when one is asked for. built-in
+# strategies are listed as "module:Class" paths; installed packages can add
+# their own through the "stratix.strategies" entry point group, e.g.
+#
+#   [project.entry-points."stratix.strategies"]
+#   breakout = "my_pkg.breakout:BreakoutStrategy"
+#
+# built-in names win over entry points with the same name
+
+from importlib import import_module
+from importlib.metadata import entry_points
+
+ENTRY_POINT_GROUP = "stratix.strategies"
+
+BUILTIN_STRATEGIES = {
+    "multi_tf": "src.strategy.multi_tf:MultiTFStrategy",
+    "regime_aware": "src.strategy.regime_aware:RegimeAwareMomentumStrategy",
+    "mean_reversion": "src.strategy.mean_reversion:MeanReversionStrategy",
+}
+
+_loaded = {}
+_external = None
+
+
+def _entry_points():
+    # name -> entry point, read from installed package metadata once
+    global _external
+    if _external is None:
+        _external = {ep.name: ep for ep in entry_points(group=ENTRY_POINT_GROUP)}
+    return _external
+
+
+def available():
+    return sorted(set(BUILTIN_STRATEGIES) | set(_entry_points()))
+
+
+def load_strategy(name):
+    # the strategy class registered under name; its module is imported on
+    # first use
+    if name in _loaded:
+        return _loaded[name]
+
+    if name in BUILTIN_STRATEGIES:
+        module_name, _, class_name = BUILTIN_STRATEGIES[name].partition(":")
+        cls = getattr(import_module(module_name), class_name)
+    elif name in _entry_points():
+        cls = _entry_points()[name].load()
+    else:
+        raise KeyError(f"unknown strategy {name!r}, available: {', '.join(available())}")
+
+    _loaded[name] = cls
+    return cls
+
+
+def create_strategy(name, config=None):
+    return load_strategy(name)(config or {})
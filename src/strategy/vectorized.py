@@ -0,0 +1,128 @@
+# indicator columns for Strategy.compute_signals. an event-driven strategy
+# evaluates a candle once, when the candle opens: every earlier candle is
+# complete in its history and the new one holds only what the first 1m bar
+# put in it (the first_* columns of candle_arrays). each helper here takes
+# the complete series plus that opening value and returns, for every candle
+# k, the indicator over [complete[..k-1], opening[k]] -- the exact value
+# generate_signals saw when candle k opened. series may also be (symbols,
+# candles) matrices of a candle_panel, the helpers work along the last axis
+
+import numpy as np
+import pandas as pd
+
+from src.utils.candles import interval_start
+from src.utils.types import from_ms
+
+
+# window cells materialized at once by the rolling helpers
+_CHUNK_CELLS = 1 << 22
+
+
+def lagged(x):
+    # x one candle later along the last axis, nan in the first candle
+    out = np.full(np.shape(x), np.nan)
+    out[..., 1:] = x[..., :-1]
+    return out
+
+
+def windows_with_last(x, last, window):
+    # (..., n, window) array whose row k is x[k-window+1:k] followed by
+    # last[k], rows without a full window are nan
+    n = x.shape[-1]
+    out = np.full(x.shape + (window,), np.nan)
+    if window > 1 and n >= window:
+        out[..., window - 1:, :-1] = np.lib.stride_tricks.sliding_window_view(x, window - 1, axis=-1)[..., :n - window + 1, :]
+    out[..., -1] = last
+    if window > 1:
+        out[..., :window - 1, :] = np.nan
+    return out
+
+
+def _rolling_last(x, last, window, reduce):
+    # reduce over windows_with_last, in blocks of candles so a panel of many
+    # symbols never holds all of its windows at once
+    x, last = np.asarray(x, dtype=np.float64), np.asarray(last, dtype=np.float64)
+    n = x.shape[-1]
+    block = max(1, _CHUNK_CELLS // (window * max(1, x.size // max(n, 1))))
+    if block >= n:
+        return reduce(windows_with_last(x, last, window))
+    out = np.empty(x.shape)
+    for start in range(0, n, block):
+        stop = min(n, start + block)
+        lo = max(0, start - window + 1)
+        out[..., start:stop] = reduce(windows_with_last(x[..., lo:stop], last[..., lo:stop], window))[..., start - lo:]
+    return out
+
+
+def rolling_mean_last(x, last, window):
+    return _rolling_last(x, last, window, lambda w: w.mean(axis=-1))
+
+
+def rolling_std_last(x, last, window, ddof=1):
+    return _rolling_last(x, last, window, lambda w: w.std(axis=-1, ddof=ddof))
+
+
+def ewm_last(x, last, alpha):
+    # pandas ewm(alpha, adjust=False) of x, with the final step taken on
+    # last[k] instead of x[k]
+    x = np.asarray(x, dtype=np.float64)
+    if x.ndim == 1:
+        ewm = pd.Series(x).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    else:
+        # one column per symbol
+        ewm = pd.DataFrame(x.reshape(-1, x.shape[-1]).T).ewm(alpha=alpha, adjust=False).mean().to_numpy().T.reshape(x.shape)
+    prev = lagged(ewm)
+    old_wt = 1.0 - alpha
+    out = (old_wt * prev + alpha * last) / (old_wt + alpha)
+    return np.where(np.isnan(prev), last, out)
+
+
+def rsi_last(close, first_close, period):
+    prev_close = lagged(close)
+    delta, first_delta = close - prev_close, first_close - prev_close
+    avg_gain = ewm_last(np.clip(delta, 0, None), np.clip(first_delta, 0, None), 1 / period)
+    avg_loss = ewm_last(-np.clip(delta, None, 0), -np.clip(first_delta, None, 0), 1 / period)
+    rs = avg_gain / (avg_loss + 1e-10)
+    return 100 - (100 / (1 + rs))
+
+
+def true_range(high, low, prev_close):
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def atr_last(candles, period):
+    prev_close = lagged(candles["close"])
+    tr = true_range(candles["high"], candles["low"], prev_close)
+    first_tr = true_range(candles["first_high"], candles["first_low"], prev_close)
+    return rolling_mean_last(tr, first_tr, period)
+
+
+def momentum_last(candles, lag):
+    # log change from the close lag candles back to the opening close
+    close, first_close = candles["close"], candles["first_close"]
+    n = close.shape[-1]
+    out = np.full(close.shape, np.nan)
+    if n > lag:
+        out[..., lag:] = np.log(first_close[..., lag:] / close[..., :n - lag])
+    return out
+
+
+def log_return_std_last(candles, window):
+    # sample std of the last window 1-candle log returns, not annualized
+    close, first_close = candles["close"], candles["first_close"]
+    prev_close = lagged(close)
+    return rolling_std_last(np.log(close / prev_close), np.log(first_close / prev_close), window)
+
+
+def order_record(number, candle_ms, side, symbol, price, size):
+    # the TradeTracker record of an order filled when a candle opened; the
+    # backtest stamps fills with the open time of the 15m candle
+    return {
+        "timestamp": interval_start(from_ms(int(candle_ms)), "15m").isoformat(),
+        "side": "BUY" if side == 1 else "SELL",
+        "symbol": symbol,
+        "price": price,
+        "size": size,
+        "order_id": f"bt-{number}",
+        "status": "FILLED",
+    }
@@ -1,12 +1,26 @@
 # makes the actual calls to binance API
 from src.utils.types import *
+from src.utils.latency import LatencyHistogram
 import time
+import threading
 import hmac
 import hashlib
 import requests
+import numpy as np
 from urllib.parse import urlencode
 from datetime import datetime
 
+def klines_weight(limit):
+    # request weight of a spot klines request of limit candles
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
 class BinanceClient:
     def __init__(self, api_key, api_secret, base_url="https://testnet.binance.vision"):
         self.api_key = api_key
@@ -18,6 +32,30 @@ class BinanceClient:
         if self.api_key:
             self.session.headers.update({"X-MBX-APIKEY": self.api_key})
 
+        # per endpoint request latency and the last reported 1m request weight,
+        # updated from order worker threads as well as the trading loop
+        self.request_latency = {}
+        self.used_weight = 0
+        self._stats_lock = threading.Lock()
+
+    def _request(self, method, path, query):
+        url = f"{self.base_url}{path}?{query}"
+        start = time.perf_counter_ns()
+        try:
+            resp = self.session.request(method, url)
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            with self._stats_lock:
+                if path not in self.request_latency:
+                    self.request_latency[path] = LatencyHistogram()
+                self.request_latency[path].add(elapsed)
+
+        weight = resp.headers.get("X-MBX-USED-WEIGHT-1M")
+        if weight is not None:
+            self.used_weight = int(weight)
+        resp.raise_for_status()
+        return resp.json()
+
     def _sign(self, params):
         params = {k: v for k, v in params.items() if v is not None}
         query = urlencode(params)
@@ -44,11 +82,20 @@ class BinanceClient:
             params["timeInForce"] = "GTC" 
         
         signed = self._sign(params)
-        url = f"{self.base_url}{path}?{signed}"
-        resp = self.session.post(url)
-        resp.raise_for_status()
-        data = resp.json()
+        data = self._request("POST", path, signed)
         
+        return self._parse_order(data, price)
+
+    def get_order(self, symbol, order_id):
+        # current state of an order, used to follow resting/partial fills
+        path = "/api/v3/order"
+        ts = int(time.time() * 1000)
+        params = {"symbol": symbol, "orderId": order_id, "timestamp": ts}
+        signed = self._sign(params)
+
+        return self._parse_order(self._request("GET", path, signed))
+
+    def _parse_order(self, data, price=None):
         fill_price = price
         if data.get("fills") and len(data["fills"]) > 0:
 
@@ -56,8 +103,10 @@ class BinanceClient:
             if total_qty > 0:
                 weighted_sum = sum(float(f.get("qty", 0)) * float(f.get("price", 0)) for f in data["fills"])
                 fill_price = weighted_sum / total_qty
+        elif float(data.get("executedQty", 0)) > 0 and data.get("cummulativeQuoteQty") is not None:
+            # order queries carry no fills, only the cumulative quote amount
+            fill_price = float(data["cummulativeQuoteQty"]) / float(data["executedQty"])
 
-        
         order = Order(
             id=str(data.get("orderId")), symbol=data.get("symbol"), side=data.get("side"),
             size=float(data.get("origQty", 0)),
@@ -74,11 +123,8 @@ class BinanceClient:
         ts = int(time.time() * 1000)
         params = {"timestamp": ts}
         signed = self._sign(params)
-        url = f"{self.base_url}{path}?{signed}"
-        resp = self.session.get(url)
-        resp.raise_for_status()
 
-        return resp.json()
+        return self._request("GET", path, signed)
 
     def get_historical_klines(self, symbol, timeframe, start = None, end = None, limit = 500):
         #return past data in range start to end
@@ -94,10 +140,7 @@ class BinanceClient:
         if end is not None:
             params["endTime"] = end
         
-        url = f"{self.base_url}{path}?{urlencode(params)}"
-        resp = self.session.get(url)
-        resp.raise_for_status()
-        data = resp.json()
+        data = self._request("GET", path, urlencode(params))
         bars = []
         
         for k in data:
@@ -115,3 +158,27 @@ class BinanceClient:
             bars.append(b)
 
         return bars
+
+    def get_klines_array(self, symbol, timeframe, start = None, end = None, limit = 1000):
+        # same request as get_historical_klines, parsed straight into a
+        # (n, 6) float array of open time (ms), open, high, low, close, volume
+        # for bulk downloads that never need Bar objects
+
+        path = "/api/v3/klines"
+        params = {"symbol": symbol, "interval": timeframe, "limit": limit}
+        
+        if start is not None:
+            params["startTime"] = start
+        
+        if end is not None:
+            params["endTime"] = end
+
+        data = self._request("GET", path, urlencode(params))
+        if not data:
+            return np.empty((0, 6))
+
+        return np.array([k[:6] for k in data], dtype=np.float64)
+
+    def get_klines_batch(self, symbol, timeframe, start = None, end = None, limit = 1000):
+        rows = self.get_klines_array(symbol, timeframe, start=start, end=end, limit=limit)
+        return BarBatch(rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4], rows[:, 5], symbol, timeframe)
@@ -5,58 +5,161 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import argparse
+import requests
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from config.config import load_config
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from src.utils.logger import log_order_placement, log_trade, log_order_fill, log_signal_generation, log_market_data, setup_logger
 from src.strategy.base import Strategy
 from src.trading.exchange import BinanceClient
+from src.trading.order_pipeline import OrderPipeline
 from src.utils.types import Order
 from src.utils.types import AccountInfo
 from src.utils.trade_tracker import TradeTracker
-from src.backtesting.backtest import BacktestEngine
-from datetime import datetime
+from src.backtesting.result_cache import ResultCache
 from src.utils.data import write_trades
-from src.strategy.multi_tf import MultiTFStrategy
-from src.strategy.regime_aware import RegimeAwareMomentumStrategy
-from src.strategy.mean_reversion import MeanReversionStrategy
-from src.trading.exchange import BinanceClient
+from src.utils.latency import LatencyRecorder
+from src.utils.candles import CandleStore, TIMEFRAME_MINUTES
+from src.utils.candle_cache import CandleCache
+from urllib.parse import urlparse
+from src.strategy.registry import available, create_strategy
+
+class MetricsServer:
+    # optional prometheus endpoint for a live executor, served from a daemon
+    # thread so scrapes never block the trading loop
+
+    def __init__(self, executor, host="127.0.0.1", port=9108):
+        self.executor = executor
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        executor = self.executor
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = executor.render_metrics().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
 
 class Executor:
-    def __init__(self, strategy, broker = None, logger=None):
+    def __init__(self, strategy, broker = None, logger=None, latency=None, cache=None):
         self.strategy = strategy
         self.broker = broker
         self.orders = [] 
         self.trade_tracker = TradeTracker()
         self.logger = logger
+        self.latency = latency or LatencyRecorder(logger=logger)
+        self._order_ticks = {}
+        self._reserved = {}
+        # optional CandleCache serving the live prefill from disk
+        self.cache = cache
+
+        # live state exported by MetricsServer
+        self.account = None
+        self.order_counts = {"BUY": 0, "SELL": 0}
+        self.order_errors = 0
+        self.net_positions = {}
+        # guards order_counts and net_positions, which the metrics thread reads
+        self._state_lock = threading.Lock()
+        self.live_trades_path = "data/live_trades.csv"
+
+    def run_backtest(self, start, end, data_path_1m=None, cash=100000, commission=0.002, symbol=None, result_cache=None, strategies=None, event_skip=False, shards=1, shard_warmup_days=21.0, shard_overlap_days=7.0, feature_store=None):
+        # the backtesting stack (backtesting, BacktestEngine) is only
+        # imported for backtests, live mode never loads it
+        # strategies ({name: strategy}) backtests several strategies on one
+        # data pass, each saved to data/backtest_trades_<name>.csv
+        from src.backtesting.backtest import BacktestEngine
 
-    def run_backtest(self, start, end, data_path_1m=None, cash=100000, commission=0.002):
         engine = BacktestEngine(
-            self.strategy, 
+            strategies or self.strategy, 
             data_source_1m=data_path_1m,
-            logger=self.logger
+            logger=self.logger,
+            cache=self.cache,
+            symbol=symbol,
+            result_cache=result_cache,
+            event_skip=event_skip,
+            shards=shards,
+            shard_warmup=timedelta(days=shard_warmup_days),
+            shard_overlap=timedelta(days=shard_overlap_days),
+            feature_store=feature_store,
         )
         
         self.logger.info(f"Starting backtest...")
         
         orders = engine.run(start, end, cash=cash, commission=commission)
+        if strategies:
+            for run, path in zip(engine.runs, engine.save_all_trades_csv()):
+                self.logger.info(f"Backtesting completed, {run.name}: {len(run.trade_tracker.get_all_orders())} orders saved to {path}")
+            return {run.name: run.trade_tracker.get_all_orders() for run in engine.runs}
+        
         engine.save_trades_csv("data/backtest_trades.csv")
         
         self.logger.info(f"Backtesting completed, {len(orders)} orders saved")
         
         return orders
 
-    def run_live(self, symbol = "ETHUSDT", poll_interval= 60.0):
+    def run_live(self, symbol = "ETHUSDT", poll_interval= 60.0, order_workers=4, trades_path="data/live_trades.csv", max_iterations=None, base_timeframe="15m"):
         # while live trading, fetches latest data, sends it to strategy logic
         # generated signals, and places order if required at interval of 
         # poll_interval
+        # with order_workers > 0 orders are sent by a background pipeline and
+        # their fills are applied while waiting for the next poll
+        # max_iterations bounds the loop for soak/load tests against the mock exchange
+        # only base_timeframe klines are requested, 15m and 1h candles are
+        # built from them locally the same way the backtest builds them
+
+        candles = CandleStore(timeframes=("1h", "15m"))
+        base_minutes = TIMEFRAME_MINUTES[base_timeframe]
 
         if hasattr(self.strategy, 'initialize_with_history'):
             self.logger.info(f"Fetching past data to prefill memory")
 
-            hist_1h = self.broker.get_historical_klines(symbol, "1h", limit=200)
-            hist_15m = self.broker.get_historical_klines(symbol, "15m", limit=50)
-            
+            if self.cache is not None:
+                # closed candles materialized next to the cached base candles;
+                # only the base bars after the last closed hour go through the
+                # store, for the candle in progress
+                end = datetime.now()
+                start = end - timedelta(hours=201)
+                hist_1h = self.cache.get_closed(symbol, "1h", start, end, base_timeframe).bars()[-200:]
+                hist_15m = self.cache.get_closed(symbol, "15m", start, end, base_timeframe).bars()[-50:]
+                since = hist_1h[-1].timestamp + timedelta(hours=1) if hist_1h else start
+                for bar in self.cache.get_bars(symbol, base_timeframe, since, end):
+                    candles.add(bar)
+            else:
+                # one extra hour so the oldest of the 200 hourly candles is complete
+                for bar in self._fetch_history(symbol, base_timeframe, 201 * 60 // base_minutes):
+                    candles.add(bar)
+
+                hist_1h = candles.history("1h", 200)
+                hist_15m = candles.history("15m", 50)
 
             self.strategy.initialize_with_history(hist_1h, hist_15m)
 
@@ -75,30 +178,56 @@ class Executor:
                     balance += free
         
         account = AccountInfo(balance=balance, positions=positions)
+        self.account = account
+
+        pipeline = None
+        if order_workers > 0:
+            pipeline = OrderPipeline(self.broker, workers=order_workers)
+
+        self.live_trades_path = trades_path
+        self._order_ticks = {}
+        # quote balance set aside for BUY orders in the pipeline, by seq
+        self._reserved = {}
+        latency = self.latency
+        iterations = 0
 
         try:
-            while True:
+            while max_iterations is None or iterations < max_iterations:
                 # infitie loop for live trading pipeline
+                iterations += 1
+                next_poll = time.monotonic() + poll_interval
+                iteration_start = latency.now()
 
-                bars_1h = self.broker.get_historical_klines(symbol, "1h", limit=2)
-                
-                if bars_1h and len(bars_1h) >= 1:
-                    bar_1h = bars_1h[-1] 
+                try:
+                    for bar in self._fetch_latest(candles, symbol, base_timeframe):
+                        candles.add(bar)
+                except requests.RequestException as e:
+                    # transient exchange errors (5xx, 429, timeouts) skip this poll
+                    self.logger.warning(f"Market data request failed: {e}")
+                    self._wait_for_poll(pipeline, account, next_poll)
+                    continue
+
+                # tick: the moment fresh market data is in hand
+                tick = latency.since("kline_fetch", iteration_start)
+
+                bar_1h = candles.current("1h")
+                if bar_1h is not None:
                     log_market_data(self.logger, bar_1h)
-                    self.strategy.on_bar(bar_1h)
+                    with latency.stage("on_bar"):
+                        self.strategy.on_bar(bar_1h)
                 
-                bars_15m = self.broker.get_historical_klines(symbol, "15m", limit=2)
-                if not bars_15m or len(bars_15m) < 1:
-                    time.sleep(poll_interval)
+                bar_15m = candles.current("15m")
+                if bar_15m is None:
+                    self._wait_for_poll(pipeline, account, next_poll)
                     continue
                 
-                bar_15m = bars_15m[-1] 
-                
                 log_market_data(self.logger, bar_15m)
                 
-                self.strategy.on_bar(bar_15m)
+                with latency.stage("on_bar"):
+                    self.strategy.on_bar(bar_15m)
                 
-                signals = self.strategy.generate_signals()
+                with latency.stage("generate_signals"):
+                    signals = self.strategy.generate_signals()
                 
                 log_signal_generation(self.logger, signals, bar_15m)
                 
@@ -107,30 +236,165 @@ class Executor:
                     # skipping hold signals
                     if sig.side == 0:
                         continue
+
+                    # resting stops and cancels only exist in the backtest order book
+                    if sig.order_type not in ("MARKET", "LIMIT"):
+                        self.logger.warning(f"Skipping {sig.order_type} signal, only simulated in backtests | Symbol={sig.symbol}")
+                        continue
                     
-                    size = self.strategy.position_size(sig, account)
+                    with latency.stage("position_size"):
+                        size = self.strategy.position_size(sig, account)
                     
                     sig.size = size
-                    order = self.submit_order(sig, bar_15m)
-                    
-                    order_record = self.trade_tracker.add_order(order)
-                    log_trade(self.logger, order_record)
-                    
-                    if order.side == "BUY":
-                        account.balance -= order.filled_size * (order.price)
-                    elif order.side == "SELL":
-                        account.balance += order.filled_size * (order.price)
+
+                    if pipeline is not None:
+                        seq = pipeline.submit(sig)
+                        self._order_ticks[seq] = tick
+                        if sig.side == 1:
+                            # later signals are sized against the balance
+                            # left after this order, until its fill settles it
+                            notional = size * (sig.price or bar_15m.close)
+                            self._reserved[seq] = notional
+                            account.balance -= notional
+                        continue
+
+                    sent = latency.now()
+                    try:
+                        order = self.submit_order(sig, bar_15m)
+                    except requests.RequestException as e:
+                        # counted and logged like a pipeline error event,
+                        # the loop goes on to the next signal
+                        self.order_errors += 1
+                        self.logger.error(f"Order failed | Symbol={sig.symbol} | Size={sig.size} | {e}")
+                        continue
+                    latency.since("place_order", sent)
+                    latency.since("tick_to_trade", tick)
+                    self._record_order(order, account)
                 
-                self.save_live_trades("data/live_trades.csv")
+                with latency.stage("save_trades"):
+                    self.save_live_trades(trades_path)
                 
                 total_orders = len(self.trade_tracker.get_all_orders())
                 self.logger.debug(f"Live Trading Result: {total_orders} total orders logged")
+
+                elapsed = latency.since("iteration", iteration_start) - iteration_start
+                if elapsed > poll_interval * 1e9:
+                    self.logger.warning(f"Iteration overran poll interval | Took={elapsed / 1e9:.3f}s | Interval={poll_interval}s")
+                latency.maybe_dump()
                 
-                time.sleep(poll_interval)
+                self._wait_for_poll(pipeline, account, next_poll)
+
+            if pipeline is not None:
+                # let orders still in flight finish before returning
+                deadline = time.monotonic() + poll_interval
+                while pipeline.in_flight() and time.monotonic() < deadline:
+                    self._apply_order_events(pipeline.poll(timeout=deadline - time.monotonic()), account)
+                self.save_live_trades(trades_path)
 
         except Exception as e:
             self.logger.info(e)
             return
+
+        finally:
+            if pipeline is not None:
+                # events produced after the last poll are still applied
+                self._apply_order_events(pipeline.close(), account)
+                for order in pipeline.open_orders():
+                    self.logger.warning(f"Order still open on the exchange at shutdown | OrderID={order.id} | Filled={order.filled_size}/{order.size}")
+            latency.dump()
+
+    def _fetch_history(self, symbol, timeframe, count):
+        # latest count klines, paging backwards 1000 at a time
+        bars = []
+        end = None
+        while len(bars) < count:
+            limit = min(1000, count - len(bars))
+            page = self.broker.get_historical_klines(symbol, timeframe, end=end, limit=limit)
+            if not page:
+                break
+            bars = page + bars
+            if len(page) < limit:
+                break
+            end = int(page[0].timestamp.timestamp() * 1000) - 1
+        return bars
+
+    def _fetch_latest(self, candles, symbol, timeframe):
+        # the last two klines cover the closed and the in-progress candle; if
+        # polls were missed, fill the gap from the last stored candle
+        bars = self.broker.get_historical_klines(symbol, timeframe, limit=2)
+        last = candles.last_timestamp
+        if bars and last is not None and bars[0].timestamp > last:
+            start = int(last.timestamp() * 1000)
+            bars = self.broker.get_historical_klines(symbol, timeframe, start=start, limit=1000)
+        return bars
+
+    def _wait_for_poll(self, pipeline, account, next_poll):
+        # sleep until the next poll, applying order events as they come in so
+        # fills are not held back behind the poll interval
+        if pipeline is None:
+            time.sleep(max(0.0, next_poll - time.monotonic()))
+            return
+
+        while True:
+            remaining = next_poll - time.monotonic()
+            if remaining <= 0:
+                return
+
+            events = pipeline.poll(timeout=remaining)
+            if events:
+                self._apply_order_events(events, account)
+
+    def _apply_order_events(self, events, account):
+        # runs on the trading loop thread, so strategy callbacks and the
+        # trade tracker never see concurrent updates
+        filled = 0
+        for event in events:
+            order = event.order
+            if event.final:
+                account.balance += self._reserved.pop(event.seq, 0.0)
+
+            if event.kind == "error":
+                self._order_ticks.pop(event.seq, None)
+                self.order_errors += 1
+                self.logger.error(f"Order failed | Symbol={event.signal.symbol} | Size={event.signal.size} | {event.error}")
+            elif event.kind == "ack":
+                self.latency.record("place_order", event.at_ns - event.submitted_ns)
+                if event.seq in self._order_ticks:
+                    self.latency.record("tick_to_trade", event.at_ns - self._order_ticks.pop(event.seq))
+                log_order_placement(self.logger, order)
+                self.strategy.on_order_update(order)
+            elif event.kind == "partial":
+                log_order_fill(self.logger, order)
+                self.strategy.on_order_update(order)
+            elif event.kind == "open":
+                self.logger.info(f"Order still working, following it in the background | OrderID={order.id} | Status={order.status} | Filled={order.filled_size}/{order.size}")
+                self.strategy.on_order_update(order)
+            elif order.filled_size <= 0:
+                self.logger.info(f"Order closed without fills | OrderID={order.id} | Status={order.status}")
+            else:
+                self.latency.record("order_fill", event.at_ns - event.submitted_ns)
+                self.orders.append(order)
+                log_order_fill(self.logger, order)
+                self.strategy.on_order_filled(order)
+                self._record_order(order, account)
+                filled += 1
+
+        if filled:
+            self.save_live_trades(self.live_trades_path)
+
+    def _record_order(self, order, account):
+        order_record = self.trade_tracker.add_order(order)
+        log_trade(self.logger, order_record)
+        
+        if order.side == "BUY":
+            account.balance -= order.filled_size * (order.price)
+        elif order.side == "SELL":
+            account.balance += order.filled_size * (order.price)
+
+        sign = 1 if order.side == "BUY" else -1 if order.side == "SELL" else 0
+        with self._state_lock:
+            self.order_counts[order.side] = self.order_counts.get(order.side, 0) + 1
+            self.net_positions[order.symbol] = self.net_positions.get(order.symbol, 0.0) + sign * order.filled_size
         
     def submit_order(self, signal, bar=None):
 
@@ -159,8 +423,8 @@ class Executor:
             self.strategy.on_order_filled(order)
             return order
         else:
-            order_type = "MARKET"
-            order_price = None
+            order_type = signal.order_type
+            order_price = signal.price if order_type == "LIMIT" else None
             
             order_side = "BUY" if signal.side == 1 else "SELL" if signal.side == -1 else "HOLD"
             
@@ -180,6 +444,55 @@ class Executor:
             self.strategy.on_order_filled(order)
             return order
 
+    def render_metrics(self):
+        # prometheus text exposition of the live state, called from the
+        # metrics thread so it only reads executor attributes; the dicts the
+        # loop thread updates are copied under _state_lock first
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+
+        def summary(name, help_text, hists):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for labels, hist in hists:
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                for q in (50, 99):
+                    q_labels = ",".join(filter(None, [label_str, f'quantile="{q / 100}"']))
+                    lines.append(f"{name}{{{q_labels}}} {hist.percentile(q) / 1e9}")
+                suffix = f"{{{label_str}}}" if label_str else ""
+                lines.append(f"{name}_sum{suffix} {hist.total_ns / 1e9}")
+                lines.append(f"{name}_count{suffix} {hist.count}")
+
+        iteration = self.latency.histograms.get("iteration")
+        if iteration is not None:
+            summary("stratix_loop_iteration_seconds", "Live loop iteration time.", [({}, iteration)])
+            metric("stratix_loop_iteration_max_seconds", "gauge", "Slowest live loop iteration.", [({}, iteration.max_ns / 1e9)])
+
+        request_latency = getattr(self.broker, "request_latency", None)
+        if request_latency:
+            with self.broker._stats_lock:
+                endpoints = sorted(request_latency.items())
+            summary("stratix_exchange_request_seconds", "Exchange REST request latency per endpoint.", [({"endpoint": path}, h) for path, h in endpoints])
+
+        with self._state_lock:
+            order_counts = dict(self.order_counts)
+            net_positions = dict(self.net_positions)
+        metric("stratix_orders_total", "counter", "Filled orders per side.", [({"side": side}, n) for side, n in sorted(order_counts.items())])
+        metric("stratix_order_errors_total", "counter", "Orders that failed to send.", [({}, self.order_errors)])
+        metric("stratix_position_size", "gauge", "Net filled position per symbol.", [({"symbol": sym}, qty) for sym, qty in sorted(net_positions.items())])
+        if self.account is not None:
+            metric("stratix_balance", "gauge", "Tracked quote balance.", [({}, self.account.balance)])
+        if self.broker is not None:
+            metric("stratix_rate_limit_weight", "gauge", "Request weight used in the current minute, as reported by the exchange.", [({}, getattr(self.broker, "used_weight", 0))])
+
+        return "\n".join(lines) + "\n"
+
     def save_live_trades(self, path):
         all_orders = self.trade_tracker.get_all_orders()
         rows = []
@@ -209,28 +522,73 @@ if __name__ == "__main__":
     parser.add_argument("--start", type=str, help="Starttime for bt")
     parser.add_argument("--end", type=str, help="Endtime for bt")
     parser.add_argument("--symbol", type=str, default="ETHUSDT")
-    parser.add_argument("--strategy", choices=["multi_tf", "regime_aware", "mean_reversion"], default="multi_tf", help="Strategy to run")
+    parser.add_argument("--strategy", choices=available(), nargs="+", default=["multi_tf"], help="Strategy to run, several are backtested on one shared data pass")
     parser.add_argument("--logfile", type=str, help="Path to log file in logs/", required = True)
+    parser.add_argument("--order-workers", type=int, default=4, help="Threads sending live orders, 0 sends them inline")
+    parser.add_argument("--base-url", type=str, help="Exchange REST url, e.g. a local mock exchange (default: testnet)")
+    parser.add_argument("--poll-interval", type=float, default=60.0, help="Seconds between live polls")
+    parser.add_argument("--base-timeframe", choices=["1m", "15m"], default="15m", help="Only kline interval requested live, 15m/1h candles are built from it")
+    parser.add_argument("--latency-file", type=str, help="JSON file the live latency histograms are dumped to")
+    parser.add_argument("--latency-interval", type=float, default=300.0, help="Seconds between latency dumps")
+    parser.add_argument("--cache-dir", type=str, help="Candle cache root; live prefill and --from-cache backtests read from it, fetching only missing ranges")
+    parser.add_argument("--from-cache", action="store_true", help="Backtest on cached 1m candles of --symbol instead of --data-1m")
+    parser.add_argument("--metrics-port", type=int, help="Serve prometheus metrics on this local port while live trading")
+    parser.add_argument("--no-cache", action="store_true", help="Always rerun the backtest instead of reusing a stored identical run")
+    parser.add_argument("--event-skip", action="store_true", help="Backtest only steps strategies on the bars their next_wakeup asks for")
+    parser.add_argument("--shards", type=int, default=1, help="Split the backtest range into this many time shards run in parallel processes")
+    parser.add_argument("--shard-warmup-days", type=float, default=21.0, help="History replayed before each shard's cut, at least the strategy's lookback")
+    parser.add_argument("--shard-overlap-days", type=float, default=7.0, help="Rows after a cut within which a shard must match the serial state, else it is replayed serially")
+    parser.add_argument("--feature-store", action="store_true", help="Backtested strategies read their indicators from columns precomputed over the whole 1m history (<cache dir>/features); pays off with --event-skip")
+    parser.add_argument("--result-cache-mb", type=float, default=256.0, help="Size limit of the backtest result cache")
 
     args = parser.parse_args()
 
     logger = setup_logger(level=20, logfile=args.logfile)
     config = load_config()
 
-    if args.strategy == "regime_aware":
-        strategy = RegimeAwareMomentumStrategy({})
-    elif args.strategy == "mean_reversion":
-        strategy = MeanReversionStrategy({})
-    else:
-        strategy = MultiTFStrategy({})
+    if args.mode == "live" and len(args.strategy) > 1:
+        parser.error("live mode runs a single --strategy")
+    # one instance per strategy; the executor holds the first
+    strategies = {name: create_strategy(name) for name in args.strategy}
+    strategy = strategies[args.strategy[0]]
 
     if args.mode == "backtest":
-        execr = Executor(strategy, logger=logger)
+        cache = None
+        if args.from_cache:
+            # backtest history comes from mainnet, like scripts/download_data.py
+            client = BinanceClient(config.BINANCE_API_KEY, config.BINANCE_API_SECRET, base_url="https://api.binance.com")
+            cache = CandleCache(os.path.join(args.cache_dir or "data/cache", "api.binance.com"), client=client)
+
+        execr = Executor(strategy, logger=logger, cache=cache)
         start = datetime.fromisoformat(args.start)
         end = datetime.fromisoformat(args.end)
         
-        execr.run_backtest(start, end, data_path_1m=args.data_1m)
+        result_cache = None
+        if not args.no_cache:
+            result_cache = ResultCache(os.path.join(args.cache_dir or "data/cache", "backtests"), max_bytes=int(args.result_cache_mb * 1024 * 1024))
+        
+        feature_store = None
+        if args.feature_store:
+            from src.backtesting.feature_store import FeatureStore
+            feature_store = FeatureStore(os.path.join(args.cache_dir or "data/cache", "features"))
+        
+        execr.run_backtest(start, end, data_path_1m=args.data_1m, symbol=args.symbol, result_cache=result_cache, strategies=strategies if len(strategies) > 1 else None, event_skip=args.event_skip, shards=args.shards, shard_warmup_days=args.shard_warmup_days, shard_overlap_days=args.shard_overlap_days, feature_store=feature_store)
     else:
-        broker = BinanceClient(config.BINANCE_API_KEY, config.BINANCE_API_SECRET, base_url=config.TESTNET_URL)
-        execr = Executor(strategy, broker=broker, logger=logger)
-        execr.run_live(symbol=args.symbol)
+        broker = BinanceClient(config.BINANCE_API_KEY, config.BINANCE_API_SECRET, base_url=args.base_url or config.TESTNET_URL)
+        latency = LatencyRecorder(logger=logger, path=args.latency_file, dump_interval=args.latency_interval)
+        cache = None
+        if args.cache_dir:
+            # one cache per exchange, testnet and mainnet histories differ
+            cache = CandleCache(os.path.join(args.cache_dir, urlparse(broker.base_url).netloc), client=broker)
+        execr = Executor(strategy, broker=broker, logger=logger, latency=latency, cache=cache)
+
+        metrics = None
+        if args.metrics_port is not None:
+            metrics = MetricsServer(execr, port=args.metrics_port).start()
+            logger.info(f"Serving metrics on http://{metrics.host}:{metrics.port}/metrics")
+
+        try:
+            execr.run_live(symbol=args.symbol, poll_interval=args.poll_interval, order_workers=args.order_workers, base_timeframe=args.base_timeframe)
+        finally:
+            if metrics is not None:
+                metrics.stop()
@@ -0,0 +1,432 @@
+# local stand-in for the Binance REST endpoints used by BinanceClient
+# replays a 1m OHLCV csv on a controllable clock so the live executor can be
+# soak/load tested offline, with injectable latency, errors and rate limits.
+# every listed symbol gets its own series: the first replays the csv as it
+# is, the others the same bars rotated by a different share of the file
+# (rescaled where the rotation wraps so prices stay continuous), so symbols
+# trade different paths on one timeline. other symbols are rejected
+
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+import pandas as pd
+
+from src.trading.exchange import klines_weight
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "1d": 86_400_000,
+}
+
+# approximate request weights of the real endpoints
+ORDER_WEIGHT = 1
+ACCOUNT_WEIGHT = 20
+
+INVALID_SYMBOL = {"code": -1121, "msg": "Invalid symbol."}
+
+
+class MockClock:
+    # simulated exchange time in epoch ms, starting at start_ms and running at
+    # speed x wall clock; speed=0 freezes it so tests can advance it by hand
+
+    def __init__(self, start_ms, end_ms, speed=1.0):
+        self.end_ms = end_ms
+        self._lock = threading.Lock()
+        self._anchor_ms = start_ms
+        self._anchor_wall = time.monotonic()
+        self.speed = speed
+
+    def now_ms(self):
+        with self._lock:
+            elapsed = (time.monotonic() - self._anchor_wall) * 1000.0 * self.speed
+            return min(int(self._anchor_ms + elapsed), self.end_ms)
+
+    def set(self, ms):
+        with self._lock:
+            self._anchor_ms = min(int(ms), self.end_ms)
+            self._anchor_wall = time.monotonic()
+
+    def advance(self, ms):
+        self.set(self.now_ms() + ms)
+
+    def set_speed(self, speed):
+        now = self.now_ms()
+        with self._lock:
+            self.speed = speed
+        self.set(now)
+
+
+def rotated_series(columns, shift):
+    # columns with the rows from shift on first and the rows before shift
+    # after them, prices of the wrapped part scaled to continue from the end
+    if shift == 0:
+        return columns
+    scale = columns["close"][-1] / columns["open"][0]
+    out = {}
+    for name, values in columns.items():
+        head = values[:shift] if name == "volume" else values[:shift] * scale
+        out[name] = np.concatenate([values[shift:], head])
+    return out
+
+
+class MockExchange:
+    def __init__(self, data_path="data/eth_1m.csv", symbols=("ETHUSDT",), api_key="mock-key", api_secret="mock-secret",
+                 host="127.0.0.1", port=8900, speed=60.0, start=None,
+                 latency_ms=0.0, latency_jitter_ms=0.0, error_rate=0.0,
+                 weight_limit=1200, fill_volume_share=0.1, start_balances=None, seed=0):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.weight_limit = weight_limit
+        self.fill_volume_share = fill_volume_share
+        self.start_balances = start_balances or {"USDT": 10000.0, "ETH": 1.0}
+        self.rng = random.Random(seed)
+
+        df = pd.read_csv(data_path)
+        ts = pd.to_datetime(df["timestamp"]).to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        order = np.argsort(ts, kind="stable")
+        self.ts = ts[order]
+        columns = {name: df[name].to_numpy(dtype=np.float64)[order] for name in ("open", "high", "low", "close", "volume")}
+        symbols = list(symbols)
+        # symbol -> its open/high/low/close/volume arrays on the shared ts
+        self.series = {
+            symbol: rotated_series(columns, i * len(self.ts) // len(symbols))
+            for i, symbol in enumerate(symbols)
+        }
+
+        start_ms = int(self.ts[0]) if start is None else int(pd.Timestamp(start).value // 1_000_000)
+        self.clock = MockClock(start_ms, int(self.ts[-1]), speed=speed)
+
+        self._lock = threading.Lock()
+        self._orders = {}
+        self._next_order_id = 1
+        self._balances = {}
+        self._weight_window = deque()
+        self._used_weight = 0
+        self.stats = {"requests": {}, "errors_injected": 0, "rate_limited": 0, "auth_failures": 0, "orders": 0, "fills": 0}
+
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        # serve on a background thread, returns once the socket is bound
+        self._server = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-exchange", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    # market data
+
+    def _last_index(self, now_ms):
+        # index one past the last 1m bar that has opened by now_ms
+        return int(np.searchsorted(self.ts, now_ms, side="right"))
+
+    def klines(self, symbol, interval, start=None, end=None, limit=500):
+        series = self.series[symbol]
+        step = INTERVAL_MS[interval]
+        clock_now = self.clock.now_ms()
+        now = clock_now if end is None else min(clock_now, end)
+        # candles opening at or before end are returned whole
+        hi = self._last_index(min(clock_now, now - now % step + step - 1))
+
+        if start is not None:
+            lo = int(np.searchsorted(self.ts, start - start % step, side="left"))
+        else:
+            last_open = now - now % step
+            lo = int(np.searchsorted(self.ts, last_open - (limit - 1) * step, side="left"))
+
+        if hi <= lo:
+            return []
+
+        ts = self.ts[lo:hi]
+        buckets = ts - ts % step
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(ts)] - 1
+
+        opens = series["open"][lo:hi][starts]
+        highs = np.maximum.reduceat(series["high"][lo:hi], starts)
+        lows = np.minimum.reduceat(series["low"][lo:hi], starts)
+        closes = series["close"][lo:hi][ends]
+        volumes = np.add.reduceat(series["volume"][lo:hi], starts)
+        open_times = buckets[starts]
+
+        keep = np.ones(len(starts), dtype=bool)
+        if start is not None:
+            keep &= open_times >= start
+        if end is not None:
+            keep &= open_times <= end
+        idx = np.flatnonzero(keep)
+        idx = idx[:limit] if start is not None else idx[-limit:]
+
+        rows = []
+        for i in idx:
+            t = int(open_times[i])
+            rows.append([
+                t, str(opens[i]), str(highs[i]), str(lows[i]), str(closes[i]), str(volumes[i]),
+                t + step - 1, "0", 0, "0", "0", "0",
+            ])
+        return rows
+
+    # orders and account
+
+    def _balances_for(self, api_key):
+        if api_key not in self._balances:
+            self._balances[api_key] = dict(self.start_balances)
+        return self._balances[api_key]
+
+    def place_order(self, api_key, params):
+        symbol = params["symbol"]
+        if symbol not in self.series:
+            return 400, INVALID_SYMBOL
+        side = params["side"].upper()
+        order_type = params.get("type", "MARKET").upper()
+        qty = float(params["quantity"])
+        now = self.clock.now_ms()
+        i = self._last_index(now) - 1
+        if i < 0 or qty <= 0:
+            return 400, {"code": -1013, "msg": "Invalid quantity or no market data."}
+
+        with self._lock:
+            order_id = self._next_order_id
+            self._next_order_id += 1
+            order = {
+                "symbol": symbol, "orderId": order_id, "clientOrderId": f"mock-{order_id}",
+                "transactTime": now, "price": params.get("price", "0"), "origQty": str(qty),
+                "executedQty": "0", "cummulativeQuoteQty": "0", "status": "NEW",
+                "timeInForce": params.get("timeInForce", "GTC"), "type": order_type, "side": side,
+                "fills": [], "_key": api_key, "_checked": i,
+            }
+            self._orders[order_id] = order
+            self.stats["orders"] += 1
+
+            close = float(self.series[symbol]["close"][i])
+            if order_type == "MARKET":
+                self._fill(order, qty, close)
+            elif order_type == "LIMIT":
+                limit_price = float(params["price"])
+                if (side == "BUY" and limit_price >= close) or (side == "SELL" and limit_price <= close):
+                    self._fill(order, qty, close)
+            else:
+                del self._orders[order_id]
+                return 400, {"code": -1116, "msg": "Invalid orderType."}
+
+            return 200, _public(order)
+
+    def get_order(self, api_key, params):
+        with self._lock:
+            order = self._orders.get(int(params.get("orderId", 0)))
+            if order is None or order["_key"] != api_key:
+                return 400, {"code": -2013, "msg": "Order does not exist."}
+            self._match_resting(order, self._last_index(self.clock.now_ms()))
+            return 200, _public(order, fills=False)
+
+    def _match_resting(self, order, hi):
+        # fill a resting limit order against the bars replayed since it was
+        # last checked, taking at most fill_volume_share of each bar's volume
+        if order["status"] not in ("NEW", "PARTIALLY_FILLED"):
+            return
+        limit_price = float(order["price"])
+        series = self.series[order["symbol"]]
+        for i in range(order["_checked"] + 1, hi):
+            remaining = float(order["origQty"]) - float(order["executedQty"])
+            if remaining <= 0:
+                break
+            crossed = series["low"][i] <= limit_price if order["side"] == "BUY" else series["high"][i] >= limit_price
+            if crossed:
+                self._fill(order, min(remaining, series["volume"][i] * self.fill_volume_share), limit_price)
+        order["_checked"] = max(order["_checked"], hi - 1)
+
+    def _fill(self, order, qty, price):
+        executed = float(order["executedQty"]) + qty
+        quote = float(order["cummulativeQuoteQty"]) + qty * price
+        order["executedQty"] = str(executed)
+        order["cummulativeQuoteQty"] = str(quote)
+        order["status"] = "FILLED" if executed >= float(order["origQty"]) - 1e-12 else "PARTIALLY_FILLED"
+        order["fills"].append({"price": str(price), "qty": str(qty), "commission": "0", "commissionAsset": "USDT"})
+        self.stats["fills"] += 1
+
+        balances = self._balances_for(order["_key"])
+        base = order["symbol"][:-4] if order["symbol"].endswith("USDT") else order["symbol"]
+        sign = 1.0 if order["side"] == "BUY" else -1.0
+        balances[base] = balances.get(base, 0.0) + sign * qty
+        balances["USDT"] = balances.get("USDT", 0.0) - sign * qty * price
+
+    def account(self, api_key):
+        with self._lock:
+            balances = self._balances_for(api_key)
+            return 200, {
+                "canTrade": True,
+                "updateTime": self.clock.now_ms(),
+                "balances": [{"asset": a, "free": str(v), "locked": "0"} for a, v in balances.items()],
+            }
+
+    # request gates
+
+    def count(self, key):
+        with self._lock:
+            if key.startswith("/"):
+                requests = self.stats["requests"]
+                requests[key] = requests.get(key, 0) + 1
+            else:
+                self.stats[key] += 1
+
+    def take_weight(self, weight):
+        # rolling one minute request weight, returns the weight in use or None
+        # if the request would exceed weight_limit
+        now = time.monotonic()
+        with self._lock:
+            while self._weight_window and now - self._weight_window[0][0] >= 60.0:
+                self._used_weight -= self._weight_window.popleft()[1]
+            if self._used_weight + weight > self.weight_limit:
+                return None
+            self._weight_window.append((now, weight))
+            self._used_weight += weight
+            return self._used_weight
+
+    def check_signature(self, api_key, raw_query):
+        if api_key != self.api_key:
+            return 401, {"code": -2014, "msg": "API-key format invalid."}
+        query, sep, signature = raw_query.rpartition("&signature=")
+        if not sep:
+            return 400, {"code": -1102, "msg": "Mandatory parameter 'signature' was not sent."}
+        expected = hmac.new(self.api_secret.encode(), query.encode(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, signature):
+            return 400, {"code": -1022, "msg": "Signature for this request is not valid."}
+        params = dict(parse_qsl(query))
+        recv_window = int(params.get("recvWindow", 5000))
+        if abs(int(time.time() * 1000) - int(params.get("timestamp", 0))) > recv_window:
+            return 400, {"code": -1021, "msg": "Timestamp for this request is outside of the recvWindow."}
+        return None
+
+
+def _public(order, fills=True):
+    out = {k: v for k, v in order.items() if not k.startswith("_")}
+    if not fills:
+        out.pop("fills")
+    return out
+
+
+def _make_handler(exchange):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body go out in separate writes, avoid the delayed-ack stall
+        disable_nagle_algorithm = True
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def _dispatch(self, method):
+            url = urlparse(self.path)
+            params = dict(parse_qsl(url.query))
+            exchange.count(url.path)
+
+            if url.path.startswith("/mock/"):
+                return self._control(url.path, params)
+
+            if exchange.latency_ms or exchange.latency_jitter_ms:
+                delay = exchange.latency_ms + exchange.rng.uniform(0, exchange.latency_jitter_ms)
+                time.sleep(delay / 1000.0)
+
+            if exchange.error_rate and exchange.rng.random() < exchange.error_rate:
+                exchange.count("errors_injected")
+                return self._send(500, {"code": -1000, "msg": "Injected internal error."})
+
+            if url.path == "/api/v3/klines":
+                weight = klines_weight(int(params.get("limit", 500)))
+            elif url.path == "/api/v3/account":
+                weight = ACCOUNT_WEIGHT
+            else:
+                weight = ORDER_WEIGHT
+
+            used = exchange.take_weight(weight)
+            if used is None:
+                exchange.count("rate_limited")
+                return self._send(429, {"code": -1003, "msg": "Too much request weight used."}, {"Retry-After": "60"})
+            headers = {"X-MBX-USED-WEIGHT-1M": str(used)}
+
+            if url.path == "/api/v3/klines" and method == "GET":
+                if params.get("interval") not in INTERVAL_MS:
+                    return self._send(400, {"code": -1120, "msg": "Invalid interval."}, headers)
+                if params.get("symbol") not in exchange.series:
+                    return self._send(400, INVALID_SYMBOL, headers)
+                rows = exchange.klines(
+                    params.get("symbol"), params["interval"],
+                    start=int(params["startTime"]) if "startTime" in params else None,
+                    end=int(params["endTime"]) if "endTime" in params else None,
+                    limit=min(int(params.get("limit", 500)), 1000),
+                )
+                return self._send(200, rows, headers)
+
+            if url.path not in ("/api/v3/order", "/api/v3/account"):
+                return self._send(404, {"code": -1, "msg": "Unknown endpoint."}, headers)
+
+            api_key = self.headers.get("X-MBX-APIKEY")
+            failure = exchange.check_signature(api_key, url.query)
+            if failure is not None:
+                exchange.count("auth_failures")
+                return self._send(*failure, headers)
+
+            if url.path == "/api/v3/account":
+                return self._send(*exchange.account(api_key), headers)
+            if method == "POST":
+                return self._send(*exchange.place_order(api_key, params), headers)
+            return self._send(*exchange.get_order(api_key, params), headers)
+
+        def _control(self, path, params):
+            # /mock/clock?set=<ms>|advance=<ms>|speed=<x> and /mock/stats
+            if path == "/mock/clock":
+                if "speed" in params:
+                    exchange.clock.set_speed(float(params["speed"]))
+                if "set" in params:
+                    exchange.clock.set(int(params["set"]))
+                if "advance" in params:
+                    exchange.clock.advance(int(params["advance"]))
+                return self._send(200, {"now": exchange.clock.now_ms(), "speed": exchange.clock.speed})
+            if path == "/mock/stats":
+                with exchange._lock:
+                    return self._send(200, json.loads(json.dumps(exchange.stats)))
+            return self._send(404, {"code": -1, "msg": "Unknown endpoint."})
+
+        def _send(self, status, body, headers=None):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return Handler
@@ -0,0 +1,182 @@
+# bounded order submission pipeline for live trading
+# worker threads send orders to the broker concurrently, while the trading
+# loop drains the resulting events and applies them. events of one order
+# arrive in the order they happened; orders do not wait on each other, so a
+# resting order never holds back the fills of later ones.
+#
+# a worker follows an order that is still working for fill_timeout seconds,
+# then reports it "open" with what has executed so far and hands it to a
+# reconciler thread, which keeps polling it every reconcile_interval until
+# the exchange shows it in a final state
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from src.utils.types import *
+
+TERMINAL_STATUSES = {"FILLED", "CANCELED", "REJECTED", "EXPIRED", "EXPIRED_IN_MATCH"}
+
+
+@dataclass
+class OrderEvent:
+    seq: int
+    kind: str  # "ack", "partial", "open", "filled" or "error"
+    signal: Signal
+    order: Optional[Order] = None
+    error: Optional[Exception] = None
+    # perf_counter_ns when the signal was submitted and when this event happened
+    submitted_ns: int = 0
+    at_ns: int = 0
+
+    @property
+    def final(self):
+        return self.kind in ("filled", "error")
+
+
+class OrderPipeline:
+    def __init__(self, broker, workers=4, max_pending=64, fill_poll_interval=0.5, fill_timeout=30.0, reconcile_interval=5.0):
+        self.broker = broker
+        self.fill_poll_interval = fill_poll_interval
+        self.fill_timeout = fill_timeout
+        self.reconcile_interval = reconcile_interval
+
+        # submit() blocks once max_pending orders are waiting for a worker
+        self._requests = queue.Queue(maxsize=max_pending)
+        self._events = queue.Queue()
+
+        # only touched by the thread calling submit()/poll()
+        self._next_seq = 0
+        self._unfinished = set()
+
+        # orders past fill_timeout, followed by the reconciler:
+        # seq -> (signal, submitted_ns, order)
+        self._following = {}
+        self._following_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self._workers = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker, name=f"order-worker-{i}", daemon=True)
+            t.start()
+            self._workers.append(t)
+        self._reconciler = threading.Thread(target=self._reconcile, name="order-reconciler", daemon=True)
+        self._reconciler.start()
+
+    def submit(self, signal):
+        # queue a signal (with its size already set) for sending, returns its
+        # sequence number
+        seq = self._next_seq
+        self._next_seq += 1
+        self._unfinished.add(seq)
+        self._requests.put((seq, signal, time.perf_counter_ns()))
+        return seq
+
+    def in_flight(self):
+        # orders submitted that have not reached a final event yet
+        return len(self._unfinished)
+
+    def open_orders(self):
+        # the last known state of the orders the reconciler is following
+        with self._following_lock:
+            return [order for _, _, order in self._following.values()]
+
+    def poll(self, timeout=0.0):
+        # return events that are ready, waiting up to timeout seconds for the
+        # first one
+        deadline = time.monotonic() + timeout
+        ready = []
+
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and not ready:
+                    event = self._events.get(timeout=remaining)
+                else:
+                    event = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if event.final:
+                self._unfinished.discard(event.seq)
+            ready.append(event)
+
+        return ready
+
+    def close(self, timeout=5.0):
+        # stop the threads and return the events they produced that were not
+        # polled yet, for the caller to apply. orders still open on the
+        # exchange stay there, see open_orders()
+        self._stop.set()
+        for _ in self._workers:
+            self._requests.put(None)
+        for t in self._workers:
+            t.join(timeout)
+        self._reconciler.join(timeout)
+        return self.poll()
+
+    def _worker(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            seq, signal, submitted_ns = item
+            try:
+                self._send(seq, signal, submitted_ns)
+            except Exception as e:
+                self._emit(seq, "error", signal, submitted_ns, error=e)
+
+    def _emit(self, seq, kind, signal, submitted_ns, order=None, error=None):
+        self._events.put(OrderEvent(seq, kind, signal, order, error, submitted_ns, time.perf_counter_ns()))
+
+    def _send(self, seq, signal, submitted_ns):
+        order_side = "BUY" if signal.side == 1 else "SELL" if signal.side == -1 else "HOLD"
+        price = signal.price if signal.order_type == "LIMIT" else None
+        order = self.broker.place_order(signal.symbol, order_side, signal.size, price=price, order_type=signal.order_type)
+        self._emit(seq, "ack", signal, submitted_ns, order=order)
+
+        if order.status in TERMINAL_STATUSES or not hasattr(self.broker, "get_order"):
+            self._emit(seq, "filled", signal, submitted_ns, order=order)
+            return
+
+        # order is resting or partially filled, follow it until it completes
+        deadline = time.monotonic() + self.fill_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.fill_poll_interval)
+            order = self._check(seq, signal, submitted_ns, order)
+            if order.status in TERMINAL_STATUSES:
+                self._emit(seq, "filled", signal, submitted_ns, order=order)
+                return
+
+        # still working: report what executed so far and keep following it
+        # at the reconciler's pace instead of holding this worker
+        self._emit(seq, "open", signal, submitted_ns, order=order)
+        with self._following_lock:
+            self._following[seq] = (signal, submitted_ns, order)
+
+    def _check(self, seq, signal, submitted_ns, order):
+        # the order as the exchange has it now, a "partial" event if more of
+        # it executed since last seen
+        current = self.broker.get_order(order.symbol, order.id)
+        if current.status not in TERMINAL_STATUSES and current.filled_size > order.filled_size:
+            self._emit(seq, "partial", signal, submitted_ns, order=current)
+        return current
+
+    def _reconcile(self):
+        while not self._stop.wait(self.reconcile_interval):
+            with self._following_lock:
+                following = list(self._following.items())
+            for seq, (signal, submitted_ns, order) in following:
+                try:
+                    order = self._check(seq, signal, submitted_ns, order)
+                except Exception:
+                    # transient exchange errors, try again next round
+                    continue
+                with self._following_lock:
+                    if order.status in TERMINAL_STATUSES:
+                        del self._following[seq]
+                    else:
+                        self._following[seq] = (signal, submitted_ns, order)
+                if order.status in TERMINAL_STATUSES:
+                    self._emit(seq, "filled", signal, submitted_ns, order=order)
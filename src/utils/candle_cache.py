@@ -0,0 +1,183 @@
+# local on-disk candle cache shared by the downloader, backtests and live
+# prefill. one file per (symbol, timeframe) of fixed-width records sorted by
+# open time, so the time column doubles as the index (binary search on a
+# memory map). a sidecar json records which time ranges were already fetched
+# so only the missing gaps are requested from the exchange.
+#
+# new candles are appended in place; readers only look at whole records, so
+# they never see a half-written one. filling a gap before or inside the cached
+# range rewrites the file to a temp path and renames it over the old one, which
+# leaves readers of the old file untouched. writers serialise on a lock file.
+
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from src.utils.resampled import ResampledBars
+from src.utils.types import *
+
+TIMEFRAME_MS = {"1m": 60_000, "15m": 900_000, "1h": 3_600_000}
+
+
+def bars_to_records(bars):
+    return BarBatch.from_bars(bars).to_records()
+
+
+def records_to_bars(records, symbol, timeframe):
+    return BarBatch.from_records(records, symbol, timeframe).bars()
+
+
+def merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class CandleCache:
+    def __init__(self, root="data/cache", client=None):
+        self.root = root
+        self.client = client
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, symbol, timeframe):
+        return os.path.join(self.root, f"{symbol}_{timeframe}.bin")
+
+    def _coverage_path(self, symbol, timeframe):
+        return os.path.join(self.root, f"{symbol}_{timeframe}.json")
+
+    @contextmanager
+    def _write_lock(self, symbol, timeframe):
+        with open(os.path.join(self.root, f"{symbol}_{timeframe}.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # reading
+
+    def view(self, symbol, timeframe):
+        # read-only memory map of every whole record currently on disk
+        path = self.path(symbol, timeframe)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=BAR_DTYPE)
+        n = os.path.getsize(path) // BAR_DTYPE.itemsize
+        if n == 0:
+            return np.empty(0, dtype=BAR_DTYPE)
+        return np.memmap(path, dtype=BAR_DTYPE, mode="r", shape=(n,))
+
+    def read(self, symbol, timeframe, start_ms=None, end_ms=None):
+        # cached records with start_ms <= ts <= end_ms, as an in-memory array
+        data = self.view(symbol, timeframe)
+        ts = data["ts"]
+        lo = 0 if start_ms is None else int(np.searchsorted(ts, start_ms, side="left"))
+        hi = len(data) if end_ms is None else int(np.searchsorted(ts, end_ms, side="right"))
+        return np.array(data[lo:hi])
+
+    def coverage(self, symbol, timeframe):
+        path = self._coverage_path(symbol, timeframe)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)
+
+    def missing(self, symbol, timeframe, start_ms, end_ms):
+        # sub-ranges of [start_ms, end_ms] that were never fetched
+        gaps = []
+        cursor = start_ms
+        for lo, hi in self.coverage(symbol, timeframe):
+            if hi < cursor:
+                continue
+            if lo > end_ms:
+                break
+            if lo > cursor:
+                gaps.append((cursor, lo - 1))
+            cursor = max(cursor, hi + 1)
+        if cursor <= end_ms:
+            gaps.append((cursor, end_ms))
+        return gaps
+
+    # writing
+
+    def store(self, symbol, timeframe, records, start_ms, end_ms):
+        # add records fetched for [start_ms, end_ms] and mark that range covered
+        records = np.sort(np.asarray(records, dtype=BAR_DTYPE), order="ts")
+        if len(records):
+            records = records[np.r_[True, records["ts"][1:] != records["ts"][:-1]]]
+
+        with self._write_lock(symbol, timeframe):
+            existing = self.view(symbol, timeframe)
+            path = self.path(symbol, timeframe)
+
+            if len(records):
+                if len(existing) == 0 or records["ts"][0] > existing["ts"][-1]:
+                    with open(path, "ab") as f:
+                        f.write(records.tobytes())
+                else:
+                    merged = np.concatenate([np.array(existing), records])
+                    merged = merged[np.argsort(merged["ts"], kind="stable")[::-1]]
+                    # keep the newest copy of any timestamp fetched twice
+                    _, keep = np.unique(merged["ts"], return_index=True)
+                    merged = merged[keep]
+                    tmp = f"{path}.tmp"
+                    with open(tmp, "wb") as f:
+                        f.write(merged.tobytes())
+                    os.replace(tmp, path)
+
+            coverage = merge_ranges(self.coverage(symbol, timeframe) + [[start_ms, end_ms]])
+            tmp = f"{self._coverage_path(symbol, timeframe)}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(coverage, f)
+            os.replace(tmp, self._coverage_path(symbol, timeframe))
+
+    def fill(self, symbol, timeframe, start_ms, end_ms):
+        # fetch every missing gap of the range from the exchange; only closed
+        # candles are cached so the in-progress one is always re-requested
+        step = TIMEFRAME_MS[timeframe]
+        now = int(time.time() * 1000)
+        last_closed = now - now % step - step
+        end_ms = min(end_ms, last_closed)
+        fetched = 0
+
+        for gap_start, gap_end in self.missing(symbol, timeframe, start_ms, end_ms):
+            cursor = gap_start
+            while cursor <= gap_end:
+                records = self.client.get_klines_batch(symbol, timeframe, start=cursor, end=gap_end, limit=1000).to_records()
+                if len(records) == 0:
+                    self.store(symbol, timeframe, records, cursor, gap_end)
+                    break
+                covered_to = gap_end if len(records) < 1000 else int(records["ts"][-1]) + step - 1
+                self.store(symbol, timeframe, records, cursor, covered_to)
+                fetched += len(records)
+                cursor = int(records["ts"][-1]) + step
+
+        return fetched
+
+    def get(self, symbol, timeframe, start_ms, end_ms):
+        # range query, filling gaps first when a client is attached
+        if self.client is not None:
+            self.fill(symbol, timeframe, start_ms, end_ms)
+        return self.read(symbol, timeframe, start_ms, end_ms)
+
+    def get_bars(self, symbol, timeframe, start, end):
+        return records_to_bars(self.get(symbol, timeframe, to_ms(start), to_ms(end)), symbol, timeframe)
+
+    def get_batch(self, symbol, timeframe, start, end):
+        return BarBatch.from_records(self.get(symbol, timeframe, to_ms(start), to_ms(end)), symbol, timeframe)
+
+    def get_closed(self, symbol, timeframe, start, end, base_timeframe="1m"):
+        # closed timeframe candles aggregated from the cached base_timeframe
+        # ones, materialized under root/resampled and extended as the base
+        # file grows
+        self.get(symbol, base_timeframe, to_ms(start), to_ms(end))
+        base = BarBatch.from_records(np.array(self.view(symbol, base_timeframe)), symbol, base_timeframe)
+        resampled = ResampledBars(os.path.join(self.root, "resampled"))
+        return resampled.closed(f"{symbol}_{base_timeframe}", base, timeframe, to_ms(start), to_ms(end))
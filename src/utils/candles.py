@@ -0,0 +1,237 @@
+# builds higher timeframe candles from a single base timeframe
+# shared by the backtest (fed 1m bars from csv) and live trading (fed base
+# timeframe klines), so both produce candles the same way
+
+from collections import deque
+
+import numpy as np
+
+from src.utils.types import *
+
+TIMEFRAME_MINUTES = {"1m": 1, "15m": 15, "1h": 60}
+
+
+def interval_start(timestamp, timeframe):
+    # start of the candle containing timestamp, aligned to midnight
+    interval_minutes = TIMEFRAME_MINUTES[timeframe]
+    minutes_since_midnight = timestamp.hour * 60 + timestamp.minute
+    interval_start_minutes = (minutes_since_midnight // interval_minutes) * interval_minutes
+    return timestamp.replace(
+        hour=interval_start_minutes // 60,
+        minute=interval_start_minutes % 60,
+        second=0,
+        microsecond=0
+    )
+
+
+def aggregate_bars(bars, timeframe, start):
+    return Bar(
+        symbol=bars[0].symbol,
+        timeframe=timeframe,
+        timestamp=start,
+        open=bars[0].open,
+        high=max(b.high for b in bars),
+        low=min(b.low for b in bars),
+        close=bars[-1].close,
+        volume=sum(b.volume for b in bars)
+    )
+
+
+class CandleStore:
+    def __init__(self, timeframes=("1h", "15m"), max_base_bars=20000):
+        self.timeframes = list(timeframes)
+        self.base = deque(maxlen=max_base_bars)
+
+        # running [start, symbol, open, high, low, close, volume] of the
+        # candle currently being built, per timeframe
+        self._running = {}
+
+    @property
+    def last_timestamp(self):
+        return self.base[-1].timestamp if self.base else None
+
+    def add(self, bar):
+        # append a base bar, a bar with the latest timestamp replaces it (live
+        # klines update the incomplete candle), older bars are ignored
+        if self.base and bar.timestamp <= self.base[-1].timestamp:
+            if bar.timestamp == self.base[-1].timestamp:
+                self.base[-1] = bar
+                self._rebuild()
+            return
+
+        self.base.append(bar)
+        for tf in self.timeframes:
+            start = interval_start(bar.timestamp, tf)
+            agg = self._running.get(tf)
+            if agg is None or agg[0] != start:
+                self._running[tf] = [start, bar.symbol, bar.open, bar.high, bar.low, bar.close, bar.volume]
+            else:
+                if bar.high > agg[3]:
+                    agg[3] = bar.high
+                if bar.low < agg[4]:
+                    agg[4] = bar.low
+                agg[5] = bar.close
+                agg[6] += bar.volume
+
+    def current(self, timeframe):
+        # the (possibly incomplete) candle containing the latest base bar
+        agg = self._running.get(timeframe)
+        if agg is None:
+            return None
+        start, symbol, o, h, l, c, v = agg
+        return Bar(timestamp=start, open=o, high=h, low=l, close=c, volume=v, symbol=symbol, timeframe=timeframe)
+
+    def history(self, timeframe, limit=None):
+        # candles built from every stored base bar, oldest first; the first
+        # one may be partial if the store does not reach back to its start
+        candles = []
+        group = []
+        group_start = None
+        for bar in self.base:
+            start = interval_start(bar.timestamp, timeframe)
+            if group and start != group_start:
+                candles.append(aggregate_bars(group, timeframe, group_start))
+                group = []
+            group_start = start
+            group.append(bar)
+        if group:
+            candles.append(aggregate_bars(group, timeframe, group_start))
+
+        return candles[-limit:] if limit else candles
+
+    def _rebuild(self):
+        last = self.base[-1]
+        for tf in self.timeframes:
+            start = interval_start(last.timestamp, tf)
+            group = []
+            for bar in reversed(self.base):
+                if bar.timestamp < start:
+                    break
+                group.append(bar)
+            group.reverse()
+            c = aggregate_bars(group, tf, start)
+            self._running[tf] = [start, c.symbol, c.open, c.high, c.low, c.close, c.volume]
+
+
+def candle_starts(ts, timeframe):
+    # interval_start of every epoch ms in ts, as epoch ms. every utc offset
+    # is a whole number of quarter hours, so all 1m bars of one quarter hour
+    # share a candle and interval_start runs once per quarter
+    quarters, inverse = np.unique(np.asarray(ts) // 900_000, return_inverse=True)
+    quarter_starts = np.array([to_ms(interval_start(from_ms(int(q) * 900_000), timeframe)) for q in quarters], dtype=np.int64)
+    return quarter_starts[inverse]
+
+
+def candle_arrays(bars, timeframe):
+    # candles of a time-sorted 1m BarBatch as numpy columns, for vectorized
+    # strategy evaluation. besides the complete ohlcv of each candle it has
+    # the candle as the backtest shows it when the candle opens: built from
+    # its first 1m bar only (first_*). the replay feeds rows 0 and 1 together
+    # on its first step, so the first candle opens with both if they share it
+    n = len(bars)
+    if n == 0:
+        raise ValueError("no bars to build candles from")
+
+    starts = candle_starts(bars.ts, timeframe)
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    last = np.r_[first[1:] - 1, n - 1]
+    seen = first.copy()
+    if n > 1 and (len(first) == 1 or first[1] > 1):
+        seen[0] = 1
+
+    return {
+        "symbol": bars.symbol,
+        "ts": starts[first],
+        "open": bars.open[first],
+        "high": np.maximum.reduceat(bars.high, first),
+        "low": np.minimum.reduceat(bars.low, first),
+        "close": bars.close[last],
+        "volume": np.add.reduceat(bars.volume, first),
+        "first_ts": bars.ts[seen],
+        "first_high": np.maximum(bars.high[first], bars.high[seen]),
+        "first_low": np.minimum(bars.low[first], bars.low[seen]),
+        "first_close": bars.close[seen],
+    }
+
+
+PANEL_COLUMNS = ("open", "high", "low", "close", "volume", "first_ts", "first_high", "first_low", "first_close")
+
+
+def _panel_matrix(name, shape):
+    return np.zeros(shape, dtype=np.int64) if name in ("ts", "first_ts") else np.full(shape, np.nan)
+
+
+def candle_panel(batches, timeframe):
+    # candle_arrays of several symbols on one candle grid, for cross-sectional
+    # evaluation: ts is the union of the symbols' candle opens and every other
+    # column a (symbols, candles) matrix, row i from batches[i]. a symbol
+    # without a candle at a grid time has nan there (first_ts 0); index is
+    # the symbol's own candle number at each grid time, -1 where it has none
+    per_symbol = [candle_arrays(bars, timeframe) for bars in batches]
+    ts = np.unique(np.concatenate([candles["ts"] for candles in per_symbol]))
+    positions = [np.searchsorted(ts, candles["ts"]) for candles in per_symbol]
+    shape = (len(per_symbol), len(ts))
+
+    panel = {"symbols": [candles["symbol"] for candles in per_symbol], "ts": ts}
+    for name in PANEL_COLUMNS:
+        matrix = _panel_matrix(name, shape)
+        for row, (candles, at) in enumerate(zip(per_symbol, positions)):
+            matrix[row, at] = candles[name]
+        panel[name] = matrix
+    index = np.full(shape, -1, dtype=np.int64)
+    for row, at in enumerate(positions):
+        index[row, at] = np.arange(len(at))
+    panel["index"] = index
+    return panel
+
+
+def pack_panel(panel):
+    # the candle_panel columns with each symbol's candles moved to the
+    # front of its row, in order and without the grid's gaps: row i is
+    # candle_arrays of batches[i] (ts a matrix too), nan padded on the
+    # right. indicators over the packed rows count every symbol's own
+    # candles, as run on its own
+    rows, cols = np.nonzero(panel["index"] >= 0)
+    at = panel["index"][rows, cols]
+    shape = (len(panel["symbols"]), int(at.max()) + 1 if len(at) else 0)
+    packed = {"ts": _panel_matrix("ts", shape)}
+    packed["ts"][rows, at] = panel["ts"][cols]
+    for name in PANEL_COLUMNS:
+        packed[name] = _panel_matrix(name, shape)
+        packed[name][rows, at] = panel[name][rows, cols]
+    return packed
+
+
+def unpack_panel(matrix, index):
+    # a (symbols, own candles) matrix of packed rows back on the grid of
+    # index, nan (0 for ints) where a symbol has no candle
+    rows, cols = np.nonzero(index >= 0)
+    out = np.zeros(index.shape, dtype=matrix.dtype) if matrix.dtype.kind in "iu" else np.full(index.shape, np.nan)
+    out[rows, cols] = matrix[rows, index[rows, cols]]
+    return out
+
+
+class CandleIndex:
+    # the candles a CandleStore would hold after any row of a time-sorted 1m
+    # BarBatch, read straight from its arrays, so a replay can jump over rows
+    # without feeding each one through a store
+
+    def __init__(self, bars, timeframes=("1h", "15m")):
+        self.bars = bars
+        self.starts = {tf: candle_starts(bars.ts, tf) for tf in timeframes} if len(bars) else {}
+
+    def current(self, row, timeframe):
+        # the (possibly incomplete) candle containing row
+        starts = self.starts[timeframe]
+        first = int(np.searchsorted(starts, starts[row], side="left"))
+        b = self.bars
+        return Bar(
+            symbol=b.symbol,
+            timeframe=timeframe,
+            timestamp=from_ms(int(starts[row])),
+            open=float(b.open[first]),
+            high=float(b.high[first:row + 1].max()),
+            low=float(b.low[first:row + 1].min()),
+            close=float(b.close[row]),
+            volume=sum(b.volume[first:row + 1].tolist())
+        )
@@ -1,12 +1,15 @@
-import pandas as pd
+# pandas is imported inside the functions that use it, so importing this
+# module (the live executor does) stays cheap
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 from src.utils.types import *
 
 CSV_HEADERS = ["timestamp", "side", "symbol", "price", "size", "order_id", "status"]
 
 def write_trades(path, rows):
+    import pandas as pd
+
     if not rows:
         pd.DataFrame(columns=CSV_HEADERS).to_csv(path, index=False)
         return
@@ -17,6 +20,8 @@ def write_trades(path, rows):
 
 
 def load_ohlcv_csv(path):
+    import pandas as pd
+
     df = pd.read_csv(path)
     
     try:
@@ -46,3 +51,60 @@ def load_ohlcv_csv(path):
         bars.append(bar)
     
     return bars
+
+
+def naive_to_ms(values):
+    # naive datetime64 wall clock times to epoch ms the way to_ms reads a
+    # naive datetime (local time), with one timezone lookup per distinct hour
+    wall = np.asarray(values, dtype='datetime64[ms]').astype(np.int64)
+    if len(wall) == 0:
+        return wall
+    hours, inverse = np.unique(wall // 3_600_000, return_inverse=True)
+    offsets = np.array([
+        to_ms(datetime(1970, 1, 1) + timedelta(hours=h)) - h * 3_600_000
+        for h in hours.tolist()
+    ], dtype=np.int64)
+    return wall + offsets[inverse]
+
+
+def load_ohlcv_records(path):
+    # columnar load of an ohlcv csv into BAR_DTYPE records, for bulk paths
+    # that never need Bar objects
+    import pandas as pd
+
+    df = pd.read_csv(path)
+
+    try:
+        ts = pd.to_datetime(df['timestamp'])
+    except:
+        ts = pd.to_datetime(df['timestamp'], unit='ms')
+
+    records = np.empty(len(df), dtype=BAR_DTYPE)
+    records['ts'] = naive_to_ms(ts.to_numpy(dtype='datetime64[ms]'))
+    for name in ('open', 'high', 'low', 'close', 'volume'):
+        records[name] = df[name].to_numpy(dtype=np.float64)
+
+    symbol = df['symbol'].iloc[0] if 'symbol' in df.columns and len(df) else 'UNK'
+    timeframe = df['timeframe'].iloc[0] if 'timeframe' in df.columns and len(df) else 'UNK'
+    return records, symbol, timeframe
+
+
+def load_ohlcv_batch(path):
+    records, symbol, timeframe = load_ohlcv_records(path)
+    return BarBatch.from_records(records, symbol, timeframe)
+
+
+def write_ohlcv_records(path, records, symbol, timeframe):
+    import pandas as pd
+
+    df = pd.DataFrame({
+        'timestamp': [from_ms(t).isoformat() for t in records['ts'].tolist()],
+        'open': records['open'],
+        'high': records['high'],
+        'low': records['low'],
+        'close': records['close'],
+        'volume': records['volume'],
+        'symbol': symbol,
+        'timeframe': timeframe,
+    })
+    df.to_csv(path, index=False)
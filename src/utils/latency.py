@@ -0,0 +1,108 @@
+# in-process latency histograms for the live pipeline
+# stages are timed with the monotonic perf counter and rolled up into
+# geometric bucket histograms, so memory stays constant however long it runs
+
+import json
+import math
+import time
+from contextlib import contextmanager
+
+# bucket i covers (MIN_NS * GROWTH**(i-1), MIN_NS * GROWTH**i], ~5% resolution
+MIN_NS = 1_000
+GROWTH = 1.05
+NUM_BUCKETS = int(math.log(600e9 / MIN_NS, GROWTH)) + 2
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, ns):
+        if ns <= MIN_NS:
+            i = 0
+        else:
+            i = min(int(math.ceil(math.log(ns / MIN_NS, GROWTH))), NUM_BUCKETS - 1)
+        self.counts[i] += 1
+        self.count += 1
+        self.total_ns += ns
+        self.max_ns = max(self.max_ns, ns)
+
+    def percentile(self, q):
+        # upper bound of the bucket holding the q-th percentile, capped at max
+        if self.count == 0:
+            return 0
+        rank = max(1, int(math.ceil(q / 100.0 * self.count)))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(int(MIN_NS * GROWTH ** i), self.max_ns)
+        return self.max_ns
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ns / self.count / 1e6 if self.count else 0.0,
+            "p50_ms": self.percentile(50) / 1e6,
+            "p99_ms": self.percentile(99) / 1e6,
+            "max_ms": self.max_ns / 1e6,
+        }
+
+
+class LatencyRecorder:
+    def __init__(self, logger=None, path=None, dump_interval=300.0):
+        self.logger = logger
+        self.path = path
+        self.dump_interval = dump_interval
+        self.histograms = {}
+        self._last_dump = time.monotonic()
+
+    @staticmethod
+    def now():
+        return time.perf_counter_ns()
+
+    def record(self, stage, ns):
+        if stage not in self.histograms:
+            self.histograms[stage] = LatencyHistogram()
+        self.histograms[stage].add(ns)
+
+    def since(self, stage, start_ns):
+        # record the time elapsed from start_ns, returns the current timestamp
+        now = time.perf_counter_ns()
+        self.record(stage, now - start_ns)
+        return now
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter_ns() - start)
+
+    def summary(self):
+        return {stage: h.summary() for stage, h in self.histograms.items()}
+
+    def maybe_dump(self):
+        if time.monotonic() - self._last_dump >= self.dump_interval:
+            self.dump()
+
+    def dump(self):
+        self._last_dump = time.monotonic()
+        summary = self.summary()
+
+        if self.logger:
+            for stage, s in summary.items():
+                self.logger.info(
+                    f"Latency | Stage={stage} | N={s['count']} | p50={s['p50_ms']:.3f}ms "
+                    f"| p99={s['p99_ms']:.3f}ms | max={s['max_ms']:.3f}ms"
+                )
+
+        if self.path:
+            with open(self.path, "w") as f:
+                json.dump({"written_at": time.time(), "stages": summary}, f, indent=2)
+
+        return summary
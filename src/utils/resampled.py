@@ -0,0 +1,146 @@
+# materialized higher timeframe candles. the closed 15m/1h candles of a base
+# series (cached 1m klines, a 1m csv) are kept next to it as fixed-width
+# record files, like the candle cache, with a sidecar json holding how many
+# base rows they were built from and a sha256 of those rows.
+#
+# on every request the base rows are hashed again: if the stored rows are
+# still a prefix of the base (new rows were only appended), just the candles
+# after the last stored one are aggregated and appended to the file; any
+# other change to the base (an edited or inserted row) rebuilds it. a candle
+# is stored once it is closed, i.e. the base holds its last minute or a
+# later row, so the candle still in progress is never materialized
+
+import fcntl
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+
+import numpy as np
+
+from src.utils.candles import TIMEFRAME_MINUTES, candle_arrays, candle_starts
+from src.utils.types import *
+
+# bump when the files could differ for the same base rows
+VERSION = 1
+
+
+def closed_records(base, timeframe, partial_first=False):
+    # BAR_DTYPE records of the closed timeframe candles of a time-sorted
+    # BarBatch; the first candle is dropped when the base starts after its
+    # open, unless partial_first
+    if not len(base):
+        return np.empty(0, dtype=BAR_DTYPE)
+    candles = candle_arrays(base, timeframe)
+    step = TIMEFRAME_MINUTES[timeframe] * 60_000
+    base_step = TIMEFRAME_MINUTES.get(base.timeframe, 1) * 60_000
+
+    keep = np.ones(len(candles["ts"]), dtype=bool)
+    if candles["ts"][-1] + step > base.ts[-1] + base_step:
+        keep[-1] = False
+    if not partial_first and base.ts[0] != candles["ts"][0]:
+        keep[0] = False
+
+    # volumes summed in bar order, like CandleStore, not pairwise by numpy
+    first = np.flatnonzero(np.r_[True, np.diff(candle_starts(base.ts, timeframe)) != 0]).tolist() + [len(base)]
+    volume = base.volume.tolist()
+    candles["volume"] = np.array([sum(volume[a:b]) for a, b in zip(first, first[1:])])
+
+    records = np.empty(int(keep.sum()), dtype=BAR_DTYPE)
+    for name in BAR_DTYPE.names:
+        records[name] = candles[name][keep]
+    return records
+
+
+class ResampledBars:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, source, timeframe):
+        return os.path.join(self.root, f"{source}_{timeframe}.bin")
+
+    def _meta_path(self, source, timeframe):
+        return os.path.join(self.root, f"{source}_{timeframe}.json")
+
+    @contextmanager
+    def _write_lock(self, source, timeframe):
+        with open(os.path.join(self.root, f"{source}_{timeframe}.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def view(self, source, timeframe):
+        # read-only memory map of the materialized candles
+        path = self.path(source, timeframe)
+        n = os.path.getsize(path) // BAR_DTYPE.itemsize if os.path.exists(path) else 0
+        if n == 0:
+            return np.empty(0, dtype=BAR_DTYPE)
+        return np.memmap(path, dtype=BAR_DTYPE, mode="r", shape=(n,))
+
+    def meta(self, source, timeframe):
+        try:
+            with open(self._meta_path(source, timeframe)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def update(self, source, base, timeframe):
+        # bring the candles of source up to date with base, a time-sorted
+        # BarBatch; returns "current", "appended" or "rebuilt"
+        records = base.to_records()
+        with self._write_lock(source, timeframe):
+            meta = self.meta(source, timeframe)
+            rows = 0
+            if meta and meta.get("version") == VERSION and meta.get("symbol") == base.symbol and meta["rows"] <= len(records):
+                rows = meta["rows"]
+            h = hashlib.sha256(records[:rows].tobytes())
+            if rows and h.hexdigest() != meta["hash"]:
+                rows = 0
+                h = hashlib.sha256()
+            if rows and rows == len(records):
+                return "current"
+
+            path = self.path(source, timeframe)
+            stored = self.view(source, timeframe) if rows else np.empty(0, dtype=BAR_DTYPE)
+            if len(stored):
+                # the base rows after the last stored candle
+                lo = int(np.searchsorted(base.ts, stored["ts"][-1] + TIMEFRAME_MINUTES[timeframe] * 60_000, side="left"))
+                new = closed_records(base[lo:], timeframe, partial_first=True)
+                with open(path, "ab") as f:
+                    f.write(new.tobytes())
+                status = "appended"
+            else:
+                new = closed_records(base, timeframe)
+                tmp = f"{path}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(new.tobytes())
+                os.replace(tmp, path)
+                status = "rebuilt"
+
+            h.update(records[rows:].tobytes())
+            meta = {"version": VERSION, "symbol": base.symbol, "base_timeframe": base.timeframe, "rows": len(records), "hash": h.hexdigest()}
+            tmp = f"{self._meta_path(source, timeframe)}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp, self._meta_path(source, timeframe))
+            return status
+
+    def closed(self, source, base, timeframe, start_ms=None, end_ms=None):
+        # closed timeframe candles of base with start_ms <= open <= end_ms,
+        # as a BarBatch, from the materialized file
+        self.update(source, base, timeframe)
+        data = self.view(source, timeframe)
+        ts = data["ts"]
+        lo = 0 if start_ms is None else int(np.searchsorted(ts, start_ms, side="left"))
+        hi = len(data) if end_ms is None else int(np.searchsorted(ts, end_ms, side="right"))
+        return BarBatch.from_records(np.array(data[lo:hi]), base.symbol, timeframe)
+
+
+def csv_source(path):
+    # (resampled root, source name) of a base csv: a resampled/ directory next to it
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, "resampled"), os.path.splitext(name)[0]
+
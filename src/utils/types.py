@@ -2,7 +2,28 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
-@dataclass
+import numpy as np
+
+# one candle as a fixed-width record, open time in epoch ms
+BAR_DTYPE = np.dtype([
+    ("ts", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+
+
+def to_ms(dt):
+    return int(dt.timestamp() * 1000)
+
+
+def from_ms(ms):
+    return datetime.fromtimestamp(ms / 1000)
+
+
+@dataclass(slots=True)
 class Bar:
     timestamp: datetime
     open: float
@@ -13,15 +34,18 @@ class Bar:
     symbol: str
     timeframe: str
 
-@dataclass
+@dataclass(slots=True)
 class Signal:
     symbol: str
-    side: int 
+    side: int
     size: float
     price: Optional[float]
     timestamp: datetime
+    # MARKET fills now; LIMIT and STOP rest at price until a bar crosses it
+    # (STOP in backtests only); CANCEL cancels the symbol's resting orders
+    order_type: str = "MARKET"
 
-@dataclass
+@dataclass(slots=True)
 class Order:
     id: Optional[str]
     symbol: str
@@ -31,8 +55,173 @@ class Order:
     status: str
     filled_size: float
     timestamp: datetime
+    order_type: str = "MARKET"
 
-@dataclass
+@dataclass(slots=True)
 class AccountInfo:
     balance: float
     positions: dict
+
+@dataclass(slots=True)
+class WakeUp:
+    # when a strategy next has to be stepped in an event-skipping backtest:
+    # the first 1m bar at or after timestamp, or whose high reaches above or
+    # whose low reaches below, whichever comes first
+    timestamp: Optional[datetime] = None
+    above: Optional[float] = None
+    below: Optional[float] = None
+
+
+# compact variants for code that keeps many of them around: epoch ms instead
+# of datetime objects, and .timestamp still gives a datetime so strategy code
+# written against Bar/Signal/Order keeps working
+
+class CompactBar:
+    __slots__ = ("ts", "open", "high", "low", "close", "volume", "symbol", "timeframe")
+
+    def __init__(self, ts, open, high, low, close, volume, symbol, timeframe):
+        self.ts = ts
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.symbol = symbol
+        self.timeframe = timeframe
+
+    @property
+    def timestamp(self):
+        return from_ms(self.ts)
+
+    @classmethod
+    def from_bar(cls, bar):
+        return cls(to_ms(bar.timestamp), bar.open, bar.high, bar.low, bar.close, bar.volume, bar.symbol, bar.timeframe)
+
+    def to_bar(self):
+        return Bar(timestamp=self.timestamp, open=self.open, high=self.high, low=self.low,
+                   close=self.close, volume=self.volume, symbol=self.symbol, timeframe=self.timeframe)
+
+    def __repr__(self):
+        return f"CompactBar({self.timestamp.isoformat()}, {self.symbol} {self.timeframe}, o={self.open}, h={self.high}, l={self.low}, c={self.close}, v={self.volume})"
+
+
+class CompactSignal:
+    __slots__ = ("symbol", "side", "size", "price", "ts", "order_type")
+
+    def __init__(self, symbol, side, size, price, ts, order_type="MARKET"):
+        self.symbol = symbol
+        self.side = side
+        self.size = size
+        self.price = price
+        self.ts = ts
+        self.order_type = order_type
+
+    @property
+    def timestamp(self):
+        return from_ms(self.ts)
+
+    @classmethod
+    def from_signal(cls, signal):
+        return cls(signal.symbol, signal.side, signal.size, signal.price, to_ms(signal.timestamp), signal.order_type)
+
+    def to_signal(self):
+        return Signal(symbol=self.symbol, side=self.side, size=self.size, price=self.price, timestamp=self.timestamp,
+                      order_type=self.order_type)
+
+
+class CompactOrder:
+    __slots__ = ("id", "symbol", "side", "size", "price", "status", "filled_size", "ts", "order_type")
+
+    def __init__(self, id, symbol, side, size, price, status, filled_size, ts, order_type="MARKET"):
+        self.id = id
+        self.symbol = symbol
+        self.side = side
+        self.size = size
+        self.price = price
+        self.status = status
+        self.filled_size = filled_size
+        self.ts = ts
+        self.order_type = order_type
+
+    @property
+    def timestamp(self):
+        return from_ms(self.ts)
+
+    @classmethod
+    def from_order(cls, order):
+        return cls(order.id, order.symbol, order.side, order.size, order.price,
+                   order.status, order.filled_size, to_ms(order.timestamp), order.order_type)
+
+    def to_order(self):
+        return Order(id=self.id, symbol=self.symbol, side=self.side, size=self.size, price=self.price,
+                     status=self.status, filled_size=self.filled_size, timestamp=self.timestamp, order_type=self.order_type)
+
+
+class BarBatch:
+    # struct-of-arrays of bars of one symbol and timeframe: an int64 epoch ms
+    # column and float64 ohlcv columns (48 bytes a bar). Bar objects are only
+    # built for the rows that are actually looked at
+
+    __slots__ = ("ts", "open", "high", "low", "close", "volume", "symbol", "timeframe")
+
+    def __init__(self, ts, open, high, low, close, volume, symbol, timeframe):
+        self.ts = np.asarray(ts, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.float64)
+        self.symbol = symbol
+        self.timeframe = timeframe
+
+    @classmethod
+    def from_records(cls, records, symbol, timeframe):
+        return cls(records["ts"], records["open"], records["high"], records["low"],
+                   records["close"], records["volume"], symbol, timeframe)
+
+    @classmethod
+    def from_bars(cls, bars, symbol=None, timeframe=None):
+        n = len(bars)
+        columns = [np.fromiter((to_ms(b.timestamp) for b in bars), dtype=np.int64, count=n)]
+        for name in ("open", "high", "low", "close", "volume"):
+            columns.append(np.fromiter((getattr(b, name) for b in bars), dtype=np.float64, count=n))
+        if bars:
+            symbol = symbol or bars[0].symbol
+            timeframe = timeframe or bars[0].timeframe
+        return cls(*columns, symbol, timeframe)
+
+    def to_records(self):
+        records = np.empty(len(self), dtype=BAR_DTYPE)
+        for name in BAR_DTYPE.names:
+            records[name] = getattr(self, name)
+        return records
+
+    def __len__(self):
+        return len(self.ts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice) or isinstance(i, np.ndarray):
+            return BarBatch(self.ts[i], self.open[i], self.high[i], self.low[i],
+                            self.close[i], self.volume[i], self.symbol, self.timeframe)
+        return Bar(timestamp=from_ms(int(self.ts[i])), open=float(self.open[i]), high=float(self.high[i]),
+                   low=float(self.low[i]), close=float(self.close[i]), volume=float(self.volume[i]),
+                   symbol=self.symbol, timeframe=self.timeframe)
+
+    def between(self, start_ms, end_ms):
+        # rows with start_ms <= ts <= end_ms of a time-sorted batch
+        lo = int(np.searchsorted(self.ts, start_ms, side="left"))
+        hi = int(np.searchsorted(self.ts, end_ms, side="right"))
+        return self[lo:hi]
+
+    def sorted(self):
+        return self[np.argsort(self.ts, kind="stable")]
+
+    def timestamps(self):
+        return [from_ms(t) for t in self.ts.tolist()]
+
+    def bars(self):
+        return [
+            Bar(timestamp=from_ms(t), open=o, high=h, low=l, close=c, volume=v, symbol=self.symbol, timeframe=self.timeframe)
+            for t, o, h, l, c, v in zip(self.ts.tolist(), self.open.tolist(), self.high.tolist(),
+                                        self.low.tolist(), self.close.tolist(), self.volume.tolist())
+        ]